@@ -23,6 +23,11 @@ from app.models.users import User
 from app.models.patients import Patient
 from app.models.exams import Exam
 from app.models.qc_records import QCRecord
+from app.models.qc_jobs import QCJob
+from app.models.qc_flags import QCFlag
+from app.models.qc_rollups import QCRollup
+from app.models.image_blobs import ImageBlob
+from app.models.ml_cache_entries import MLCacheEntry
 
 target_metadata = SQLModel.metadata
 
@@ -0,0 +1,29 @@
+"""image blob extension
+
+Revision ID: 0c7d2e9f4b18
+Revises: f8b1c5d3e720
+Create Date: 2025-12-13 16:22:48.207315
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0c7d2e9f4b18'
+down_revision: Union[str, Sequence[str], None] = 'f8b1c5d3e720'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # формат хранения блоба (app.storage.codecs); всё, что сохранено раньше, — PNG
+    op.add_column('imageblob', sa.Column('extension', sa.String(), server_default='png', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('imageblob', 'extension')
@@ -0,0 +1,135 @@
+"""structured qc results
+
+Revision ID: 5d81f0b2a9c4
+Revises: cae3ad869675
+Create Date: 2025-12-05 16:42:31.208441
+
+"""
+import json
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d81f0b2a9c4'
+down_revision: Union[str, Sequence[str], None] = 'cae3ad869675'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# старые записи (до выноса изображений в файлы) хранят в ml_results_json base64 оригинала
+# и исправленного снимка — по несколько МБ на строку, поэтому пачка маленькая
+BACKFILL_BATCH = 50
+FLAG_KINDS = ("major", "critical", "severe")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    is_postgres = bind.dialect.name == 'postgresql'
+    json_type = postgresql.JSONB() if is_postgres else sa.JSON()
+
+    op.add_column('qcrecord', sa.Column('status', sa.String(), nullable=True))
+    op.add_column('qcrecord', sa.Column('needs_fix', sa.Boolean(), nullable=False, server_default=sa.false()))
+    op.add_column('qcrecord', sa.Column('qc_probs', json_type, nullable=True))
+    op.add_column('qcrecord', sa.Column('applied_fixes', sa.JSON(), nullable=True))
+
+    op.create_table(
+        'qcflag',
+        sa.Column('id', sa.Integer(), primary_key=True, nullable=False),
+        sa.Column('qc_id', sa.Integer(), sa.ForeignKey('qcrecord.id'), nullable=False),
+        sa.Column('kind', sa.String(), nullable=False),
+        sa.Column('name', sa.String(), nullable=False),
+    )
+    op.create_index('ix_qcflag_qc_id', 'qcflag', ['qc_id'])
+    op.create_index('ix_qcflag_kind_name', 'qcflag', ['kind', 'name'])
+    op.create_index('ix_qcflag_name_qc_id', 'qcflag', ['name', 'qc_id'])
+
+    # --- backfill из ml_results_json пачками по id ---
+    qcrecord = sa.table(
+        'qcrecord',
+        sa.column('id', sa.Integer()),
+        sa.column('ml_results_json', sa.String()),
+        sa.column('status', sa.String()),
+        sa.column('needs_fix', sa.Boolean()),
+        sa.column('qc_probs', json_type),
+        sa.column('applied_fixes', sa.JSON()),
+    )
+    qcflag = sa.table(
+        'qcflag',
+        sa.column('qc_id', sa.Integer()),
+        sa.column('kind', sa.String()),
+        sa.column('name', sa.String()),
+    )
+
+    # executemany: одна подготовленная команда на пачку
+    update_row = (
+        qcrecord.update()
+        .where(qcrecord.c.id == sa.bindparam('_id'))
+        .values(
+            status=sa.bindparam('_status'),
+            needs_fix=sa.bindparam('_needs_fix'),
+            qc_probs=sa.bindparam('_qc_probs', type_=json_type),
+            applied_fixes=sa.bindparam('_applied_fixes', type_=sa.JSON()),
+        )
+    )
+
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(qcrecord.c.id, qcrecord.c.ml_results_json)
+            .where(qcrecord.c.id > last_id)
+            .order_by(qcrecord.c.id)
+            .limit(BACKFILL_BATCH)
+        ).fetchall()
+        if not rows:
+            break
+        updates = []
+        flags = []
+        for qc_id, raw in rows:
+            try:
+                data = json.loads(raw or '{}')
+            except ValueError:
+                data = {}
+            updates.append({
+                '_id': qc_id,
+                '_status': data.get('status') or data.get('qc_status'),
+                '_needs_fix': bool(data.get('needs_fix', False)),
+                '_qc_probs': data.get('qc_probs') or data.get('probs') or {},
+                '_applied_fixes': data.get('applied_fixes') or [],
+            })
+            for kind in FLAG_KINDS:
+                values = data.get(f'{kind}_flags') or []
+                names = [name for name, value in values.items() if value] if isinstance(values, dict) else values
+                flags.extend({'qc_id': qc_id, 'kind': kind, 'name': str(name)} for name in names)
+        bind.execute(update_row, updates)
+        if flags:
+            op.bulk_insert(qcflag, flags)
+        last_id = rows[-1][0]
+
+    op.create_index('ix_qcrecord_exam_id', 'qcrecord', ['exam_id'])
+    op.create_index('ix_qcrecord_created_at', 'qcrecord', ['created_at'])
+    op.create_index('ix_qcrecord_status', 'qcrecord', ['status'])
+    op.create_index('ix_qcrecord_needs_fix', 'qcrecord', ['needs_fix'])
+    if is_postgres:
+        op.create_index('ix_qcrecord_qc_probs', 'qcrecord', ['qc_probs'], postgresql_using='gin')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == 'postgresql':
+        op.drop_index('ix_qcrecord_qc_probs', table_name='qcrecord')
+    op.drop_index('ix_qcrecord_needs_fix', table_name='qcrecord')
+    op.drop_index('ix_qcrecord_status', table_name='qcrecord')
+    op.drop_index('ix_qcrecord_created_at', table_name='qcrecord')
+    op.drop_index('ix_qcrecord_exam_id', table_name='qcrecord')
+    op.drop_index('ix_qcflag_name_qc_id', table_name='qcflag')
+    op.drop_index('ix_qcflag_kind_name', table_name='qcflag')
+    op.drop_index('ix_qcflag_qc_id', table_name='qcflag')
+    op.drop_table('qcflag')
+    op.drop_column('qcrecord', 'applied_fixes')
+    op.drop_column('qcrecord', 'qc_probs')
+    op.drop_column('qcrecord', 'needs_fix')
+    op.drop_column('qcrecord', 'status')
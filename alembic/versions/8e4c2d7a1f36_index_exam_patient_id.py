@@ -0,0 +1,29 @@
+"""index exam patient_id
+
+Revision ID: 8e4c2d7a1f36
+Revises: 5d81f0b2a9c4
+Create Date: 2025-12-08 11:05:19.734516
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8e4c2d7a1f36'
+down_revision: Union[str, Sequence[str], None] = '5d81f0b2a9c4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # сводки по пациенту соединяют qcrecord с exam по patient_id
+    op.create_index('ix_exam_patient_id', 'exam', ['patient_id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_exam_patient_id', table_name='exam')
@@ -0,0 +1,29 @@
+"""qc job retry backoff
+
+Revision ID: a3e9c71f5b08
+Revises: 0c7d2e9f4b18
+Create Date: 2026-10-18 09:12:40.518233
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3e9c71f5b08'
+down_revision: Union[str, Sequence[str], None] = '0c7d2e9f4b18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # повтор задачи после ошибки — не раньше not_before
+    op.add_column('qcjob', sa.Column('not_before', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('qcjob', 'not_before')
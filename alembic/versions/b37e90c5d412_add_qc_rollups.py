@@ -0,0 +1,51 @@
+"""add qc rollups
+
+Revision ID: b37e90c5d412
+Revises: 8e4c2d7a1f36
+Create Date: 2025-12-10 09:27:44.581302
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b37e90c5d412'
+down_revision: Union[str, Sequence[str], None] = '8e4c2d7a1f36'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'qcrollup',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('device', sa.String(), nullable=False),
+        sa.Column('modality', sa.String(), nullable=False),
+        sa.Column('kind', sa.String(), nullable=False),
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('day', 'device', 'modality', 'kind', 'name'),
+    )
+
+    # начальное заполнение по уже накопленным данным
+    op.execute("""
+        INSERT INTO qcrollup (day, device, modality, kind, name, count)
+        SELECT date(q.created_at), e.device, e.modality, 'status', COALESCE(q.status, 'UNKNOWN'), count(q.id)
+        FROM qcrecord q JOIN exam e ON e.id = q.exam_id
+        GROUP BY date(q.created_at), e.device, e.modality, COALESCE(q.status, 'UNKNOWN')
+    """)
+    op.execute("""
+        INSERT INTO qcrollup (day, device, modality, kind, name, count)
+        SELECT date(q.created_at), e.device, e.modality, f.kind, f.name, count(f.id)
+        FROM qcflag f JOIN qcrecord q ON q.id = f.qc_id JOIN exam e ON e.id = q.exam_id
+        GROUP BY date(q.created_at), e.device, e.modality, f.kind, f.name
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('qcrollup')
@@ -0,0 +1,50 @@
+"""add qc job queue
+
+Revision ID: cae3ad869675
+Revises: 1ac677e5716f
+Create Date: 2025-12-02 10:14:07.412093
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# статусы — имена членов QCJobStatus, как их хранит sa.Enum модели
+qcjobstatus = sa.Enum('QUEUED', 'RUNNING', 'DONE', 'FAILED', name='qcjobstatus')
+
+# revision identifiers, used by Alembic.
+revision: str = 'cae3ad869675'
+down_revision: Union[str, Sequence[str], None] = '1ac677e5716f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'qcjob',
+        sa.Column('id', sa.Integer(), primary_key=True, nullable=False),
+        sa.Column('exam_id', sa.Integer(), sa.ForeignKey('exam.id'), nullable=False),
+        sa.Column('created_by', sa.Integer(), sa.ForeignKey('user.id'), nullable=False),
+        sa.Column('filename', sa.String(), nullable=False),
+        sa.Column('content_type', sa.String(), nullable=False),
+        sa.Column('upload_path', sa.String(), nullable=False),
+        sa.Column('status', qcjobstatus, nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('error', sa.String(), nullable=True),
+        sa.Column('qc_record_id', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+    )
+    op.create_index('ix_qcjob_status', 'qcjob', ['status'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_qcjob_status', table_name='qcjob')
+    op.drop_table('qcjob')
+    # тип PostgreSQL не удаляется вместе с таблицей
+    qcjobstatus.drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,40 @@
+"""keyset pagination indexes
+
+Revision ID: d4a7e19c3b20
+Revises: b37e90c5d412
+Create Date: 2025-12-09 10:12:43.118305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4a7e19c3b20'
+down_revision: Union[str, Sequence[str], None] = 'b37e90c5d412'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# списки сортируются по (дата, id) по убыванию — составные индексы под keyset пагинацию
+INDEXES = [
+    ('ix_qcrecord_created_at_id', 'qcrecord', ['created_at', 'id']),
+    ('ix_qcrecord_exam_id_created_at_id', 'qcrecord', ['exam_id', 'created_at', 'id']),
+    ('ix_exam_exam_date_id', 'exam', ['exam_date', 'id']),
+    ('ix_exam_patient_id_exam_date_id', 'exam', ['patient_id', 'exam_date', 'id']),
+    ('ix_patient_created_at_id', 'patient', ['created_at', 'id']),
+    ('ix_user_created_at_id', 'user', ['created_at', 'id']),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name, table, columns in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
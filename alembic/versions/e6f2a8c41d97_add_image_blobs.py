@@ -0,0 +1,39 @@
+"""add image blobs
+
+Revision ID: e6f2a8c41d97
+Revises: d4a7e19c3b20
+Create Date: 2025-12-11 14:05:19.402771
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e6f2a8c41d97'
+down_revision: Union[str, Sequence[str], None] = 'd4a7e19c3b20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # существующие записи продолжают хранить пути к файлам, в imageblob только новые загрузки
+    op.create_table(
+        'imageblob',
+        sa.Column('sha256', sa.String(length=64), nullable=False),
+        sa.Column('size', sa.Integer(), nullable=False),
+        sa.Column('refcount', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('sha256'),
+    )
+    op.create_index(op.f('ix_imageblob_updated_at'), 'imageblob', ['updated_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_imageblob_updated_at'), table_name='imageblob')
+    op.drop_table('imageblob')
@@ -0,0 +1,45 @@
+"""add ml result cache
+
+Revision ID: f8b1c5d3e720
+Revises: e6f2a8c41d97
+Create Date: 2025-12-12 11:40:02.913457
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f8b1c5d3e720'
+down_revision: Union[str, Sequence[str], None] = 'e6f2a8c41d97'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'mlcacheentry',
+        sa.Column('image_sha256', sa.String(length=64), nullable=False),
+        sa.Column('model_version', sa.String(), nullable=False),
+        sa.Column('ml_results_json', sa.String(), nullable=False),
+        sa.Column('original_ref', sa.String(), nullable=True),
+        sa.Column('corrected_ref', sa.String(), nullable=True),
+        sa.Column('hits', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('last_used_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('image_sha256', 'model_version'),
+    )
+    op.create_index(op.f('ix_mlcacheentry_created_at'), 'mlcacheentry', ['created_at'], unique=False)
+    op.create_index(op.f('ix_mlcacheentry_last_used_at'), 'mlcacheentry', ['last_used_at'], unique=False)
+    op.add_column('qcjob', sa.Column('force', sa.Boolean(), server_default=sa.false(), nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('qcjob', 'force')
+    op.drop_index(op.f('ix_mlcacheentry_last_used_at'), table_name='mlcacheentry')
+    op.drop_index(op.f('ix_mlcacheentry_created_at'), table_name='mlcacheentry')
+    op.drop_table('mlcacheentry')
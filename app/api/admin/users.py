@@ -1,37 +1,41 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session
-from app.config.db import get_session
+from app.config.unit_of_work import AsyncUnitOfWork, get_async_uow
 from app.services.user_service import UserService
 from app.models.users import User
+from app.repositories.pagination import InvalidCursorError, PAGE_SIZE_DEFAULT
 
 router = APIRouter(prefix="/admin/users", tags=["admin"])
 
 @router.get("/")
-def list_users(session: Session = Depends(get_session)):
-    service = UserService(session)
-    return service.list_users()
+async def list_users(cursor: str = None, limit: int = PAGE_SIZE_DEFAULT, uow: AsyncUnitOfWork = Depends(get_async_uow)):
+    service = UserService(uow)
+    try:
+        users, next_cursor = await service.list_users(cursor, limit)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"items": users, "next_cursor": next_cursor}
 
 @router.get("/{user_id}")
-def get_user(user_id: int, session: Session = Depends(get_session)):
-    service = UserService(session)
+async def get_user(user_id: int, uow: AsyncUnitOfWork = Depends(get_async_uow)):
+    service = UserService(uow)
     try:
-        return service.get_user(user_id)
+        return await service.get_user(user_id)
     except Exception as e:
         raise HTTPException(status_code=404, detail=str(e))
 
 @router.post("/")
-def create_user(user: User, session: Session = Depends(get_session)):
-    service = UserService(session)
-    return service.create_user(user)
+async def create_user(user: User, uow: AsyncUnitOfWork = Depends(get_async_uow)):
+    service = UserService(uow)
+    return await service.create_user(user)
 
 @router.put("/{user_id}")
-def update_user(user_id: int, user: User, session: Session = Depends(get_session)):
-    service = UserService(session)
+async def update_user(user_id: int, user: User, uow: AsyncUnitOfWork = Depends(get_async_uow)):
+    service = UserService(uow)
     # исключаем unset поля, чтобы не затирать их None
-    return service.update_user(user_id, **user.dict(exclude_unset=True))
+    return await service.update_user(user_id, **user.dict(exclude_unset=True))
 
 @router.delete("/{user_id}")
-def delete_user(user_id: int, session: Session = Depends(get_session)):
-    service = UserService(session)
-    service.delete_user(user_id)
+async def delete_user(user_id: int, uow: AsyncUnitOfWork = Depends(get_async_uow)):
+    service = UserService(uow)
+    await service.delete_user(user_id)
     return {"detail": "User deleted"}
@@ -0,0 +1,17 @@
+"""
+Учёт соединений с БД на запрос: сколько соединений запрос держал одновременно
+(вместе со стримингом ответа). Сводка — GET /health/db, раздел "requests".
+"""
+from app.config.db import track_connection_usage
+
+
+class DBUsageMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        with track_connection_usage(f"{scope['method']} {scope['path']}"):
+            await self.app(scope, receive, send)
@@ -1,20 +1,19 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session
 from typing import List, Optional
-import json
 
-from app.config.db import get_session
+from app.config.unit_of_work import AsyncUnitOfWork, get_async_uow
 from app.services.exam_service import ExamService
-from app.services.qc_service import QCService
 from app.models.exams import Exam
+from app.repositories.pagination import InvalidCursorError, PAGE_SIZE_DEFAULT
+from app.repositories.filters import Period
 
 router = APIRouter(tags=["Exams"])
 
 
 @router.post("/")
-def create_exam(exam: Exam, session: Session = Depends(get_session)):
-    service = ExamService(session)
-    exam_obj = service.create_exam(exam)
+async def create_exam(exam: Exam, uow: AsyncUnitOfWork = Depends(get_async_uow)):
+    service = ExamService(uow)
+    exam_obj = await service.create_exam(exam)
 
     return {
         "id": exam_obj.id,
@@ -25,31 +24,35 @@ def create_exam(exam: Exam, session: Session = Depends(get_session)):
 
 
 @router.get("/")
-def list_exams(
+async def list_exams(
     patient_id: Optional[str] = None,
-    date_from: Optional[str] = None,
-    date_to: Optional[str] = None,
-    session: Session = Depends(get_session)
+    date_from: Period = None,
+    date_to: Period = None,
+    cursor: Optional[str] = None,
+    limit: int = PAGE_SIZE_DEFAULT,
+    uow: AsyncUnitOfWork = Depends(get_async_uow)
 ):
-    service = ExamService(session)
-    exams = service.list_exams(patient_id, date_from, date_to)
+    service = ExamService(uow)
+    # страница исследований (новые первыми) и их последние QC записи;
+    # date_to датой (YYYY-MM-DD) включает весь день
+    try:
+        rows, next_cursor = await service.list_exams_with_qc(patient_id, date_from, date_to, cursor, limit)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-    qc_service = QCService()
     result = []
 
-    for e in exams:
-        # Получаем QC record, если есть
-        qc_record = qc_service.get_qc_by_exam(e.id)
+    for e, qc_record in rows:
         qc_summary = None
         if qc_record:
-            ml_data = json.loads(qc_record.ml_results_json)
             qc_summary = {
-                "qc_probs": ml_data.get("qc_probs", {}),
-                "applied_fixes": ml_data.get("applied_fixes", []),
-                "severe_flags": ml_data.get("severe_flags", []),
-                "needs_fix": ml_data.get("needs_fix", False),
+                "qc_probs": qc_record.qc_probs or {},
+                "applied_fixes": qc_record.applied_fixes or [],
+                "severe_flags": qc_record.severe_flags,
+                "needs_fix": qc_record.needs_fix,
                 "original_image_url": f"/qc/{qc_record.id}/image?original=true",
-                "processed_image_url": f"/qc/{qc_record.id}/image?original=false"
+                "processed_image_url": f"/qc/{qc_record.id}/image?original=false",
+                "thumbnail_url": f"/qc/{qc_record.id}/image?original=true&size=thumb"
             }
 
         result.append({
@@ -60,26 +63,24 @@ def list_exams(
             "qc_summary": qc_summary
         })
 
-    return result
+    return {"items": result, "next_cursor": next_cursor}
 
 
 @router.get("/{exam_id}")
-def get_exam(exam_id: int, session: Session = Depends(get_session)):
-    service = ExamService(session)
-    exam = service.get_exam(exam_id)
+async def get_exam(exam_id: int, uow: AsyncUnitOfWork = Depends(get_async_uow)):
+    service = ExamService(uow)
+    exam = await service.get_exam(exam_id)
     if not exam:
         raise HTTPException(status_code=404, detail="Exam not found")
 
-    qc_service = QCService()
-    qc_record = qc_service.get_qc_by_exam(exam.id)
+    qc_record = await service.get_latest_qc(exam.id)
     qc_summary = None
     if qc_record:
-        ml_data = json.loads(qc_record.ml_results_json)
         qc_summary = {
-            "qc_probs": ml_data.get("qc_probs", {}),
-            "applied_fixes": ml_data.get("applied_fixes", []),
-            "severe_flags": ml_data.get("severe_flags", []),
-            "needs_fix": ml_data.get("needs_fix", False),
+            "qc_probs": qc_record.qc_probs or {},
+            "applied_fixes": qc_record.applied_fixes or [],
+            "severe_flags": qc_record.severe_flags,
+            "needs_fix": qc_record.needs_fix,
             "original_image_url": f"/qc/{qc_record.id}/image?original=true",
             "processed_image_url": f"/qc/{qc_record.id}/image?original=false"
         }
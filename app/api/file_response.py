@@ -0,0 +1,163 @@
+"""
+Отдача неизменяемых файлов (QC изображения и их уменьшенные копии) с HTTP кэшированием:
+строгий ETag, Last-Modified, Cache-Control, 304 на условные запросы, Range/206.
+
+Полный файл — FileResponse (на серверах с расширением ASGI pathsend — без копирования).
+Если приложение стоит за nginx, X_ACCEL_REDIRECT_PREFIX передаёт отдачу самому nginx
+(sendfile, Range и кэш на его стороне), например:
+
+    location /protected/uploads/ { internal; alias /srv/autoqc/app/uploads/; }
+    X_ACCEL_REDIRECT_PREFIX=/protected/uploads/
+"""
+import os
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Callable, Optional, Tuple
+
+import anyio
+from fastapi import Request
+from fastapi.responses import FileResponse, Response
+
+# Файл по одному и тому же URL не меняется — кэшировать можно надолго
+IMAGE_CACHE_CONTROL = os.getenv("IMAGE_CACHE_CONTROL", "public, max-age=31536000, immutable")
+X_ACCEL_REDIRECT_PREFIX = os.getenv("X_ACCEL_REDIRECT_PREFIX", "")
+X_ACCEL_ROOT = os.path.abspath(os.getenv("X_ACCEL_ROOT", os.path.join("app", "uploads")))
+
+
+def file_etag(st: os.stat_result) -> str:
+    """Строгий ETag: файлы пишутся атомарно (os.replace), новый файл — новый inode/mtime."""
+    return f'"{st.st_ino:x}-{st.st_size:x}-{st.st_mtime_ns:x}"'
+
+
+def _not_modified(request: Request, etag: str, st: os.stat_result) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-None-Match сравнивается слабо: W/"x" совпадает с "x"
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(st.st_mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def _parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Один диапазон bytes=a-b / a- / -n -> (start, end) включительно.
+    None — заголовок не разобран или диапазонов несколько (отдаём файл целиком, RFC 9110 это допускает).
+    ValueError — диапазон за концом файла (416).
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, sep, last = (part.strip() for part in spec.partition("-"))
+    if not sep or not (first or last) or (first and not first.isdigit()) or (last and not last.isdigit()):
+        return None
+    if not first:
+        suffix = int(last)
+        if suffix == 0 or size == 0:
+            raise ValueError("range not satisfiable")
+        return max(size - suffix, 0), size - 1
+    start, end = int(first), int(last) if last else size - 1
+    if last and start > end:
+        return None
+    if start >= size:
+        raise ValueError("range not satisfiable")
+    return start, min(end, size - 1)
+
+
+class FileRangeResponse(Response):
+    """206 с частью файла: ASGI zerocopysend (sendfile), если сервер его поддерживает, иначе чтение кусками."""
+
+    chunk_size = 64 * 1024
+
+    def __init__(self, path: str, start: int, end: int, size: int, media_type: str, headers: dict):
+        self.path = path
+        self.start = start
+        self.length = end - start + 1
+        self.status_code = 206
+        self.media_type = media_type
+        self.background = None
+        self.init_headers({
+            **headers,
+            "content-range": f"bytes {start}-{end}/{size}",
+            "content-length": str(self.length),
+        })
+
+    async def __call__(self, scope, receive, send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if scope["method"].upper() == "HEAD":
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+        if "http.response.zerocopysend" in scope.get("extensions", {}):
+            with open(self.path, "rb") as f:
+                await send({
+                    "type": "http.response.zerocopysend",
+                    "file": f,
+                    "offset": self.start,
+                    "count": self.length,
+                    "more_body": False,
+                })
+            return
+        async with await anyio.open_file(self.path, "rb") as f:
+            await f.seek(self.start)
+            remaining = self.length
+            while remaining > 0:
+                chunk = await f.read(min(self.chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+            if remaining > 0:
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+def file_response(
+    request: Request,
+    path: str,
+    media_type: str,
+    cache_control: str = IMAGE_CACHE_CONTROL,
+    render: Optional[Callable[[str], bytes]] = None,
+) -> Response:
+    """
+    Ответ на GET/HEAD файла с учётом If-None-Match/If-Modified-Since, Range и If-Range.
+    render — отдать не сам файл, а его преобразование (например, npz -> PNG); валидаторы — от файла,
+    Range для таких ответов не поддерживается.
+    """
+    st = os.stat(path)
+    etag = file_etag(st)
+    last_modified = formatdate(st.st_mtime, usegmt=True)
+    headers = {
+        "etag": etag,
+        "last-modified": last_modified,
+        "cache-control": cache_control,
+        "accept-ranges": "bytes",
+    }
+
+    if _not_modified(request, etag, st):
+        return Response(status_code=304, headers=headers)
+
+    if render is not None:
+        del headers["accept-ranges"]
+        return Response(render(path), media_type=media_type, headers=headers)
+
+    if X_ACCEL_REDIRECT_PREFIX:
+        full_path = os.path.abspath(path)
+        if full_path.startswith(X_ACCEL_ROOT + os.sep):
+            relative = os.path.relpath(full_path, X_ACCEL_ROOT).replace(os.sep, "/")
+            headers["x-accel-redirect"] = X_ACCEL_REDIRECT_PREFIX.rstrip("/") + "/" + relative
+            return Response(media_type=media_type, headers=headers)
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (if_range is None or if_range in (etag, last_modified)):
+        try:
+            byte_range = _parse_range(range_header, st.st_size)
+        except ValueError:
+            return Response(status_code=416, headers={**headers, "content-range": f"bytes */{st.st_size}"})
+        if byte_range is not None:
+            return FileRangeResponse(path, *byte_range, st.st_size, media_type, headers)
+
+    return FileResponse(path, headers=headers, media_type=media_type, stat_result=st)
@@ -0,0 +1,43 @@
+from fastapi import APIRouter, File, HTTPException, UploadFile
+from fastapi.responses import StreamingResponse
+from typing import Optional
+import json
+import os
+
+from app.config.unit_of_work import UnitOfWork
+from app.services.bulk_import_service import BulkImportService, BulkImportError, detect_format
+
+router = APIRouter(tags=["Import"])
+
+
+@router.post("/{kind}")
+def bulk_import(
+    kind: str,
+    file: UploadFile = File(...),
+    format: Optional[str] = None,
+    chunk_size: Optional[int] = None,
+):
+    """
+    Массовый импорт: kind — patients или exams, файл CSV (с заголовком) или NDJSON.
+    Формат — по расширению/Content-Type файла, либо явно format=csv|ndjson.
+    Ответ — NDJSON: строка на каждую записанную пачку (с ошибками строк), последняя — итог (done=true).
+    """
+    # загруженный файл FastAPI закрывает, как только обработчик вернул ответ, —
+    # импорт читает его через свою копию дескриптора (fileno() переносит файл из памяти на диск)
+    upload = os.fdopen(os.dup(file.file.fileno()), "rb")
+    # единица работы живёт, пока идёт импорт
+    uow = UnitOfWork(name="bulk import")
+    service = BulkImportService(uow, chunk_size) if chunk_size else BulkImportService(uow)
+    try:
+        results = service.run(kind, upload, format or detect_format(file.filename, file.content_type))
+    except BulkImportError as e:
+        uow.close()
+        upload.close()
+        raise HTTPException(status_code=400, detail=str(e))
+
+    def stream():
+        with uow, upload:
+            for result in results:
+                yield json.dumps(result, ensure_ascii=False, default=str) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
@@ -9,4 +9,4 @@ async def run_ml_qc(file: UploadFile = File(...)):
     Читаем файл и передаем байты в ML клиент.
     """
     image_bytes = await file.read()  # читаем как bytes
-    return ml_client.qc(image_bytes, filename=file.filename, content_type=file.content_type)
+    return await ml_client.qc(image_bytes, filename=file.filename, content_type=file.content_type)
@@ -1,46 +1,53 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session
-from app.config.db import engine
+from app.config.unit_of_work import AsyncUnitOfWork, get_async_uow
 from app.services.patient_service import PatientService
 from app.models.patients import Patient
+from app.repositories.pagination import InvalidCursorError, PAGE_SIZE_DEFAULT
 
 router = APIRouter(prefix="/patients", tags=["Patients"])
 
 # Dependency
-def get_patient_service():
-    with Session(engine) as session:
-        yield PatientService(session)
+async def get_patient_service(uow: AsyncUnitOfWork = Depends(get_async_uow)):
+    return PatientService(uow)
 
 # Create new patient
 @router.post("/")
-def create_patient(patient_data: Patient, service: PatientService = Depends(get_patient_service)):
-    return service.create_patient(patient_data.dict())
+async def create_patient(patient_data: Patient, service: PatientService = Depends(get_patient_service)):
+    return await service.create_patient(patient_data.dict())
 
 # Get all patients
 @router.get("/")
-def get_patients(service: PatientService = Depends(get_patient_service)):
-    return service.get_patients()
+async def get_patients(
+    cursor: str | None = None,
+    limit: int = PAGE_SIZE_DEFAULT,
+    service: PatientService = Depends(get_patient_service),
+):
+    try:
+        patients, next_cursor = await service.get_patients(cursor, limit)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"items": patients, "next_cursor": next_cursor}
 
 # Get patient by patient_id
 @router.get("/{patient_id}")
-def get_patient(patient_id: str, service: PatientService = Depends(get_patient_service)):
-    patient = service.get_patient(patient_id)
+async def get_patient(patient_id: str, service: PatientService = Depends(get_patient_service)):
+    patient = await service.get_patient(patient_id)
     if not patient:
         raise HTTPException(status_code=404, detail="Patient not found")
     return patient
 
 # Update patient
 @router.put("/{patient_id}")
-def update_patient(patient_id: str, update_data: dict, service: PatientService = Depends(get_patient_service)):
-    patient = service.update_patient(patient_id, update_data)
+async def update_patient(patient_id: str, update_data: dict, service: PatientService = Depends(get_patient_service)):
+    patient = await service.update_patient(patient_id, update_data)
     if not patient:
         raise HTTPException(status_code=404, detail="Patient not found")
     return patient
 
 # Delete patient
 @router.delete("/{patient_id}")
-def delete_patient(patient_id: str, service: PatientService = Depends(get_patient_service)):
-    success = service.delete_patient(patient_id)
+async def delete_patient(patient_id: str, service: PatientService = Depends(get_patient_service)):
+    success = await service.delete_patient(patient_id)
     if not success:
         raise HTTPException(status_code=404, detail="Patient not found")
     return {"status": "success", "message": "Patient deleted"}
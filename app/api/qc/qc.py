@@ -1,28 +1,204 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
+from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException, Query, Request
+from typing import List, Optional
 from app.services.qc_service import QCService
+from app.services.qc_read_service import QCReadService
+from app.services.qc_job_service import QCJobService, QueueFullError
+from app.services.report_cache import report_cache
+from app.services.ml_result_cache import ml_result_cache
+from app.services.report_export_service import ReportExportService
+from app.services.image_previews import PREVIEW_SIZES
+from app.api.file_response import file_response
+from app.config.unit_of_work import AsyncUnitOfWork, UnitOfWork, get_async_uow, get_uow
+from app.repositories.pagination import InvalidCursorError, PAGE_SIZE_DEFAULT
+from app.repositories.filters import Period
 import json
-from fastapi.responses import StreamingResponse
+from fastapi.responses import StreamingResponse, JSONResponse
+from fastapi.concurrency import run_in_threadpool
 
 router = APIRouter(prefix="/qc", tags=["QC"])
 
+# ---------------------------
+# ПАКЕТНАЯ ЗАГРУЗКА
+# ---------------------------
+@router.post("/batch/upload")
+async def upload_qc_batch(
+    files: List[UploadFile] = File(...),
+    exam_ids: Optional[List[int]] = Form(None),
+    user_id: int = 1,
+    force: bool = False,
+):
+    """
+    Много изображений для многих исследований за один запрос.
+    files — изображения (exam_ids сопоставляются по порядку) и/или zip-архивы
+    с путями вида "{exam_id}/img.png" или "{exam_id}_img.png".
+    Ответ — NDJSON: строка на каждый элемент по мере готовности, последняя строка — итог сохранения.
+    force=true — все файлы заново через ML сервис, мимо кэша результатов.
+    """
+    try:
+        items, handles = await run_in_threadpool(QCService.expand_batch_uploads, files, exam_ids)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def stream():
+        # ответ стримится дольше, чем живут зависимости запроса, — своя единица работы на весь стрим
+        try:
+            with UnitOfWork(name="qc batch") as uow:
+                service = QCService(uow)
+                async for event in service.upload_qc_batch(items, user_id, force=force):
+                    if event["event"] == "item":
+                        ml_data = event["ml_result"] or {}
+                        line = {
+                            "index": event["index"],
+                            "exam_id": event["exam_id"],
+                            "filename": event["filename"],
+                            "ok": event["ok"],
+                            "error": event["error"],
+                        }
+                        if event["ok"]:
+                            line.update({
+                                "qc_probs": ml_data.get("qc_probs", {}),
+                                "applied_fixes": ml_data.get("applied_fixes", []),
+                                "severe_flags": ml_data.get("severe_flags", []),
+                                "needs_fix": ml_data.get("needs_fix", False),
+                            })
+                    elif event["event"] == "saved":
+                        line = {
+                            "done": True,
+                            "saved": len(event["records"]),
+                            "records": [
+                                {
+                                    "index": index,
+                                    "id": record.id,
+                                    "exam_id": record.exam_id,
+                                    "original_image_url": f"/qc/{record.id}/image?original=true",
+                                    "processed_image_url": f"/qc/{record.id}/image?original=false",
+                                }
+                                for index, record in event["records"]
+                            ],
+                        }
+                    else:
+                        line = {"done": True, "saved": 0, "error": event["error"]}
+                    yield json.dumps(line, ensure_ascii=False) + "\n"
+        finally:
+            # временные файлы и архивы пакета
+            QCService.close_batch_uploads(handles)
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+# ---------------------------
+# ФОНОВЫЕ ЗАДАЧИ QC
+# ---------------------------
+@router.get("/jobs/metrics")
+def qc_jobs_metrics(uow: UnitOfWork = Depends(get_uow)):
+    return QCJobService(uow).metrics()
+
+
+@router.get("/jobs/{job_id}")
+def get_qc_job(job_id: int, uow: UnitOfWork = Depends(get_uow)):
+    service = QCJobService(uow)
+    try:
+        return service.get_job_status(job_id)
+    except Exception as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+# ---------------------------
+# КЭШ ОТЧЁТОВ
+# ---------------------------
+@router.get("/reports/cache/stats")
+def report_cache_stats():
+    return report_cache.stats()
+
+
+# ---------------------------
+# КЭШ РЕЗУЛЬТАТОВ ML
+# ---------------------------
+@router.get("/ml/cache/stats")
+def ml_cache_stats(uow: UnitOfWork = Depends(get_uow)):
+    return ml_result_cache.stats(uow.session)
+
+
+# ---------------------------
+# ПАКЕТНАЯ ВЫГРУЗКА ОТЧЁТОВ
+# ---------------------------
+@router.get("/reports/export")
+def export_reports(
+    exam_ids: Optional[List[int]] = Query(None),
+    date_from: str = None,
+    date_to: str = None,
+    patient_id: str = None,
+    format: str = "zip",
+):
+    """
+    Отчёты по списку исследований (exam_ids=1&exam_ids=2) или за период.
+    format=zip — архив с PDF на каждое исследование, format=pdf — один объединённый PDF.
+    """
+    # единица работы живёт, пока стримится архив
+    uow = UnitOfWork(name="reports export")
+    service = ReportExportService(uow)
+    try:
+        ids = service.resolve_exam_ids(exam_ids, date_from, date_to, patient_id)
+        chunks = service.export(ids, format)
+    except ValueError as e:
+        # ExportError и неверные даты
+        uow.close()
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception:
+        uow.close()
+        raise
+
+    def stream():
+        with uow:
+            yield from chunks
+
+    media_type = "application/zip" if format == "zip" else "application/pdf"
+    headers = {"Content-Disposition": f"attachment; filename=qc_reports.{format}"}
+    return StreamingResponse(stream(), media_type=media_type, headers=headers)
+
+
 # ---------------------------
 # ЗАГРУЗКА ФАЙЛА
 # ---------------------------
 @router.post("/{exam_id}/upload")
-def upload_qc(exam_id: int, file: UploadFile = File(...), user_id: int = 1):
-    service = QCService()
+async def upload_qc(
+    exam_id: int,
+    file: UploadFile = File(...),
+    user_id: int = 1,
+    background: bool = False,
+    force: bool = False,
+    uow: UnitOfWork = Depends(get_uow),
+):
+    """
+    background=true — файл ставится в очередь, сразу возвращается id задачи (202),
+    прогресс — GET /qc/jobs/{job_id}.
+    Уже загружавшийся файл не отправляется в ML сервис повторно (кэш результатов),
+    force=true — анализировать заново.
+    """
+    if background:
+        try:
+            job = await run_in_threadpool(QCJobService(uow).enqueue, exam_id, file, user_id, force)
+        except QueueFullError as e:
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+        return JSONResponse(
+            status_code=202,
+            content={"job_id": job.id, "status": job.status, "status_url": f"/qc/jobs/{job.id}"},
+        )
+
+    service = QCService(uow)
     try:
-        qc_record = service.upload_qc(exam_id, file, user_id)
-        ml_data = json.loads(qc_record.ml_results_json)
+        qc_record = await service.upload_qc(exam_id, file, user_id, force)
 
         return {
             "id": qc_record.id,
             "exam_id": qc_record.exam_id,
             "created_by": qc_record.created_by,
-            "qc_probs": ml_data.get("qc_probs", {}),
-            "applied_fixes": ml_data.get("applied_fixes", []),
-            "severe_flags": ml_data.get("severe_flags", []),
-            "needs_fix": ml_data.get("needs_fix", False),
+            "qc_probs": qc_record.qc_probs or {},
+            "applied_fixes": qc_record.applied_fixes or [],
+            "severe_flags": qc_record.severe_flags,
+            "needs_fix": qc_record.needs_fix,
             "original_image_url": f"/qc/{qc_record.id}/image?original=true",
             "processed_image_url": f"/qc/{qc_record.id}/image?original=false",
         }
@@ -34,20 +210,19 @@ def upload_qc(exam_id: int, file: UploadFile = File(...), user_id: int = 1):
 # ПОЛУЧЕНИЕ ПО EXAM ID
 # ---------------------------
 @router.get("/{exam_id}")
-def get_qc_by_exam(exam_id: int):
-    service = QCService()
+async def get_qc_by_exam(exam_id: int, uow: AsyncUnitOfWork = Depends(get_async_uow)):
+    service = QCReadService(uow)
     try:
-        record = service.get_qc_by_exam(exam_id)
+        record = await service.get_qc_by_exam(exam_id)
         if not record:
             raise HTTPException(status_code=404, detail="QC record not found")
 
-        ml_data = json.loads(record.ml_results_json)
         return {
             "id": record.id,
             "exam_id": record.exam_id,
             "created_by": record.created_by,
-            "qc_probs": ml_data.get("qc_probs", {}),
-            "needs_fix": ml_data.get("needs_fix", False),
+            "qc_probs": record.qc_probs or {},
+            "needs_fix": record.needs_fix,
             "original_image_url": f"/qc/{record.id}/image?original=true",
             "processed_image_url": f"/qc/{record.id}/image?original=false",
         }
@@ -59,23 +234,37 @@ def get_qc_by_exam(exam_id: int):
 # СПИСОК QC
 # ---------------------------
 @router.get("/")
-def list_qc(patient_id: str = None, date_from: str = None, date_to: str = None, flag: str = None):
-    service = QCService()
+async def list_qc(
+    patient_id: str = None,
+    date_from: Period = None,
+    date_to: Period = None,
+    flag: str = None,
+    cursor: str = None,
+    limit: int = PAGE_SIZE_DEFAULT,
+    uow: AsyncUnitOfWork = Depends(get_async_uow),
+):
+    """
+    Новые записи первыми; следующая страница — ?cursor=<next_cursor>.
+    date_from/date_to — дата (YYYY-MM-DD, date_to включает весь день) или дата и время ISO 8601.
+    """
+    service = QCReadService(uow)
     try:
-        records = service.list_qc(patient_id, date_from, date_to, flag)
+        records, next_cursor = await service.list_qc(patient_id, date_from, date_to, flag, cursor, limit)
         result = []
         for r in records:
-            ml_data = json.loads(r.ml_results_json)
             result.append({
                 "id": r.id,
                 "exam_id": r.exam_id,
                 "created_by": r.created_by,
-                "qc_probs": ml_data.get("qc_probs", {}),
-                "needs_fix": ml_data.get("needs_fix", False),
+                "qc_probs": r.qc_probs or {},
+                "needs_fix": r.needs_fix,
                 "original_image_url": f"/qc/{r.id}/image?original=true",
                 "processed_image_url": f"/qc/{r.id}/image?original=false",
+                "thumbnail_url": f"/qc/{r.id}/image?original=true&size=thumb",
             })
-        return result
+        return {"items": result, "next_cursor": next_cursor}
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -83,19 +272,35 @@ def list_qc(patient_id: str = None, date_from: str = None, date_to: str = None,
 # ---------------------------
 # ПОЛУЧЕНИЕ ИЗОБРАЖЕНИЙ
 # ---------------------------
-@router.get("/{qc_id}/image")
-def get_image(qc_id: int, original: bool = True):
-    service = QCService()
+@router.api_route("/{qc_id}/image", methods=["GET", "HEAD"])
+async def get_image(
+    request: Request,
+    qc_id: int,
+    original: bool = True,
+    size: str = "full",
+    uow: AsyncUnitOfWork = Depends(get_async_uow),
+):
+    """
+    size=thumb|preview — уменьшенная копия (WebP/JPEG) для списков и просмотра.
+    Файлы неизменяемы: ETag/Last-Modified, 304 на условные запросы, Range.
+    """
+    if size != "full" and size not in PREVIEW_SIZES:
+        raise HTTPException(status_code=400, detail=f"size должен быть одним из: full, {', '.join(PREVIEW_SIZES)}")
+    service = QCReadService(uow)
     try:
-        return service.get_image_response(qc_id, original)
+        image = await service.get_image_file(qc_id, original, size)
+        if image is None:
+            return await service.get_image_response(qc_id, original)
+        path, media_type, render = image
+        return await run_in_threadpool(file_response, request, path, media_type, render=render)
     except Exception as e:
         raise HTTPException(status_code=404, detail=str(e))
 
 
 @router.get("/{exam_id}/report")
-def get_qc_report(exam_id: int):
+def get_qc_report(exam_id: int, uow: UnitOfWork = Depends(get_uow)):
     """Generate bilingual PDF report (RU/KK) for given exam_id"""
-    service = QCService()
+    service = QCService(uow)
     try:
         pdf_stream = service.generate_report_pdf(exam_id)
         # Add filename header
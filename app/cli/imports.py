@@ -0,0 +1,58 @@
+"""
+Массовый импорт пациентов и исследований (миграция истории RIS).
+
+    python -m app.cli.imports patients patients.csv
+    python -m app.cli.imports exams exams.ndjson --chunk-size 10000 --errors exam_errors.ndjson
+"""
+import argparse
+import json
+import sys
+
+from app.config.unit_of_work import UnitOfWork
+from app.services.bulk_import_service import (
+    BulkImportService, BulkImportError, BULK_IMPORT_CHUNK_SIZE, IMPORT_FORMATS, IMPORT_KINDS, detect_format,
+)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.cli.imports", description="Массовый импорт CSV/NDJSON")
+    parser.add_argument("kind", choices=sorted(IMPORT_KINDS))
+    parser.add_argument("file")
+    parser.add_argument("--format", choices=IMPORT_FORMATS, help="по умолчанию — по расширению файла")
+    parser.add_argument("--chunk-size", type=int, default=BULK_IMPORT_CHUNK_SIZE)
+    parser.add_argument("--errors", help="записать ошибочные строки в NDJSON файл")
+    args = parser.parse_args(argv)
+
+    errors_file = open(args.errors, "w", encoding="utf-8") if args.errors else None
+    try:
+        with open(args.file, "rb") as stream, UnitOfWork(name="cli imports") as uow:
+            service = BulkImportService(uow, args.chunk_size)
+            for result in service.run(args.kind, stream, args.format or detect_format(args.file)):
+                if result.get("done"):
+                    break
+                print(
+                    f"пачка {result['chunk']}: {result['rows']} строк, создано {result['created']}, "
+                    f"обновлено {result['updated']}, ошибок {result['failed']}"
+                )
+                for error in result["errors"]:
+                    if errors_file is not None:
+                        errors_file.write(json.dumps(error, ensure_ascii=False) + "\n")
+                    else:
+                        print(f"  строка {error['line']} ({error['key']}): {error['error']}", file=sys.stderr)
+    except (BulkImportError, OSError) as e:
+        print(f"ошибка: {e}", file=sys.stderr)
+        return 2
+    finally:
+        if errors_file is not None:
+            errors_file.close()
+
+    print(
+        f"итого {result['rows']} строк: создано {result['created']}, обновлено {result['updated']}, "
+        f"повторов {result['duplicates']}, ошибок {result['failed']} "
+        f"за {result['seconds']:.1f} с ({result['rows_per_second'] or 0} строк/с)"
+    )
+    return 1 if result["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,48 @@
+"""
+Пакетная выгрузка QC отчётов.
+
+    python -m app.cli.reports export --from 2025-01-01 --to 2025-01-31 -o january.zip
+    python -m app.cli.reports export --exam-id 1 --exam-id 2 --format pdf -o reports.pdf
+"""
+import argparse
+import sys
+import time
+
+from app.config.unit_of_work import UnitOfWork
+from app.services.report_export_service import (
+    ReportExportService, ExportError, EXPORT_FORMATS, report_process_pool, ReportProcessPool,
+)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.cli.reports", description="Выгрузка QC отчётов")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export = sub.add_parser("export", help="отчёты по списку исследований или за период")
+    export.add_argument("--exam-id", type=int, action="append", dest="exam_ids")
+    export.add_argument("--from", dest="date_from")
+    export.add_argument("--to", dest="date_to")
+    export.add_argument("--patient-id")
+    export.add_argument("--format", choices=EXPORT_FORMATS, default="zip")
+    export.add_argument("--workers", type=int, help="процессов рендера (по умолчанию REPORT_EXPORT_WORKERS)")
+    export.add_argument("-o", "--output", required=True)
+    args = parser.parse_args(argv)
+
+    pool = ReportProcessPool(args.workers) if args.workers else report_process_pool
+    uow = UnitOfWork(name="cli reports")
+    service = ReportExportService(uow, pool, window=2 * pool.workers)
+    try:
+        ids = service.resolve_exam_ids(args.exam_ids, args.date_from, args.date_to, args.patient_id)
+        started = time.perf_counter()
+        service.export_to_file(ids, args.output, args.format)
+    except ExportError as e:
+        print(f"ошибка: {e}", file=sys.stderr)
+        return 2
+    finally:
+        uow.close()
+        pool.shutdown()
+    print(f"{len(ids)} отчётов -> {args.output} за {time.perf_counter() - started:.1f} с")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,39 @@
+"""
+Обслуживание счётчиков дашборда (таблица qcrollup).
+
+    python -m app.cli.rollups rebuild   # пересчитать с нуля
+    python -m app.cli.rollups check     # сверить с qcrecord/qcflag, код возврата 1 при расхождениях
+"""
+import argparse
+import sys
+
+from app.config.unit_of_work import UnitOfWork
+from app.repositories.qc_rollup_repository import QCRollupRepository
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.cli.rollups", description="Счётчики дашборда QC")
+    parser.add_argument("command", choices=["rebuild", "check"])
+    args = parser.parse_args(argv)
+
+    with UnitOfWork(name="cli rollups") as uow:
+        repo = QCRollupRepository(uow.session)
+        if args.command == "rebuild":
+            rows = repo.rebuild()
+            uow.commit()
+            print(f"qcrollup пересчитан: {rows} строк")
+            return 0
+
+        diffs = repo.check()
+        if not diffs:
+            print("qcrollup согласован с qcrecord")
+            return 0
+        for d in diffs:
+            print(f"{d['day']} {d['device']} {d['modality']} {d['kind']}:{d['name']} "
+                  f"ожидалось {d['expected']}, в счётчиках {d['actual']}")
+        print(f"расхождений: {len(diffs)}")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
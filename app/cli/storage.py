@@ -0,0 +1,27 @@
+"""
+Обслуживание хранилища QC изображений (app.storage).
+
+    python -m app.cli.storage gc                  # удалить блобы без ссылок
+    python -m app.cli.storage gc --grace 600      # ... не менявшиеся хотя бы 10 минут
+"""
+import argparse
+import sys
+
+from app.storage.image_store import image_store, IMAGE_GC_GRACE_SECONDS
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.cli.storage", description="Хранилище QC изображений")
+    sub = parser.add_subparsers(dest="command", required=True)
+    gc = sub.add_parser("gc", help="удалить блобы без ссылок и файлы без строки в imageblob")
+    gc.add_argument("--grace", type=int, default=IMAGE_GC_GRACE_SECONDS,
+                    help="не трогать блобы, менявшиеся за последние N секунд")
+    args = parser.parse_args(argv)
+
+    result = image_store.collect_garbage(args.grace)
+    print(f"удалено блобов без ссылок: {result['removed']}, файлов без строки в imageblob: {result['orphans']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,26 +1,143 @@
 import os
-import requests
+import asyncio
+import random
+import httpx
 from dotenv import load_dotenv
 from PIL import Image
 import io
 import base64
+from app.client.ml_stream import MLResponseStreamParser
 
 load_dotenv()
-ML_SERVICE_URL = os.getenv("ML_SERVICE_URL")
+ML_SERVICE_URL = os.getenv("ML_SERVICE_URL", "http://localhost:8001")
+
+# Настройки клиента (секунды / штуки)
+ML_TIMEOUT = float(os.getenv("ML_TIMEOUT", "120"))
+ML_CONNECT_TIMEOUT = float(os.getenv("ML_CONNECT_TIMEOUT", "5"))
+ML_MAX_CONNECTIONS = int(os.getenv("ML_MAX_CONNECTIONS", "20"))
+ML_MAX_CONCURRENCY = int(os.getenv("ML_MAX_CONCURRENCY", "8"))
+ML_RETRIES = int(os.getenv("ML_RETRIES", "3"))
+ML_BACKOFF = float(os.getenv("ML_BACKOFF", "0.5"))
+# Сколько элементов пакетной загрузки держим «в работе» одновременно
+ML_BATCH_WINDOW = int(os.getenv("ML_BATCH_WINDOW", "16"))
+
+# Ответы, после которых имеет смысл повторить запрос
+RETRY_STATUSES = {429, 502, 503, 504}
+
 
 class MLClient:
-    def qc(self, image_bytes: bytes, filename: str = "image.png", content_type: str = "image/png"):
+    """
+    Асинхронный клиент ML сервиса.
+    Один httpx.AsyncClient с keep-alive пулом на весь процесс,
+    семафор ограничивает число одновременных инференсов.
+    """
+
+    def __init__(
+        self,
+        base_url: str = ML_SERVICE_URL,
+        timeout: float = ML_TIMEOUT,
+        connect_timeout: float = ML_CONNECT_TIMEOUT,
+        max_connections: int = ML_MAX_CONNECTIONS,
+        max_concurrency: int = ML_MAX_CONCURRENCY,
+        retries: int = ML_RETRIES,
+        backoff: float = ML_BACKOFF,
+    ):
+        self.base_url = base_url
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+        )
+        self.retries = retries
+        self.backoff = backoff
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._client = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                limits=self.limits,
+            )
+        return self._client
+
+    async def _sleep_backoff(self, attempt: int):
+        # экспоненциальная задержка с джиттером
+        delay = self.backoff * (2 ** attempt)
+        await asyncio.sleep(delay + random.uniform(0, delay / 2))
+
+    async def qc(self, image_bytes: bytes, filename: str = "image.png", content_type: str = "image/png"):
         """
         Отправляем изображение в ML сервис.
         image_bytes — байты файла.
         """
-        try:
-            files = {"file": (filename, image_bytes, content_type)}
-            response = requests.post(f"{ML_SERVICE_URL}/qc/preprocess", files=files)
-            response.raise_for_status()
-            return response.json()
-        except Exception as e:
-            raise RuntimeError(f"Ошибка при запросе к ML сервису: {e}")
+        files = {"file": (filename, image_bytes, content_type)}
+        client = self._get_client()
+
+        async with self._semaphore:
+            for attempt in range(self.retries + 1):
+                try:
+                    response = await client.post("/qc/preprocess", files=files)
+                    if response.status_code in RETRY_STATUSES and attempt < self.retries:
+                        await self._sleep_backoff(attempt)
+                        continue
+                    response.raise_for_status()
+                    return response.json()
+                except httpx.ReadTimeout as e:
+                    # инференс не уложился в таймаут — повтор только удвоит ожидание
+                    raise RuntimeError(f"Ошибка при запросе к ML сервису: таймаут ({e})")
+                except httpx.TransportError as e:
+                    if attempt < self.retries:
+                        await self._sleep_backoff(attempt)
+                        continue
+                    raise RuntimeError(f"Ошибка при запросе к ML сервису: {e}")
+                except Exception as e:
+                    raise RuntimeError(f"Ошибка при запросе к ML сервису: {e}")
+
+    async def qc_to_files(self, image_bytes: bytes, tmp_dir: str, filename: str = "image.png", content_type: str = "image/png"):
+        """
+        То же, что qc(), но ответ читается потоком: изображения из base64 полей
+        сразу декодируются в файлы в tmp_dir и не держатся в памяти.
+        Возвращает (metadata без изображений, {"original"/"corrected": путь к файлу}).
+        """
+        files = {"file": (filename, image_bytes, content_type)}
+        client = self._get_client()
+        os.makedirs(tmp_dir, exist_ok=True)
+
+        async with self._semaphore:
+            for attempt in range(self.retries + 1):
+                parser = MLResponseStreamParser(tmp_dir)
+                try:
+                    async with client.stream("POST", "/qc/preprocess", files=files) as response:
+                        if response.status_code in RETRY_STATUSES and attempt < self.retries:
+                            await self._sleep_backoff(attempt)
+                            continue
+                        if response.is_error:
+                            await response.aread()
+                            response.raise_for_status()
+                        async for chunk in response.aiter_bytes():
+                            parser.feed(chunk)
+                    return parser.finish()
+                except httpx.ReadTimeout as e:
+                    parser.discard()
+                    raise RuntimeError(f"Ошибка при запросе к ML сервису: таймаут ({e})")
+                except httpx.TransportError as e:
+                    parser.discard()
+                    if attempt < self.retries:
+                        await self._sleep_backoff(attempt)
+                        continue
+                    raise RuntimeError(f"Ошибка при запросе к ML сервису: {e}")
+                except BaseException as e:
+                    parser.discard()
+                    if isinstance(e, Exception):
+                        raise RuntimeError(f"Ошибка при запросе к ML сервису: {e}")
+                    raise
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
 
     def decode_base64_image(self, b64_str: str) -> Image.Image:
         return Image.open(io.BytesIO(base64.b64decode(b64_str)))
@@ -0,0 +1,261 @@
+import base64
+import json
+import os
+import uuid
+
+# Поля ответа ML сервиса с изображениями в base64 -> вид изображения
+IMAGE_KEYS = {
+    "original_image_base64": "original",
+    "original": "original",
+    "processed_image_base64": "corrected",
+    "corrected_image_base64": "corrected",
+    "processed": "corrected",
+}
+
+_WHITESPACE = b" \t\r\n"
+_STRING_ESCAPES = {ord("/"): b"/", ord("n"): b"", ord("r"): b"", ord("t"): b""}
+
+
+class Base64FileSink:
+    """Пишет base64 поток в файл, декодируя по кускам кратным 4 символам."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "wb")
+        self._pending = b""
+
+    def write(self, data: bytes):
+        data = self._pending + data.translate(None, _WHITESPACE)
+        usable = len(data) - len(data) % 4
+        self._pending = data[usable:]
+        if usable:
+            self._file.write(base64.b64decode(data[:usable]))
+
+    def close(self):
+        try:
+            if self._pending:
+                self._file.write(base64.b64decode(self._pending + b"=" * (-len(self._pending) % 4)))
+        finally:
+            self._file.close()
+
+    def discard(self):
+        if not self._file.closed:
+            self._file.close()
+        if os.path.isfile(self.path):
+            os.remove(self.path)
+
+
+class _NullSink:
+    path = None
+
+    def write(self, data: bytes):
+        pass
+
+    def close(self):
+        pass
+
+    def discard(self):
+        pass
+
+
+class MLResponseStreamParser:
+    """
+    Инкрементальный разбор JSON ответа ML сервиса.
+    Поля-изображения (IMAGE_KEYS) не собираются в память: base64 строка
+    декодируется по мере прихода байтов прямо в файлы в tmp_dir.
+    Остальные поля (qc_probs, флаги, fixes, ...) разбираются обычным json.loads.
+
+    feed(chunk) — очередной кусок тела, finish() -> (metadata, {вид: путь к файлу}).
+    """
+
+    def __init__(self, tmp_dir: str):
+        self.tmp_dir = tmp_dir
+        self.metadata = {}
+        self.images = {}
+        self._sinks = []
+        self._buf = b""
+        self._state = "start"
+        self._key = None
+        self._sink = None
+        # состояние разбора обычного значения
+        self._raw = bytearray()
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+    # --- публичный интерфейс ---
+
+    def feed(self, chunk: bytes):
+        self._buf += chunk
+        pos = 0
+        while pos < len(self._buf) and self._state != "done":
+            state = self._state
+            new_pos = getattr(self, f"_on_{state}")(pos)
+            if new_pos == pos and self._state == state:
+                # токен ещё не пришёл целиком — ждём следующий кусок
+                break
+            pos = new_pos
+        self._buf = self._buf[pos:]
+
+    def finish(self):
+        if self._state != "done":
+            self.discard()
+            raise ValueError("Ответ ML сервиса оборван или не является JSON объектом")
+        return self.metadata, dict(self.images)
+
+    def discard(self):
+        for sink in self._sinks:
+            sink.discard()
+        self.images = {}
+
+    # --- состояния ---
+
+    def _skip_ws(self, pos):
+        while pos < len(self._buf) and self._buf[pos] in _WHITESPACE:
+            pos += 1
+        return pos
+
+    def _expect(self, pos, char: bytes):
+        if self._buf[pos:pos + 1] != char:
+            raise ValueError(f"Некорректный JSON от ML сервиса: ожидался {char!r} на позиции {pos}")
+
+    def _on_start(self, pos):
+        pos = self._skip_ws(pos)
+        if pos == len(self._buf):
+            return pos
+        self._expect(pos, b"{")
+        self._state = "key_or_end"
+        return pos + 1
+
+    def _on_key_or_end(self, pos):
+        pos = self._skip_ws(pos)
+        if pos == len(self._buf):
+            return pos
+        if self._buf[pos:pos + 1] == b"}":
+            self._state = "done"
+            return pos + 1
+        self._expect(pos, b'"')
+        end = self._find_string_end(pos + 1)
+        if end < 0:
+            return pos
+        self._key = json.loads(self._buf[pos:end + 1])
+        self._state = "colon"
+        return end + 1
+
+    def _on_colon(self, pos):
+        pos = self._skip_ws(pos)
+        if pos == len(self._buf):
+            return pos
+        self._expect(pos, b":")
+        self._state = "value"
+        return pos + 1
+
+    def _on_value(self, pos):
+        pos = self._skip_ws(pos)
+        if pos == len(self._buf):
+            return pos
+        kind = IMAGE_KEYS.get(self._key)
+        if kind and self._buf[pos:pos + 1] == b'"':
+            if kind in self.images:
+                self._sink = _NullSink()
+            else:
+                path = os.path.join(self.tmp_dir, f"{uuid.uuid4().hex}.part")
+                self._sink = Base64FileSink(path)
+                self._sinks.append(self._sink)
+                self.images[kind] = path
+            self._state = "image"
+            return pos + 1
+        self._raw = bytearray()
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._state = "raw"
+        return pos
+
+    def _on_image(self, pos):
+        buf = self._buf
+        quote = buf.find(b'"', pos)
+        backslash = buf.find(b"\\", pos)
+        if backslash >= 0 and (quote < 0 or backslash < quote):
+            if backslash + 1 >= len(buf):
+                self._sink.write(buf[pos:backslash])
+                return backslash
+            escaped = _STRING_ESCAPES.get(buf[backslash + 1])
+            if escaped is None:
+                raise ValueError("Некорректный символ в base64 изображении ML сервиса")
+            self._sink.write(buf[pos:backslash] + escaped)
+            return backslash + 2
+        if quote < 0:
+            self._sink.write(buf[pos:])
+            return len(buf)
+        self._sink.write(buf[pos:quote])
+        self._sink.close()
+        self._sink = None
+        self._state = "after_value"
+        return quote + 1
+
+    def _on_raw(self, pos):
+        buf = self._buf
+        start = pos
+        while pos < len(buf):
+            char = buf[pos]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == 0x5C:  # \
+                    self._escape = True
+                elif char == 0x22:  # "
+                    self._in_string = False
+                    if self._depth == 0:
+                        pos += 1
+                        self._raw += buf[start:pos]
+                        return self._finish_raw(pos)
+            elif char == 0x22:
+                self._in_string = True
+            elif char in b"[{":
+                self._depth += 1
+            elif char in b"]}":
+                if self._depth == 0:
+                    self._raw += buf[start:pos]
+                    return self._finish_raw(pos)
+                self._depth -= 1
+                if self._depth == 0:
+                    pos += 1
+                    self._raw += buf[start:pos]
+                    return self._finish_raw(pos)
+            elif self._depth == 0 and (char == 0x2C or char in _WHITESPACE):
+                self._raw += buf[start:pos]
+                return self._finish_raw(pos)
+            pos += 1
+        self._raw += buf[start:pos]
+        return pos
+
+    def _finish_raw(self, pos):
+        self.metadata[self._key] = json.loads(bytes(self._raw))
+        self._raw = bytearray()
+        self._state = "after_value"
+        return pos
+
+    def _on_after_value(self, pos):
+        pos = self._skip_ws(pos)
+        if pos == len(self._buf):
+            return pos
+        char = self._buf[pos:pos + 1]
+        if char == b",":
+            self._state = "key_or_end"
+            return pos + 1
+        self._expect(pos, b"}")
+        self._state = "done"
+        return pos + 1
+
+    def _find_string_end(self, pos):
+        buf = self._buf
+        while pos < len(buf):
+            char = buf[pos]
+            if char == 0x5C:
+                pos += 2
+                continue
+            if char == 0x22:
+                return pos
+            pos += 1
+        return -1
@@ -1,18 +1,291 @@
 # app/config/db.py
 import os
-from sqlmodel import SQLModel, create_engine, Session
+import threading
+import time
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import SQLModel, create_engine
 from dotenv import load_dotenv
 
+from app.config.replicas import Replica, ReplicaSet
+
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
+# реплики только для чтения через запятую (списки, дашборд, статистика; см. app.config.replicas);
+# без них чтение идёт в основную базу. DATABASE_READ_URL — одна реплика (прежнее имя)
+DATABASE_READ_URLS = [
+    url.strip()
+    for url in os.getenv("DATABASE_READ_URLS", os.getenv("DATABASE_READ_URL", "")).split(",")
+    if url.strip()
+]
+# async-драйвер для async-эндпоинтов (см. app.config.unit_of_work.AsyncUnitOfWork);
+# по умолчанию выводится из DATABASE_URL: postgresql -> asyncpg, sqlite -> aiosqlite
+DATABASE_ASYNC_URL = os.getenv("DATABASE_ASYNC_URL", "")
+
+# Настройки пула (для серверных БД; у SQLite свой пул, размеры к нему не применяются)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))  # ожидание свободного соединения, с
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # переоткрывать соединения старше, с
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+# предел времени одного запроса в БД, мс (0 — без ограничения); PostgreSQL и MySQL
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "30000"))
+# false — не логировать SQL, true — запросы, debug — запросы и строки результата
+DB_ECHO = os.getenv("DB_ECHO", "false").lower()
+DB_READ_POOL_SIZE = int(os.getenv("DB_READ_POOL_SIZE", str(DB_POOL_SIZE)))
+DB_READ_MAX_OVERFLOW = int(os.getenv("DB_READ_MAX_OVERFLOW", str(DB_MAX_OVERFLOW)))
+
+_WAIT_SAMPLES = 1000
+
+
+class ConnectionUsage:
+    """Соединения, взятые из пулов в рамках одного запроса (или задачи)."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.checkouts = 0
+        self.current = 0
+        self.peak = 0
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            self.checkouts += 1
+            self.current += 1
+            self.peak = max(self.peak, self.current)
+
+    def release(self):
+        with self._lock:
+            self.current -= 1
+
+
+class RequestUsageStats:
+    """Сводка по запросам: сколько соединений одновременно держал запрос."""
+
+    def __init__(self):
+        self.requests = 0
+        self.peak_max = 0
+        self.multi_connection = 0
+        self.last_multi_connection = None
+        self._lock = threading.Lock()
+
+    def record(self, usage: ConnectionUsage):
+        with self._lock:
+            self.requests += 1
+            self.peak_max = max(self.peak_max, usage.peak)
+            if usage.peak > 1:
+                self.multi_connection += 1
+                self.last_multi_connection = usage.name
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "peak_connections_max": self.peak_max,
+                "multi_connection_requests": self.multi_connection,
+                "last_multi_connection": self.last_multi_connection,
+            }
+
+
+_current_usage = contextvars.ContextVar("db_connection_usage", default=None)
+request_usage_stats = RequestUsageStats()
+
+
+@contextmanager
+def track_connection_usage(name: str):
+    """
+    Учитывает соединения, взятые внутри блока (в т.ч. из threadpool и дочерних задач asyncio —
+    они наследуют контекст). Итог попадает в request_usage_stats.
+    """
+    usage = ConnectionUsage(name)
+    token = _current_usage.set(usage)
+    try:
+        yield usage
+    finally:
+        _current_usage.reset(token)
+        request_usage_stats.record(usage)
+
+
+class PoolMetrics:
+    """Ожидание соединения из пула и использование соединений одного engine."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.checkouts = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.timeouts = 0
+        self.wait_max = 0.0
+        self.wait_total = 0.0
+        self._waits = deque(maxlen=_WAIT_SAMPLES)
+        self._lock = threading.Lock()
+
+    def observe_wait(self, seconds: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+                return
+            self.checkouts += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+            self._waits.append(seconds)
+
+    def attach(self, engine):
+        def on_connect(dbapi_connection, connection_record):
+            with self._lock:
+                self.connects += 1
+
+        def on_invalidate(dbapi_connection, connection_record, exception):
+            # в т.ч. соединения, отбракованные pre-ping
+            with self._lock:
+                self.invalidations += 1
+
+        def on_checkout(dbapi_connection, connection_record, connection_proxy):
+            usage = _current_usage.get()
+            if usage is not None:
+                usage.acquire()
+                connection_record.info["usage"] = usage
+
+        def on_checkin(dbapi_connection, connection_record):
+            usage = connection_record.info.pop("usage", None)
+            if usage is not None:
+                usage.release()
+
+        event.listen(engine, "connect", on_connect)
+        event.listen(engine, "invalidate", on_invalidate)
+        event.listen(engine, "checkout", on_checkout)
+        event.listen(engine, "checkin", on_checkin)
+
+    def stats(self, engine) -> dict:
+        pool = engine.pool
+        with self._lock:
+            waits = sorted(self._waits)
+            result = {
+                "pool": type(pool).__name__,
+                "checkouts": self.checkouts,
+                "connects": self.connects,
+                "invalidations": self.invalidations,
+                "timeouts": self.timeouts,
+                "wait_avg_ms": (self.wait_total / self.checkouts * 1000) if self.checkouts else 0,
+                "wait_p95_ms": waits[int(len(waits) * 0.95)] * 1000 if waits else 0,
+                "wait_max_ms": self.wait_max * 1000,
+            }
+        # размеры есть только у QueuePool
+        for key in ("size", "checkedin", "checkedout", "overflow"):
+            method = getattr(pool, key, None)
+            if callable(method):
+                result[key] = method()
+        return result
+
+
+def _metered_pool_class(pool_class, metrics: PoolMetrics):
+    """Подкласс пула, который меряет ожидание соединения (_do_get — выдача соединения пулом)."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = pool_class._do_get(self)
+        except PoolTimeoutError:
+            metrics.observe_wait(time.perf_counter() - started, timed_out=True)
+            raise
+        metrics.observe_wait(time.perf_counter() - started)
+        return connection
+
+    return type("Metered" + pool_class.__name__, (pool_class,), {"_do_get": _do_get})
+
+
+_ASYNC_DRIVERS = {
+    "postgresql": "asyncpg",
+    "sqlite": "aiosqlite",
+    "mysql": "aiomysql",
+}
+
+
+def _async_url(url: str) -> str:
+    parsed = make_url(url)
+    driver = _ASYNC_DRIVERS.get(parsed.get_backend_name())
+    if driver is None:
+        raise ValueError(f"Нет async-драйвера для {parsed.get_backend_name()}, задайте DATABASE_ASYNC_URL")
+    return str(parsed.set(drivername=f"{parsed.get_backend_name()}+{driver}"))
+
+
+def _engine_options(url: str, pool_size: int, max_overflow: int, metrics: PoolMetrics) -> dict:
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    driver = parsed.get_driver_name()
+    options = {
+        "echo": "debug" if DB_ECHO == "debug" else DB_ECHO in ("1", "true", "yes"),
+        "pool_pre_ping": DB_POOL_PRE_PING,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "poolclass": _metered_pool_class(parsed.get_dialect().get_pool_class(parsed), metrics),
+    }
+    if backend == "sqlite":
+        # сессию закрывает не тот поток threadpool, что с ней работал (зависимости FastAPI);
+        # одновременно соединение использует только одна сессия
+        options["connect_args"] = {"check_same_thread": False}
+    else:
+        options.update(pool_size=pool_size, max_overflow=max_overflow, pool_timeout=DB_POOL_TIMEOUT)
+    if DB_STATEMENT_TIMEOUT_MS and backend == "postgresql":
+        if driver == "asyncpg":
+            options["connect_args"] = {"server_settings": {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}}
+        else:
+            options["connect_args"] = {"options": f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"}
+    return options
+
+
+def _make_engine(url: str, name: str, pool_size: int, max_overflow: int, is_async: bool = False):
+    metrics = PoolMetrics(name)
+    options = _engine_options(url, pool_size, max_overflow, metrics)
+    if is_async:
+        async_engine = create_async_engine(url, **options)
+        # события пула и соединений — у синхронного ядра async engine
+        engine = async_engine.sync_engine
+    else:
+        engine = create_engine(url, **options)
+    metrics.attach(engine)
+    if DB_STATEMENT_TIMEOUT_MS and engine.dialect.name == "mysql":
+        @event.listens_for(engine, "connect")
+        def set_statement_timeout(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            cursor.execute(f"SET SESSION max_execution_time = {DB_STATEMENT_TIMEOUT_MS}")
+            cursor.close()
+    engine_metrics[name] = (engine, metrics)
+    return async_engine if is_async else engine
+
+
+engine_metrics = {}
+engine = _make_engine(DATABASE_URL, "write", DB_POOL_SIZE, DB_MAX_OVERFLOW)
+# у async engine свой пул: размеры те же, соединения с синхронным не делятся
+async_engine = _make_engine(
+    DATABASE_ASYNC_URL or _async_url(DATABASE_URL), "async write", DB_POOL_SIZE, DB_MAX_OVERFLOW, is_async=True
+)
+replicas = ReplicaSet([
+    Replica(
+        name,
+        _make_engine(url, name, DB_READ_POOL_SIZE, DB_READ_MAX_OVERFLOW),
+        _make_engine(_async_url(url), f"async {name}", DB_READ_POOL_SIZE, DB_READ_MAX_OVERFLOW, is_async=True),
+    )
+    for name, url in (
+        (f"read{i}" if len(DATABASE_READ_URLS) > 1 else "read", url)
+        for i, url in enumerate(DATABASE_READ_URLS, 1)
+    )
+])
 
-engine = create_engine(DATABASE_URL, echo=True)
 
 def init_db():
     SQLModel.metadata.create_all(engine)
 
-# зависимость для FastAPI
-def get_session():
-    with Session(engine) as session:
-        yield session
+
+def pool_stats() -> dict:
+    result = {name: metrics.stats(pooled) for name, (pooled, metrics) in engine_metrics.items()}
+    result["requests"] = request_usage_stats.stats()
+    result["replicas"] = replicas.stats()
+    return result
@@ -0,0 +1,240 @@
+"""
+Чтение с реплик.
+
+Тяжёлые чтения (списки, дашборд, статистика отчётов) помечаются @replica_read в репозиториях
+или идут через единицу работы read_only=True (get_read_uow); RoutingSession отправляет их запросы
+на одну из реплик DATABASE_READ_URLS. Запись, flush и любое чтение в транзакции, которая уже
+работает с основной базой (read-your-writes), остаются на основной.
+
+Реплика получает чтения, пока её задержка репликации не больше DB_REPLICA_MAX_LAG секунд;
+задержку раз в DB_REPLICA_CHECK_INTERVAL секунд проверяет ReplicaSet. Нет здоровых реплик —
+чтение идёт в основную базу (fallbacks в GET /health/db).
+"""
+import asyncio
+import functools
+import inspect
+import itertools
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import event, text
+from sqlalchemy.sql.dml import UpdateBase
+from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+# допустимое отставание реплики, с
+DB_REPLICA_MAX_LAG = float(os.getenv("DB_REPLICA_MAX_LAG", "5"))
+DB_REPLICA_CHECK_INTERVAL = float(os.getenv("DB_REPLICA_CHECK_INTERVAL", "5"))
+# свой запрос задержки (секунды одним числом), например для SQLite-копии с таблицей heartbeat:
+# SELECT strftime('%s','now') - max(ts) FROM replica_heartbeat
+DB_REPLICA_LAG_QUERY = os.getenv("DB_REPLICA_LAG_QUERY", "")
+
+_PG_LAG_QUERY = """
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+END
+"""
+
+# счётчик вложенных @replica_read в session.info
+_REPLICA_READS = "replica_reads"
+
+logger = logging.getLogger(__name__)
+
+
+def replication_lag(connection) -> float:
+    """Отставание реплики в секундах; ошибка — реплика недоступна или репликация остановлена."""
+    dialect = connection.dialect.name
+    if DB_REPLICA_LAG_QUERY:
+        value = connection.execute(text(DB_REPLICA_LAG_QUERY)).scalar()
+    elif dialect == "postgresql":
+        value = connection.execute(text(_PG_LAG_QUERY)).scalar()
+    elif dialect == "mysql":
+        row = connection.execute(text("SHOW REPLICA STATUS")).mappings().first()
+        if row is None:
+            return 0.0
+        value = row.get("Seconds_Behind_Source")
+        if value is None:
+            raise RuntimeError("репликация остановлена")
+    else:
+        # SQLite и прочие: репликации нет (локальная копия базы)
+        return 0.0
+    return float(value or 0)
+
+
+class Replica:
+    def __init__(self, name: str, engine, async_engine):
+        self.name = name
+        self.engine = engine
+        self.async_engine = async_engine
+        self.healthy = None  # до первой проверки
+        self.lag = None
+        self.error = None
+        self.reads = 0
+
+    def bind(self, use_async: bool):
+        # RoutingSession работает с синхронными Engine; у async — его синхронное ядро
+        return self.async_engine.sync_engine if use_async else self.engine
+
+
+class ReplicaSet:
+    """Реплики для чтения: проверка задержки, выбор здоровой (по кругу), fallback на основную базу."""
+
+    def __init__(self, replicas: list, max_lag: float = DB_REPLICA_MAX_LAG, interval: float = DB_REPLICA_CHECK_INTERVAL):
+        self.replicas = replicas
+        self.max_lag = max_lag
+        self.interval = interval
+        self.fallbacks = 0
+        self.checked_at = None
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        self._task = None
+
+    def check(self):
+        for replica in self.replicas:
+            try:
+                with replica.engine.connect() as connection:
+                    lag = replication_lag(connection)
+                replica.lag, replica.error = lag, None
+                healthy = lag <= self.max_lag
+            except Exception as e:
+                replica.lag, replica.error = None, str(e)
+                healthy = False
+            if healthy != replica.healthy:
+                logger.warning(
+                    "реплика %s: %s (задержка %s, %s)", replica.name,
+                    "принимает чтения" if healthy else "исключена", replica.lag, replica.error or "ok",
+                )
+            replica.healthy = healthy
+        self.checked_at = time.monotonic()
+
+    def choose(self, use_async: bool = False):
+        """Engine реплики для чтения; None — читать из основной базы."""
+        if not self.replicas:
+            return None
+        # без фоновой проверки (CLI) — проверяем лениво
+        if self._task is None and (self.checked_at is None or time.monotonic() - self.checked_at >= self.interval):
+            self.check()
+        healthy = [r for r in self.replicas if r.healthy]
+        with self._lock:
+            if not healthy:
+                self.fallbacks += 1
+                return None
+            replica = healthy[next(self._counter) % len(healthy)]
+            replica.reads += 1
+        return replica.bind(use_async)
+
+    async def start(self):
+        if self.replicas and self._task is None:
+            await run_in_threadpool(self.check)
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(max(self.interval, 1))
+            try:
+                await run_in_threadpool(self.check)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("проверка реплик не удалась")
+
+    def stats(self) -> dict:
+        return {
+            "max_lag": self.max_lag,
+            "fallbacks": self.fallbacks,
+            "checked_ago": round(time.monotonic() - self.checked_at, 1) if self.checked_at is not None else None,
+            "replicas": [
+                {"name": r.name, "healthy": r.healthy, "lag": r.lag, "error": r.error, "reads": r.reads}
+                for r in self.replicas
+            ],
+        }
+
+
+@contextmanager
+def replica_reads(session):
+    """Запросы внутри блока можно отправить на реплику (если session — RoutingSession)."""
+    info = session.info
+    info[_REPLICA_READS] = info.get(_REPLICA_READS, 0) + 1
+    try:
+        yield
+    finally:
+        info[_REPLICA_READS] -= 1
+
+
+def replica_read(method):
+    """Метод репозитория только читает и терпит отставание реплики: его запросы идут на реплику."""
+    if inspect.iscoroutinefunction(method):
+        @functools.wraps(method)
+        async def async_wrapper(self, *args, **kwargs):
+            with replica_reads(self.session):
+                return await method(self, *args, **kwargs)
+        return async_wrapper
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with replica_reads(self.session):
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+class RoutingSession(Session):
+    """
+    Session с маршрутизацией чтений на реплики. Реплика выбирается один раз на транзакцию
+    (одно соединение с ней), после commit/rollback — заново.
+    """
+
+    def __init__(self, *args, replicas: ReplicaSet = None, use_async: bool = False, read_only: bool = False, **kw):
+        super().__init__(*args, **kw)
+        self.replicas = replicas
+        self.use_async = use_async
+        self._replica = None
+        if read_only:
+            self.info[_REPLICA_READS] = 1
+        event.listen(self, "after_transaction_end", self._on_transaction_end)
+
+    def _on_transaction_end(self, session, transaction):
+        if transaction.parent is None:
+            self._replica = None
+
+    def _holds_primary(self) -> bool:
+        transaction = self._transaction
+        return transaction is not None and self.bind in transaction._connections
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kw):
+        if (
+            bind is None
+            and self.replicas is not None
+            and self.info.get(_REPLICA_READS)
+            and not self._flushing
+            and not isinstance(clause, UpdateBase)
+        ):
+            # транзакция уже пишет/читает в основной базе — её данные видны только там
+            if not self._holds_primary():
+                if self._replica is None:
+                    self._replica = self.replicas.choose(self.use_async)
+                if self._replica is not None:
+                    return self._replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kw)
+
+
+class RoutingAsyncSession(AsyncSession):
+    """AsyncSession поверх RoutingSession (AsyncSession sqlmodel 0.0.8 всегда создаёт обычную Session)."""
+
+    def __init__(self, bind, **kw):
+        kw["future"] = True
+        self.bind = bind
+        self.binds = None
+        self.sync_session = self._proxied = self._assign_proxied(
+            RoutingSession(bind=bind.sync_engine, use_async=True, **kw)
+        )
@@ -0,0 +1,177 @@
+"""
+Единица работы: одна сессия — и не больше одного соединения — на запрос API, задачу воркера или команду CLI.
+
+Репозитории только добавляют и flush-ат изменения, границы транзакций задаёт сервис:
+uow.commit() / uow.rollback(). Соединение берётся из пула при первом запросе к БД
+и возвращается при commit/rollback/close, поэтому перед долгим ожиданием (вызов ML сервиса)
+сервис завершает транзакцию.
+
+    def endpoint(uow: UnitOfWork = Depends(get_uow)): ...   # в API
+    with UnitOfWork() as uow: ...                            # в фоне и в CLI
+
+Async-эндпоинты работают через AsyncUnitOfWork (async engine: asyncpg / aiosqlite) и не
+занимают поток threadpool на время запросов в БД:
+
+    async def endpoint(uow: AsyncUnitOfWork = Depends(get_async_uow)): ...
+"""
+import logging
+import os
+import threading
+import time
+
+from sqlalchemy import event
+from app.config.db import async_engine, engine, replicas
+from app.config.replicas import RoutingAsyncSession, RoutingSession
+
+# транзакции дольше этого (мс) попадают в лог — соединение всё это время занято
+DB_SLOW_TRANSACTION_MS = float(os.getenv("DB_SLOW_TRANSACTION_MS", "1000"))
+
+logger = logging.getLogger(__name__)
+
+
+class UnitOfWork:
+    def __init__(self, bind=None, name: str = "", read_only: bool = False):
+        self.bind = bind if bind is not None else engine
+        self.name = name
+        # все чтения единицы работы — на реплику (если есть здоровая), а не только @replica_read
+        self.read_only = read_only
+        self._session = None
+        self._began_at = None
+        # сессия не потокобезопасна: параллельные задачи одной единицы работы обращаются к ней по очереди
+        self.lock = threading.RLock()
+        # трассировка использования соединения
+        self.transactions = 0
+        self.queries = 0
+        self.held_seconds = 0.0
+
+    @property
+    def session(self) -> RoutingSession:
+        if self._session is None:
+            # expire_on_commit=False: после commit объекты читаются без нового запроса в БД
+            self._session = RoutingSession(
+                self.bind, expire_on_commit=False, replicas=replicas, read_only=self.read_only
+            )
+            event.listen(self._session, "after_begin", self._on_begin)
+            event.listen(self._session, "after_transaction_end", self._on_end)
+            event.listen(self._session, "do_orm_execute", self._on_execute)
+        return self._session
+
+    def _on_begin(self, session, transaction, connection):
+        if self._began_at is None:
+            self._began_at = time.perf_counter()
+            self.transactions += 1
+
+    def _on_end(self, session, transaction):
+        if transaction.parent is not None or self._began_at is None:
+            return
+        held = time.perf_counter() - self._began_at
+        self._began_at = None
+        self.held_seconds += held
+        if held * 1000 >= DB_SLOW_TRANSACTION_MS:
+            logger.warning("%s: транзакция держала соединение %.0f мс", self.name or "uow", held * 1000)
+
+    def _on_execute(self, orm_execute_state):
+        self.queries += 1
+
+    def flush(self):
+        if self._session is not None:
+            self._session.flush()
+
+    def commit(self):
+        if self._session is not None:
+            self._session.commit()
+
+    def rollback(self):
+        if self._session is not None:
+            self._session.rollback()
+
+    def close(self):
+        """Незакоммиченное откатывается, соединение возвращается в пул."""
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+            logger.debug(
+                "%s: транзакций %d, запросов %d, соединение занято %.1f мс",
+                self.name or "uow", self.transactions, self.queries, self.held_seconds * 1000,
+            )
+
+    def __enter__(self) -> "UnitOfWork":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class AsyncUnitOfWork(UnitOfWork):
+    """
+    То же для async-кода: AsyncSession поверх async engine. Трассировка (транзакции, запросы,
+    медленные транзакции) — через синхронную сессию внутри AsyncSession.
+    """
+
+    def __init__(self, bind=None, name: str = "", read_only: bool = False):
+        super().__init__(bind if bind is not None else async_engine, name, read_only)
+
+    @property
+    def session(self) -> RoutingAsyncSession:
+        if self._session is None:
+            self._session = RoutingAsyncSession(
+                self.bind, expire_on_commit=False, replicas=replicas, read_only=self.read_only
+            )
+            sync_session = self._session.sync_session
+            event.listen(sync_session, "after_begin", self._on_begin)
+            event.listen(sync_session, "after_transaction_end", self._on_end)
+            event.listen(sync_session, "do_orm_execute", self._on_execute)
+        return self._session
+
+    async def run_sync(self, fn, *args, **kwargs):
+        """Синхронный код с Session (общие с sync-путём хелперы) на соединении этой единицы работы."""
+        return await self.session.run_sync(fn, *args, **kwargs)
+
+    async def flush(self):
+        if self._session is not None:
+            await self._session.flush()
+
+    async def commit(self):
+        if self._session is not None:
+            await self._session.commit()
+
+    async def rollback(self):
+        if self._session is not None:
+            await self._session.rollback()
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+            logger.debug(
+                "%s: транзакций %d, запросов %d, соединение занято %.1f мс",
+                self.name or "uow", self.transactions, self.queries, self.held_seconds * 1000,
+            )
+
+    def __enter__(self):
+        raise TypeError("AsyncUnitOfWork используется через async with")
+
+    async def __aenter__(self) -> "AsyncUnitOfWork":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+
+# зависимости для FastAPI
+def get_uow():
+    with UnitOfWork(name="request") as uow:
+        yield uow
+
+# только чтение: реплики из DATABASE_READ_URLS с учётом задержки, иначе основная база
+def get_read_uow():
+    with UnitOfWork(name="read request", read_only=True) as uow:
+        yield uow
+
+async def get_async_uow():
+    async with AsyncUnitOfWork(name="request") as uow:
+        yield uow
+
+async def get_async_read_uow():
+    async with AsyncUnitOfWork(name="read request", read_only=True) as uow:
+        yield uow
@@ -1,7 +1,14 @@
 from fastapi import FastAPI, Depends
-from sqlmodel import SQLModel, Session
-from app.config.db import engine, get_session, init_db
+from sqlmodel import SQLModel
+from app.config.db import engine, init_db, pool_stats, replicas
+from app.config.unit_of_work import UnitOfWork, get_uow
+from app.client.ml import ml_client
+from app.services.qc_job_service import qc_worker_pool
+from app.services.global_stats_service import global_stats_service
+from app.reports.fonts import register_fonts
+from app.services.report_export_service import report_process_pool
 from fastapi.middleware.cors import CORSMiddleware
+from app.api.db_usage import DBUsageMiddleware
 
 # Роутеры
 from app.api.auth.auth import router as auth_router
@@ -11,6 +18,7 @@ from app.api.exam import exams
 from app.api.qc import qc
 from app.api.ml import ml
 from app.api.dashboard import dashboard
+from app.api.imports import imports
 
 
 # Создаем приложение
@@ -18,8 +26,25 @@ app = FastAPI(title="AutoQC Chest Xray API")
 
 # Инициализация БД
 @app.on_event("startup")
-def on_startup():
+async def on_startup():
     init_db()
+    # проверка задержки реплик для чтения (DATABASE_READ_URLS)
+    await replicas.start()
+    # шрифты отчётов — один раз на процесс, а не на каждый PDF
+    register_fonts()
+    # фоновые воркеры очереди QC
+    await qc_worker_pool.start()
+    # снимок глобальной статистики для отчётов (обновляется раз в REPORT_STATS_TTL)
+    await global_stats_service.start()
+
+# Останавливаем воркеры и закрываем пул соединений к ML сервису
+@app.on_event("shutdown")
+async def on_shutdown():
+    await qc_worker_pool.stop()
+    await global_stats_service.stop()
+    await replicas.stop()
+    report_process_pool.shutdown()
+    await ml_client.aclose()
 
 # CORS
 app.add_middleware(
@@ -29,6 +54,8 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# соединения с БД на запрос (GET /health/db)
+app.add_middleware(DBUsageMiddleware)
 
 # Подключаем роутеры
 app.include_router(auth_router)
@@ -38,13 +65,19 @@ app.include_router(exams.router, prefix="/exams")
 app.include_router(qc.router, prefix="/qc")
 app.include_router(ml.router, prefix="/ml")
 app.include_router(dashboard.router, prefix="/dashboard")
+app.include_router(imports.router, prefix="/import")
 
 # Пример эндпоинта здоровья
 @app.get("/health")
 def health():
     return {"status": "ok"}
 
+# Пул соединений к БД: ожидание соединения, занятые/свободные соединения
+@app.get("/health/db")
+def health_db():
+    return pool_stats()
+
 # Пример использования сессии
 @app.get("/test-db")
-def test_db(session: Session = Depends(get_session)):
+def test_db(uow: UnitOfWork = Depends(get_uow)):
     return {"tables": list(SQLModel.metadata.tables.keys())}
@@ -0,0 +1,7 @@
+from enum import Enum
+
+class QCJobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
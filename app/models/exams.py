@@ -1,11 +1,18 @@
 from sqlmodel import SQLModel, Field, Relationship
+from sqlalchemy import Index
 from datetime import datetime
 from typing import Optional
 from .patients import Patient
 
 class Exam(SQLModel, table=True):
+    # keyset пагинация: общий список и список пациента
+    __table_args__ = (
+        Index("ix_exam_exam_date_id", "exam_date", "id"),
+        Index("ix_exam_patient_id_exam_date_id", "patient_id", "exam_date", "id"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
-    patient_id: str = Field(foreign_key="patient.patient_id")  # <-- строка, FK на patient.patient_id
+    patient_id: str = Field(foreign_key="patient.patient_id", index=True)  # <-- строка, FK на patient.patient_id
     accession_number: str = Field(sa_column_kwargs={"unique": True, "nullable": False})
     exam_date: datetime
     modality: str
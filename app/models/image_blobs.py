@@ -0,0 +1,15 @@
+from sqlmodel import SQLModel, Field
+from datetime import datetime
+
+class ImageBlob(SQLModel, table=True):
+    """
+    Изображение в контентно-адресуемом хранилище (app.storage), ключ — sha256 содержимого.
+    refcount — число ссылок из qcrecord (оригинал и исправленное считаются отдельно) и из кэша ML (mlcacheentry).
+    Блобы с refcount = 0 удаляет python -m app.cli.storage gc.
+    """
+    sha256: str = Field(primary_key=True, max_length=64)
+    size: int
+    extension: str = "png"  # формат хранения, см. app.storage.codecs
+    refcount: int = 0
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow, index=True)
@@ -0,0 +1,18 @@
+from sqlmodel import SQLModel, Field
+from datetime import datetime
+from typing import Optional
+
+class MLCacheEntry(SQLModel, table=True):
+    """
+    Результат ML сервиса для уже виденного изображения: ключ — sha256 загруженных байт и версия модели.
+    Изображения ответа — ссылки на блобы (app.storage); запись держит на них собственную ссылку,
+    поэтому gc не удалит их, пока запись в кэше.
+    """
+    image_sha256: str = Field(primary_key=True, max_length=64)
+    model_version: str = Field(primary_key=True)
+    ml_results_json: str
+    original_ref: Optional[str] = None
+    corrected_ref: Optional[str] = None
+    hits: int = 0
+    created_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+    last_used_at: datetime = Field(default_factory=datetime.utcnow, index=True)
@@ -1,8 +1,12 @@
 from sqlmodel import SQLModel, Field
+from sqlalchemy import Index
 from datetime import date, datetime
 from typing import Optional
 
 class Patient(SQLModel, table=True):
+    # keyset пагинация списка пациентов
+    __table_args__ = (Index("ix_patient_created_at_id", "created_at", "id"),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
     patient_id: str = Field(sa_column_kwargs={"unique": True, "nullable": False})
     first_name: str
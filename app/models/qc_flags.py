@@ -0,0 +1,18 @@
+from sqlmodel import SQLModel, Field
+from sqlalchemy import Index
+from typing import Optional
+
+# Виды флагов в ответе ML сервиса
+FLAG_KINDS = ("major", "critical", "severe")
+
+class QCFlag(SQLModel, table=True):
+    """Выставленный (true) флаг QC — строка на каждый флаг записи."""
+    __table_args__ = (
+        Index("ix_qcflag_kind_name", "kind", "name"),
+        Index("ix_qcflag_name_qc_id", "name", "qc_id"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    qc_id: int = Field(foreign_key="qcrecord.id", index=True)
+    kind: str  # major / critical / severe
+    name: str
@@ -0,0 +1,21 @@
+from sqlmodel import SQLModel, Field
+from datetime import datetime
+from typing import Optional
+from .enums.qc_job_status import QCJobStatus
+
+class QCJob(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    exam_id: int = Field(foreign_key="exam.id")
+    created_by: int = Field(foreign_key="user.id")
+    filename: str
+    content_type: str
+    upload_path: str  # загруженный файл ждёт воркера на диске
+    force: bool = False  # мимо кэша результатов ML
+    status: QCJobStatus = Field(default=QCJobStatus.QUEUED, index=True)
+    attempts: int = 0
+    not_before: Optional[datetime] = None  # повтор после ошибки — не раньше этого момента (backoff)
+    error: Optional[str] = None
+    qc_record_id: Optional[int] = None  # без FK: QC запись может быть удалена вместе с пациентом
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
@@ -1,18 +1,56 @@
 from sqlmodel import SQLModel, Field, Relationship
+from sqlalchemy import Column, JSON, Index
+from sqlalchemy.dialects.postgresql import JSONB
 from datetime import datetime
-from typing import Optional
+from typing import Optional, List
 from .exams import Exam
 from .users import User
+from .qc_flags import QCFlag, FLAG_KINDS
 import json
 
 class QCRecord(SQLModel, table=True):
+    # keyset пагинация и выбор последней записи исследования
+    __table_args__ = (
+        Index("ix_qcrecord_created_at_id", "created_at", "id"),
+        Index("ix_qcrecord_exam_id_created_at_id", "exam_id", "created_at", "id"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
-    exam_id: int = Field(foreign_key="exam.id")
+    exam_id: int = Field(foreign_key="exam.id", index=True)
     original_image_path: str
     corrected_image_path: Optional[str] = None
-    ml_results_json: Optional[str] = None  # JSON как строка
-    created_at: datetime = Field(default_factory=datetime.utcnow)
+    ml_results_json: Optional[str] = None  # JSON как строка (метаданные ML, без изображений)
+    created_at: datetime = Field(default_factory=datetime.utcnow, index=True)
     created_by: int = Field(foreign_key="user.id")
 
+    # Структурированные результаты ML — для фильтров и агрегатов в БД
+    status: Optional[str] = Field(default=None, index=True)
+    needs_fix: bool = Field(default=False, index=True)
+    qc_probs: Optional[dict] = Field(default=None, sa_column=Column(JSON().with_variant(JSONB(), "postgresql")))
+    applied_fixes: Optional[list] = Field(default=None, sa_column=Column(JSON))
+
     exam: Optional[Exam] = Relationship()
     creator: Optional[User] = Relationship()
+    flags: List[QCFlag] = Relationship(sa_relationship_kwargs={"cascade": "all, delete-orphan"})
+
+    def set_ml_results(self, data: dict):
+        """Раскладывает ответ ML сервиса по колонкам и флагам."""
+        self.ml_results_json = json.dumps(data)
+        self.status = data.get("status") or data.get("qc_status")
+        self.needs_fix = bool(data.get("needs_fix", False))
+        self.qc_probs = data.get("qc_probs") or data.get("probs") or {}
+        self.applied_fixes = data.get("applied_fixes") or []
+        flags = []
+        for kind in FLAG_KINDS:
+            values = data.get(f"{kind}_flags") or []
+            # major/critical приходят словарём {флаг: bool}, severe — списком
+            names = [name for name, value in values.items() if value] if isinstance(values, dict) else values
+            flags.extend(QCFlag(kind=kind, name=str(name)) for name in names)
+        self.flags = flags
+
+    def flags_of(self, kind: str) -> List[str]:
+        return [flag.name for flag in self.flags if flag.kind == kind]
+
+    @property
+    def severe_flags(self) -> List[str]:
+        return self.flags_of("severe")
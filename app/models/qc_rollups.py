@@ -0,0 +1,15 @@
+from sqlmodel import SQLModel, Field
+from datetime import date
+
+class QCRollup(SQLModel, table=True):
+    """
+    Счётчики QC по дню загрузки, аппарату и модальности.
+    kind: "status" (name — статус) или вид флага "major"/"critical"/"severe" (name — флаг).
+    Обновляется инкрементально при сохранении QCRecord, пересчёт — python -m app.cli.rollups rebuild.
+    """
+    day: date = Field(primary_key=True)
+    device: str = Field(primary_key=True)
+    modality: str = Field(primary_key=True)
+    kind: str = Field(primary_key=True)
+    name: str = Field(primary_key=True)
+    count: int = 0
@@ -1,9 +1,13 @@
 from sqlmodel import SQLModel, Field
+from sqlalchemy import Index
 from datetime import datetime
 from typing import Optional
 from .enums.user_roles import UserRole
 
 class User(SQLModel, table=True):
+    # keyset пагинация списка пользователей
+    __table_args__ = (Index("ix_user_created_at_id", "created_at", "id"),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
     username: str = Field(sa_column_kwargs={"unique": True, "nullable": False})
     full_name: Optional[str] = None
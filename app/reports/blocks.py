@@ -0,0 +1,182 @@
+"""
+Блоки двуязычного (RU/KK) QC отчёта. Блок — функция (ReportCanvas, ReportData),
+рисует свой раздел с текущей позиции и сдвигает курсор y.
+Отчёт собирается списком блоков, порядок и состав можно менять.
+"""
+import os
+from reportlab.lib.utils import ImageReader
+
+from app.reports.charts import draw_chart
+from app.reports.engine import ReportCanvas, ReportData, ReportEngine
+
+
+def header_block(page: ReportCanvas, data: ReportData):
+    page.heading("Отчёт QC / QC есеп (RU / KK)", size=14, gap=20)
+
+
+def patient_block(page: ReportCanvas, data: ReportData):
+    try:
+        page.heading("Информация о пациенте / Пациент туралы ақпарат")
+        patient = data.patient
+        if not patient:
+            page.line("Пациент: информация не найдена", gap=14)
+            return
+
+        first = patient.get('first_name') or ''
+        last = patient.get('last_name') or ''
+        patient_identifier = patient.get('patient_id') or ''
+        birth = patient.get('birth_date')
+        sex = patient.get('sex') or ''
+        # compute age at exam date if possible
+        age_str = ''
+        try:
+            exam_date = data.exam.get('exam_date')
+            if birth and exam_date:
+                age_str = f"{int((exam_date.date() - birth).days / 365.25)}"
+        except Exception:
+            age_str = ''
+
+        page.line(f"Имя / Аты: {first} {last}    (ID: {patient_identifier})")
+        if birth:
+            page.line(f"Дата рождения / Туған күні: {birth}    Возраст на момент исследования: {age_str}")
+        else:
+            page.line("Дата рождения / Туған күні: —")
+        page.line(f"Пол / Жынысы: {sex}", gap=14)
+    except Exception:
+        # if anything fails, continue silently
+        pass
+
+
+def charts_block(page: ReportCanvas, data: ReportData):
+    """Графики из снимка глобальной статистики: исследования по дням, модальности, тепловая карта."""
+    try:
+        charts = data.charts
+        content_w = page.width - 2 * page.margin
+        if "exams_per_day" in charts:
+            h = draw_chart(page.c, charts["exams_per_day"], page.margin, page.y, content_w, 120)
+            page.y -= (h + 8)
+
+        if "modality" in charts:
+            half_w = page.width / 2 - page.margin
+            h = draw_chart(page.c, charts["modality"], page.margin, page.y, half_w, 150)
+            h2 = 0
+            if "heatmap" in charts:
+                h2 = draw_chart(page.c, charts["heatmap"], page.margin + page.width / 2, page.y, half_w, 150)
+            page.y -= (max(h, h2) + 8)
+    except Exception:
+        # If drawing fails, continue without charts
+        pass
+
+
+def activity_block(page: ReportCanvas, data: ReportData):
+    stats = data.stats
+    total_exams = stats["total_exams"]
+    total_patients = stats["total_patients"]
+    avg_age = stats["avg_age"]
+
+    page.heading("1. Общая активность и нагрузка / Жалпылама белсенділік және жүктеме", gap=16)
+    page.line(f"Всего исследований: {total_exams} | Барлық зерттеулер: {total_exams}")
+    page.line(f"Всего пациентов: {total_patients} | Барлық пациенттер: {total_patients}")
+    if avg_age:
+        page.line(f"Средний возраст пациентов: {avg_age:.1f} лет | Пациенттердің орташа жасы: {avg_age:.1f}")
+    page.line(f"Среднее исследований на пациента: {stats['avg_exams_per_patient']:.2f}", gap=14)
+
+    # Modality / view / device
+    page.heading("По типам исследований / Зерттеу түрлері", size=11, gap=12)
+    for k, v in stats["modality_counts"][:10]:
+        page.line(f"{k}: {v}", gap=10)
+        page.ensure_space(50)
+
+
+def corrections_block(page: ReportCanvas, data: ReportData):
+    stats = data.stats
+    page.ensure_space(60)
+    page.heading("2. Аналитика по исправлениям / Түзетулерге талдау")
+    page.line(f"Всего QC записей: {stats['total_qc']}")
+    page.line(f"% исправленных (глобально): {stats['corrected_percent']:.1f}%")
+    page.line(f"% исправленных для этого исследования: {data.exam_corrected_percent:.1f}%")
+    if data.avg_before is not None:
+        page.line(f"Пример сравнения (lung_coverage_low) до: {data.avg_before:.3f}")
+    if data.avg_after is not None:
+        page.line(f"после: {data.avg_after:.3f}")
+
+
+def _draw_image(page: ReportCanvas, path: str, x: float, y_top: float, max_w: float, max_h: float) -> float:
+    img = ImageReader(path)
+    iw, ih = img.getSize()
+    scale = min(max_w / iw, max_h / ih, 1.0)
+    page.c.drawImage(img, x, y_top - ih * scale, width=iw * scale, height=ih * scale)
+    return ih * scale
+
+
+def qc_history_block(page: ReportCanvas, data: ReportData):
+    """История QC исследования: строка на запись и миниатюры (thumb) оригинала/исправленного."""
+    try:
+        if not data.qc_history:
+            return
+        page.ensure_space(120)
+        page.heading("История QC / QC тарихы", size=11)
+        for q in data.qc_history:
+            status = q['status'] or ('FIXED' if q['corrected_image_path'] else 'FLAGGED')
+            probs = q['qc_probs'] if isinstance(q['qc_probs'], dict) else {}
+            probs_str = ', '.join([f'{k}:{v:.2f}' for k, v in probs.items()][:3])
+            page.line(f"{q['created_at']} | by: {q['created_by']} | status: {status} | probs: {probs_str}", size=9, gap=10)
+            # include thumbnails (original / corrected) if available
+            thumb_h = 0
+            for path, x in ((q.get('original_thumb_path'), page.margin), (q.get('corrected_thumb_path'), page.margin + 90)):
+                if path and os.path.isfile(path):
+                    try:
+                        thumb_h = max(thumb_h, _draw_image(page, path, x, page.y, 80, 60))
+                    except Exception:
+                        pass
+            if thumb_h:
+                page.y -= (thumb_h + 8)
+            page.ensure_space(80)
+    except Exception:
+        pass
+
+
+def exam_block(page: ReportCanvas, data: ReportData):
+    page.ensure_space(50)
+    page.heading("Исследование / Зерттеу", size=11, gap=12)
+    page.line(f"Exam ID: {data.exam['id']}  | Accession: {data.exam.get('accession_number') or ''}")
+    patient = data.patient
+    if patient:
+        page.line(f"Пациент: {patient.get('first_name', '')} {patient.get('last_name', '')} ({patient.get('patient_id', '')})")
+
+
+def images_block(page: ReportCanvas, data: ReportData):
+    """Оригинал и исправленное изображение последней QC записи исследования (превью, не полный размер)."""
+    try:
+        if not data.qc_history:
+            return
+        latest = data.qc_history[-1]
+        img_max_w = (page.width - 2 * page.margin) / 2 - 8
+        img_max_h = 160
+        original, corrected = latest.get('original_preview_path'), latest.get('corrected_preview_path')
+        if original and os.path.isfile(original):
+            _draw_image(page, original, page.margin, page.y, img_max_w, img_max_h)
+        if corrected and os.path.isfile(corrected):
+            _draw_image(page, corrected, page.margin + img_max_w + 16, page.y, img_max_w, img_max_h)
+        page.y -= (img_max_h + 12)
+    except Exception:
+        pass
+
+
+QC_REPORT_BLOCKS = [
+    header_block,
+    patient_block,
+    charts_block,
+    activity_block,
+    corrections_block,
+    qc_history_block,
+    exam_block,
+    images_block,
+]
+
+qc_report_engine = ReportEngine(QC_REPORT_BLOCKS)
+
+
+def render_qc_report(data: ReportData) -> bytes:
+    """Точка входа для пула процессов (функция модуля — передаётся через pickle)."""
+    return qc_report_engine.render(data)
@@ -0,0 +1,155 @@
+"""
+Графики отчёта как векторные рисунки reportlab.
+
+Без pyplot: нет глобального состояния, нет растеризации в PNG и обратного
+декодирования — рисунок сразу попадает в PDF через renderPDF.draw.
+Виджеты (оси, столбцы, сектора) разворачиваются в простые фигуры (_flatten):
+готовый Drawing не меняется при отрисовке, его можно рисовать из нескольких
+потоков одновременно и передавать в другой процесс через pickle.
+"""
+from reportlab.lib import colors
+from reportlab.graphics import renderPDF
+from reportlab.graphics.shapes import Drawing, Group, Rect, String
+from reportlab.graphics.widgetbase import Widget
+from reportlab.graphics.charts.barcharts import VerticalBarChart
+from reportlab.graphics.charts.piecharts import Pie
+
+# Размеры под вёрстку A4 отчёта (точки): график по дням — во всю ширину, остальные — по половине
+DAY_CHART_SIZE = (480, 120)
+SIDE_CHART_SIZE = (240, 150)
+
+TITLE_FONT = "Helvetica-Bold"
+LABEL_FONT = "Helvetica"
+
+WEEKDAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+
+PIE_COLORS = [
+    colors.HexColor(c) for c in
+    ("#1f77b4", "#ff7f0e", "#2ca02c", "#d62728", "#9467bd", "#8c564b", "#e377c2", "#7f7f7f")
+]
+
+
+def _flatten_node(node):
+    while isinstance(node, Widget):
+        node = node.draw()
+    if isinstance(node, Group):
+        group = Group(*[_flatten_node(child) for child in node.contents])
+        group.transform = node.transform
+        return group
+    return node
+
+
+def _flatten(drawing: Drawing) -> Drawing:
+    return Drawing(drawing.width, drawing.height, *[_flatten_node(child) for child in drawing.contents])
+
+
+def _title(drawing: Drawing, text: str):
+    width, height = drawing.width, drawing.height
+    drawing.add(String(width / 2, height - 10, text, fontName=TITLE_FONT, fontSize=9, textAnchor="middle"))
+
+
+def exams_per_day_chart(counts_by_day: list, size: tuple = DAY_CHART_SIZE, days: int = 20) -> Drawing:
+    """Столбцы по последним days дням; counts_by_day — [(date, count)] по возрастанию даты."""
+    width, height = size
+    items = list(counts_by_day)[-days:]
+    drawing = Drawing(width, height)
+    _title(drawing, "Exams per day")
+
+    chart = VerticalBarChart()
+    chart.x, chart.y = 30, 30
+    chart.width, chart.height = width - 40, height - 48
+    chart.data = [[count for _, count in items]]
+    chart.bars[0].fillColor = PIE_COLORS[0]
+    chart.bars[0].strokeColor = None
+    chart.valueAxis.valueMin = 0
+    chart.valueAxis.labels.fontName = LABEL_FONT
+    chart.valueAxis.labels.fontSize = 6
+    chart.categoryAxis.categoryNames = [str(day) for day, _ in items]
+    chart.categoryAxis.labels.fontName = LABEL_FONT
+    chart.categoryAxis.labels.fontSize = 6
+    chart.categoryAxis.labels.angle = 45
+    chart.categoryAxis.labels.boxAnchor = "ne"
+    drawing.add(chart)
+    return _flatten(drawing)
+
+
+def modality_pie_chart(modality_counts: list, size: tuple = SIDE_CHART_SIZE, top: int = 8) -> Drawing:
+    """Доли модальностей; modality_counts — [(modality, count)] по убыванию."""
+    width, height = size
+    items = list(modality_counts)[:top]
+    total = sum(count for _, count in items) or 1
+    drawing = Drawing(width, height)
+    _title(drawing, "Modality distribution")
+
+    pie = Pie()
+    diameter = min(width - 80, height - 40)
+    pie.x, pie.y = (width - diameter) / 2, (height - 16 - diameter) / 2
+    pie.width = pie.height = diameter
+    pie.data = [count for _, count in items]
+    pie.labels = [f"{name} {count / total * 100:.1f}%" for name, count in items]
+    pie.simpleLabels = 1
+    pie.slices.strokeColor = colors.white
+    pie.slices.fontName = LABEL_FONT
+    pie.slices.fontSize = 6
+    for i in range(len(items)):
+        pie.slices[i].fillColor = PIE_COLORS[i % len(PIE_COLORS)]
+    drawing.add(pie)
+    return _flatten(drawing)
+
+
+def _hot(value: float) -> colors.Color:
+    """Палитра 'hot': чёрный -> красный -> жёлтый -> белый, value в [0, 1]."""
+    r = min(1.0, value * 3)
+    g = min(1.0, max(0.0, value * 3 - 1))
+    b = min(1.0, max(0.0, value * 3 - 2))
+    return colors.Color(r, g, b)
+
+
+def heatmap_chart(heatmap: dict, size: tuple = SIDE_CHART_SIZE) -> Drawing:
+    """Тепловая карта день недели (0 = пн) x час; heatmap — {(weekday, hour): count}."""
+    width, height = size
+    drawing = Drawing(width, height)
+    _title(drawing, "Heatmap (weekday x hour)")
+
+    left, bottom = 22, 22
+    cell_w = (width - left - 6) / 24
+    cell_h = (height - bottom - 18) / 7
+    peak = max(heatmap.values(), default=0) or 1
+    for dow in range(7):
+        # понедельник сверху, как у imshow
+        y = bottom + (6 - dow) * cell_h
+        for hour in range(24):
+            value = heatmap.get((dow, hour), 0) / peak
+            drawing.add(Rect(left + hour * cell_w, y, cell_w, cell_h, fillColor=_hot(value), strokeColor=None))
+        drawing.add(String(left - 3, y + cell_h / 2 - 2, WEEKDAYS[dow], fontName=LABEL_FONT, fontSize=5, textAnchor="end"))
+    for hour in range(0, 24, 3):
+        drawing.add(String(left + (hour + 0.5) * cell_w, bottom - 7, str(hour), fontName=LABEL_FONT, fontSize=5, textAnchor="middle"))
+    drawing.add(String(left + 12 * cell_w, 2, "Hour", fontName=LABEL_FONT, fontSize=6, textAnchor="middle"))
+    return drawing
+
+
+def build_charts(stats: dict) -> dict:
+    """Все графики раздела глобальной статистики: {имя: Drawing}."""
+    charts = {}
+    try:
+        if stats["counts_by_day"]:
+            charts["exams_per_day"] = exams_per_day_chart(stats["counts_by_day"])
+        if stats["modality_counts"]:
+            charts["modality"] = modality_pie_chart(stats["modality_counts"])
+            charts["heatmap"] = heatmap_chart(stats["heatmap"])
+    except Exception:
+        # если построить графики не удалось, отчёт выйдет без графиков
+        return {}
+    return charts
+
+
+def draw_chart(canvas, drawing: Drawing, x: float, y_top: float, max_w: float, max_h: float) -> float:
+    """Рисует Drawing в canvas под точкой (x, y_top), вписывая в max_w x max_h; возвращает высоту."""
+    scale = min(max_w / drawing.width, max_h / drawing.height, 1.0)
+    render_h = drawing.height * scale
+    canvas.saveState()
+    canvas.translate(x, y_top - render_h)
+    canvas.scale(scale, scale)
+    renderPDF.draw(drawing, canvas, 0, 0)
+    canvas.restoreState()
+    return render_h
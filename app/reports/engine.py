@@ -0,0 +1,95 @@
+"""
+Движок PDF отчётов QC.
+
+ReportData — всё, что нужно для отчёта, без сессии БД и ORM объектов
+(обычные dict/list, поэтому данные можно передать в другой процесс через pickle).
+ReportEngine рисует отчёт последовательностью блоков (app.reports.blocks) на ReportCanvas.
+Шрифты регистрируются один раз (app.reports.fonts.register_fonts).
+"""
+import io
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional
+
+from reportlab.pdfgen import canvas
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import cm
+
+from app.reports.fonts import register_fonts
+
+
+@dataclass
+class ReportData:
+    exam: dict
+    patient: Optional[dict]
+    # глобальная статистика и графики — из GlobalStatsSnapshot
+    stats: dict
+    charts: dict = field(default_factory=dict)
+    # QC записи исследования по времени создания: created_at, created_by, status, qc_probs,
+    # original_image_path, corrected_image_path и уменьшенные копии для рисования:
+    # original_thumb_path/corrected_thumb_path, original_preview_path/corrected_preview_path
+    qc_history: List[dict] = field(default_factory=list)
+    exam_corrected_percent: float = 0
+    avg_before: Optional[float] = None
+    avg_after: Optional[float] = None
+
+
+class ReportCanvas:
+    """Canvas с курсором y и шрифтами отчёта; блоки пишут сверху вниз."""
+
+    def __init__(self, c: canvas.Canvas, fonts: tuple, pagesize=A4, margin: float = 2 * cm):
+        self.c = c
+        self.font, self.font_bold = fonts
+        self.width, self.height = pagesize
+        self.margin = margin
+        self.y = self.height - margin
+
+    def new_page(self):
+        self.c.showPage()
+        self.y = self.height - self.margin
+
+    def ensure_space(self, needed: float):
+        if self.y < self.margin + needed:
+            self.new_page()
+
+    def heading(self, text: str, size: int = 12, gap: float = 14):
+        self.c.setFont(self.font_bold, size)
+        self.c.drawString(self.margin, self.y, text)
+        self.y -= gap
+
+    def line(self, text: str, size: int = 10, gap: float = 12, bold: bool = False):
+        self.c.setFont(self.font_bold if bold else self.font, size)
+        self.c.drawString(self.margin, self.y, text)
+        self.y -= gap
+
+    def line_ru_kk(self, ru: str, kk: str, size: int = 10, gap: float = 12):
+        """Строка в две колонки: RU слева (жирным), KK справа."""
+        self.c.setFont(self.font_bold, size)
+        self.c.drawString(self.margin, self.y, ru)
+        self.c.setFont(self.font, size)
+        self.c.drawString(self.width / 2, self.y, kk)
+        self.y -= gap
+
+
+Block = Callable[[ReportCanvas, ReportData], None]
+
+
+class ReportEngine:
+    """
+    Отчёт = шаблон страницы (размер, поля) + список блоков.
+    Экземпляр без состояния между вызовами render(), один на процесс.
+    """
+
+    def __init__(self, blocks: List[Block], pagesize=A4, margin: float = 2 * cm):
+        self.blocks = list(blocks)
+        self.pagesize = pagesize
+        self.margin = margin
+
+    def render(self, data: ReportData) -> bytes:
+        buf = io.BytesIO()
+        c = canvas.Canvas(buf, pagesize=self.pagesize)
+        page = ReportCanvas(c, register_fonts(), self.pagesize, self.margin)
+        for block in self.blocks:
+            block(page, data)
+        c.showPage()
+        c.save()
+        return buf.getvalue()
@@ -0,0 +1,51 @@
+import os
+import threading
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+
+_WINDOWS_FONTS = os.path.join(os.environ.get('WINDIR', 'C:\\Windows'), 'Fonts')
+
+# TTF шрифты с кириллицей (RU/KK), в порядке предпочтения
+FONT_CANDIDATES = [
+    # common cross-platform
+    ("DejaVuSans", "DejaVuSans-Bold", "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf"),
+    # Windows common fonts
+    ("Arial", "Arial-Bold", os.path.join(_WINDOWS_FONTS, 'arial.ttf'), os.path.join(_WINDOWS_FONTS, 'arialbd.ttf')),
+    ("Tahoma", "Tahoma-Bold", os.path.join(_WINDOWS_FONTS, 'tahoma.ttf'), os.path.join(_WINDOWS_FONTS, 'tahomabd.ttf')),
+    ("Verdana", "Verdana-Bold", os.path.join(_WINDOWS_FONTS, 'verdana.ttf'), os.path.join(_WINDOWS_FONTS, 'verdanab.ttf')),
+]
+
+# Встроенные шрифты reportlab — если ничего не нашли (кириллица может не отображаться)
+FALLBACK_FONTS = ("Helvetica", "Helvetica-Bold")
+
+_lock = threading.Lock()
+_fonts = None
+
+
+def register_fonts() -> tuple:
+    """
+    Ищет и регистрирует шрифты один раз на процесс; возвращает (обычный, жирный).
+    Повторные вызовы не трогают диск — разбор TTF файлов стоит дорого.
+    """
+    global _fonts
+    if _fonts is not None:
+        return _fonts
+    with _lock:
+        if _fonts is not None:
+            return _fonts
+        fonts = FALLBACK_FONTS
+        for base_name, bold_name, path_regular, path_bold in FONT_CANDIDATES:
+            try:
+                if not os.path.isfile(path_regular):
+                    continue
+                pdfmetrics.registerFont(TTFont(base_name, path_regular))
+                if os.path.isfile(path_bold):
+                    pdfmetrics.registerFont(TTFont(bold_name, path_bold))
+                    fonts = (base_name, bold_name)
+                else:
+                    fonts = (base_name, base_name)
+                break
+            except Exception:
+                continue
+        _fonts = fonts
+        return _fonts
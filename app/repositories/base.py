@@ -1,4 +1,5 @@
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from typing import Type, TypeVar, Generic, List, Optional
 
 ModelType = TypeVar("ModelType")
@@ -16,16 +17,44 @@ class BaseRepository(Generic[ModelType]):
 
     def create(self, obj: ModelType) -> ModelType:
         self.session.add(obj)
-        self.session.commit()
+        self.session.flush()
         self.session.refresh(obj)
         return obj
 
     def update(self, obj: ModelType) -> ModelType:
         self.session.add(obj)
-        self.session.commit()
+        self.session.flush()
         self.session.refresh(obj)
         return obj
 
     def delete(self, obj: ModelType):
         self.session.delete(obj)
-        self.session.commit()
+        self.session.flush()
+
+
+class AsyncBaseRepository(Generic[ModelType]):
+    def __init__(self, model: Type[ModelType], session: AsyncSession):
+        self.model = model
+        self.session = session
+
+    async def get(self, id: int) -> Optional[ModelType]:
+        return await self.session.get(self.model, id)
+
+    async def get_all(self) -> List[ModelType]:
+        return (await self.session.exec(select(self.model))).all()
+
+    async def create(self, obj: ModelType) -> ModelType:
+        self.session.add(obj)
+        await self.session.flush()
+        await self.session.refresh(obj)
+        return obj
+
+    async def update(self, obj: ModelType) -> ModelType:
+        self.session.add(obj)
+        await self.session.flush()
+        await self.session.refresh(obj)
+        return obj
+
+    async def delete(self, obj: ModelType):
+        await self.session.delete(obj)
+        await self.session.flush()
@@ -0,0 +1,85 @@
+import csv
+import io
+from sqlmodel import Session, select
+from sqlalchemy import update
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from typing import Iterable, List
+
+_UPSERT_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+class BulkImportRepository:
+    """
+    Пакетная запись строк (словарей колонок) с upsert по уникальному ключу.
+    PostgreSQL + psycopg2 — COPY во временную таблицу и один INSERT ... ON CONFLICT,
+    SQLite/PostgreSQL — INSERT ... ON CONFLICT через executemany, MySQL — ON DUPLICATE KEY.
+    Commit — за вызывающим.
+    """
+
+    def __init__(self, session: Session):
+        self.session = session
+
+    def existing(self, table, key: str, keys: Iterable, *columns: str) -> dict:
+        """{ключ: строка (key, *columns)} для уже существующих ключей."""
+        keys = list(keys)
+        if not keys:
+            return {}
+        query = select(table.c[key], *[table.c[c] for c in columns]).where(table.c[key].in_(keys))
+        return {row[0]: row for row in self.session.execute(query).all()}
+
+    def upsert(self, table, key: str, rows: List[dict], update_columns: List[str], copy: bool = True):
+        if not rows:
+            return
+        dialect = self.session.get_bind().dialect
+        if copy and dialect.name == "postgresql" and dialect.driver == "psycopg2":
+            self._copy_upsert(table, key, rows, update_columns)
+            return
+        dialect_insert = _UPSERT_INSERTS.get(dialect.name)
+        if dialect_insert is not None:
+            stmt = dialect_insert(table)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[key], set_={c: stmt.excluded[c] for c in update_columns}
+            )
+            self.session.execute(stmt, rows)
+            return
+        if dialect.name == "mysql":
+            stmt = mysql.insert(table)
+            stmt = stmt.on_duplicate_key_update({c: stmt.inserted[c] for c in update_columns})
+            self.session.execute(stmt, rows)
+            return
+        # прочие СУБД: существующие ключи — UPDATE, остальные — INSERT
+        existing = self.existing(table, key, [r[key] for r in rows])
+        for row in rows:
+            if row[key] in existing:
+                values = {c: row[c] for c in update_columns}
+                self.session.execute(update(table).where(table.c[key] == row[key]).values(**values))
+            else:
+                self.session.execute(table.insert().values(**row))
+
+    def _copy_upsert(self, table, key: str, rows: List[dict], update_columns: List[str]):
+        columns = list(rows[0])
+        names = ", ".join(f'"{c}"' for c in columns)
+        temp = f"_import_{table.name}"
+        connection = self.session.connection()
+        # временная таблица живёт до конца транзакции (commit пачки)
+        connection.exec_driver_sql(
+            f'CREATE TEMP TABLE {temp} ON COMMIT DROP AS SELECT {names} FROM "{table.name}" WITH NO DATA'
+        )
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow([row[c] for c in columns])
+        buffer.seek(0)
+        # COPY идёт через DBAPI-соединение той же транзакции
+        cursor = connection.connection.cursor()
+        try:
+            cursor.copy_expert(f"COPY {temp} ({names}) FROM STDIN WITH (FORMAT csv)", buffer)
+        finally:
+            cursor.close()
+
+        assignments = ", ".join(f'"{c}" = EXCLUDED."{c}"' for c in update_columns)
+        connection.exec_driver_sql(
+            f'INSERT INTO "{table.name}" ({names}) SELECT {names} FROM {temp} '
+            f'ON CONFLICT ("{key}") DO UPDATE SET {assignments}'
+        )
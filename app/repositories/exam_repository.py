@@ -1,7 +1,13 @@
 from sqlmodel import Session, select
-from typing import List, Optional
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import func, and_
+from sqlalchemy.orm import selectinload
+from typing import List, Optional, Tuple
+from app.config.replicas import replica_read
 from app.models.exams import Exam
-from datetime import datetime
+from app.models.qc_records import QCRecord
+from app.repositories.pagination import keyset, page, page_size
+from app.repositories.filters import Period, period
 
 class ExamRepository:
     def __init__(self, session: Session):
@@ -9,25 +15,135 @@ class ExamRepository:
 
     def create(self, exam: Exam) -> Exam:
         self.session.add(exam)
-        self.session.commit()
+        self.session.flush()
         self.session.refresh(exam)
         return exam
 
     def get(self, exam_id: int) -> Optional[Exam]:
         return self.session.get(Exam, exam_id)
 
+    @staticmethod
+    def _filtered(
+        query,
+        patient_id: Optional[str] = None,
+        date_from: Period = None,
+        date_to: Period = None
+    ):
+        if patient_id is not None:
+            query = query.where(Exam.patient_id == patient_id)
+        query = query.where(*period(Exam.exam_date, date_from, date_to))
+        return query
+
+    @replica_read
     def list(
         self,
         patient_id: Optional[str] = None,
-        date_from: Optional[datetime] = None,
-        date_to: Optional[datetime] = None
+        date_from: Period = None,
+        date_to: Period = None
     ) -> List[Exam]:
-        query = select(Exam)
-        if patient_id is not None:
-            query = query.where(Exam.patient_id == patient_id)
-        if date_from is not None:
-            query = query.where(Exam.exam_date >= date_from)
-        if date_to is not None:
-            query = query.where(Exam.exam_date <= date_to)
+        query = self._filtered(select(Exam), patient_id, date_from, date_to)
         result = self.session.exec(query)
         return result.all()
+
+    @replica_read
+    def list_ids(
+        self,
+        exam_ids: Optional[List[int]] = None,
+        patient_id: Optional[str] = None,
+        date_from: Period = None,
+        date_to: Period = None,
+        limit: Optional[int] = None,
+    ) -> List[int]:
+        """id существующих исследований по списку и/или фильтрам, по дате исследования."""
+        query = self._filtered(select(Exam.id), patient_id, date_from, date_to)
+        if exam_ids is not None:
+            query = query.where(Exam.id.in_(exam_ids))
+        query = query.order_by(Exam.exam_date, Exam.id)
+        if limit:
+            query = query.limit(limit)
+        return self.session.exec(query).all()
+
+    @replica_read
+    def list_with_latest_qc(
+        self,
+        patient_id: Optional[str] = None,
+        date_from: Period = None,
+        date_to: Period = None,
+        cursor: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> Tuple[List[Tuple[Exam, Optional[QCRecord]]], Optional[str]]:
+        """
+        Страница исследований (keyset по (exam_date, id)) вместе с последней QC записью каждого.
+        Два запроса: страница исследований, затем последние QC записи только для неё
+        (row_number() по exam_id), плюс один selectin-запрос флагов.
+        """
+        limit = page_size(limit)
+        exams = self.session.exec(self._page_query(patient_id, date_from, date_to, cursor, limit)).all()
+        exams, next_cursor = page(exams, limit, lambda e: (e.exam_date, e.id))
+        if not exams:
+            return [], next_cursor
+        records = self.session.exec(self._latest_qc_query([e.id for e in exams])).all()
+        return self._with_latest(exams, records), next_cursor
+
+    @classmethod
+    def _page_query(cls, patient_id, date_from, date_to, cursor: Optional[str], limit: int):
+        query = cls._filtered(select(Exam), patient_id, date_from, date_to)
+        return keyset(query, (Exam.exam_date, Exam.id), cursor, limit)
+
+    @staticmethod
+    def _latest_qc_query(exam_ids: List[int]):
+        latest = (
+            select(
+                QCRecord.id.label("qc_id"),
+                func.row_number().over(
+                    partition_by=QCRecord.exam_id,
+                    order_by=(QCRecord.created_at.desc(), QCRecord.id.desc()),
+                ).label("rn"),
+            )
+            .where(QCRecord.exam_id.in_(exam_ids))
+            .subquery()
+        )
+        return (
+            select(QCRecord)
+            .join(latest, and_(latest.c.qc_id == QCRecord.id, latest.c.rn == 1))
+            .options(selectinload(QCRecord.flags))
+        )
+
+    @staticmethod
+    def _with_latest(exams: List[Exam], records: List[QCRecord]) -> List[Tuple[Exam, Optional[QCRecord]]]:
+        by_exam = {r.exam_id: r for r in records}
+        return [(e, by_exam.get(e.id)) for e in exams]
+
+
+class AsyncExamRepository:
+    """Исследования для async-эндпоинтов; запросы — общие с ExamRepository."""
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def create(self, exam: Exam) -> Exam:
+        self.session.add(exam)
+        await self.session.flush()
+        await self.session.refresh(exam)
+        return exam
+
+    async def get(self, exam_id: int) -> Optional[Exam]:
+        return await self.session.get(Exam, exam_id)
+
+    @replica_read
+    async def list_with_latest_qc(
+        self,
+        patient_id: Optional[str] = None,
+        date_from: Period = None,
+        date_to: Period = None,
+        cursor: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> Tuple[List[Tuple[Exam, Optional[QCRecord]]], Optional[str]]:
+        limit = page_size(limit)
+        query = ExamRepository._page_query(patient_id, date_from, date_to, cursor, limit)
+        exams = (await self.session.exec(query)).all()
+        exams, next_cursor = page(exams, limit, lambda e: (e.exam_date, e.id))
+        if not exams:
+            return [], next_cursor
+        records = (await self.session.exec(ExamRepository._latest_qc_query([e.id for e in exams]))).all()
+        return ExamRepository._with_latest(exams, records), next_cursor
@@ -0,0 +1,30 @@
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Optional, Union
+
+# период списков: дата (весь день) или момент времени
+Period = Optional[Union[datetime, date]]
+
+
+def _as_naive_utc(value: datetime) -> datetime:
+    # колонки времени — без часового пояса, в UTC (datetime.utcnow)
+    if value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def period(column, date_from: Period = None, date_to: Period = None) -> list:
+    """
+    Условия периода по колонке времени. Значения — datetime/date, не строки
+    (asyncpg не принимает строку в параметр timestamp). date_to без времени включает весь день.
+    """
+    conditions = []
+    if date_from is not None:
+        if not isinstance(date_from, datetime):
+            date_from = datetime.combine(date_from, time())
+        conditions.append(column >= _as_naive_utc(date_from))
+    if date_to is not None:
+        if isinstance(date_to, datetime):
+            conditions.append(column <= _as_naive_utc(date_to))
+        else:
+            conditions.append(column < datetime.combine(date_to + timedelta(days=1), time()))
+    return conditions
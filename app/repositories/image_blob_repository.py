@@ -0,0 +1,78 @@
+from sqlmodel import Session, select, delete
+from sqlalchemy import update
+from sqlalchemy.dialects import postgresql, sqlite
+from app.models.image_blobs import ImageBlob
+from datetime import datetime
+from typing import List, Tuple
+
+_UPSERT_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+class ImageBlobRepository:
+    """Счётчики ссылок на блобы; все методы работают в текущей транзакции вызывающего."""
+
+    def __init__(self, session: Session):
+        self.session = session
+
+    def acquire(self, sha256: str, size: int, extension: str = "png"):
+        """+1 ссылка; строка создаётся при первой. В PostgreSQL ждёт блокировку строки, если её удаляет gc."""
+        now = datetime.utcnow()
+        dialect_insert = _UPSERT_INSERTS.get(self.session.get_bind().dialect.name)
+        if dialect_insert is not None:
+            stmt = dialect_insert(ImageBlob).values(
+                sha256=sha256, size=size, extension=extension, refcount=1, created_at=now, updated_at=now
+            )
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["sha256"],
+                set_={"refcount": ImageBlob.refcount + 1, "updated_at": now},
+            )
+            self.session.exec(stmt)
+            return
+        # прочие СУБД: обычный read-modify-write
+        blob = self.session.get(ImageBlob, sha256)
+        if blob is None:
+            self.session.add(ImageBlob(
+                sha256=sha256, size=size, extension=extension, refcount=1, created_at=now, updated_at=now
+            ))
+        else:
+            blob.refcount += 1
+            blob.updated_at = now
+            self.session.add(blob)
+
+    def add_reference(self, sha256: str) -> bool:
+        """+1 ссылка на существующий блоб; False — строки нет."""
+        result = self.session.exec(
+            update(ImageBlob)
+            .where(ImageBlob.sha256 == sha256)
+            .values(refcount=ImageBlob.refcount + 1, updated_at=datetime.utcnow())
+        )
+        return result.rowcount == 1
+
+    def release(self, sha256: str):
+        """-1 ссылка. Сам блоб не удаляется — это делает gc, см. delete_unreferenced."""
+        self.session.exec(
+            update(ImageBlob)
+            .where(ImageBlob.sha256 == sha256, ImageBlob.refcount > 0)
+            .values(refcount=ImageBlob.refcount - 1, updated_at=datetime.utcnow())
+        )
+
+    def unreferenced(self, before: datetime, limit: int = 1000) -> List[Tuple[str, str]]:
+        """(sha256, расширение) блобов без ссылок."""
+        query = (
+            select(ImageBlob.sha256, ImageBlob.extension)
+            .where(ImageBlob.refcount == 0, ImageBlob.updated_at < before)
+            .limit(limit)
+        )
+        return list(self.session.exec(query).all())
+
+    def delete_unreferenced(self, sha256: str) -> bool:
+        """Удаляет строку, только если ссылок всё ещё нет (acquire мог успеть между выборкой и удалением)."""
+        result = self.session.exec(
+            delete(ImageBlob).where(ImageBlob.sha256 == sha256, ImageBlob.refcount == 0)
+        )
+        return result.rowcount == 1
+
+    def known(self, hashes: List[str]) -> set:
+        if not hashes:
+            return set()
+        return set(self.session.exec(select(ImageBlob.sha256).where(ImageBlob.sha256.in_(hashes))).all())
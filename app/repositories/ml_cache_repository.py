@@ -0,0 +1,65 @@
+from sqlmodel import Session, select, delete, update
+from sqlalchemy import func
+from sqlalchemy.dialects import postgresql, sqlite
+from app.models.ml_cache_entries import MLCacheEntry
+from datetime import datetime
+from typing import List, Optional
+
+_UPSERT_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+class MLCacheRepository:
+    def __init__(self, session: Session):
+        self.session = session
+
+    def get(self, image_sha256: str, model_version: str, created_after: datetime) -> Optional[MLCacheEntry]:
+        query = select(MLCacheEntry).where(
+            MLCacheEntry.image_sha256 == image_sha256,
+            MLCacheEntry.model_version == model_version,
+            MLCacheEntry.created_at >= created_after,
+        )
+        return self.session.exec(query).first()
+
+    def touch(self, entry: MLCacheEntry):
+        self.session.exec(
+            update(MLCacheEntry)
+            .where(MLCacheEntry.image_sha256 == entry.image_sha256, MLCacheEntry.model_version == entry.model_version)
+            .values(hits=MLCacheEntry.hits + 1, last_used_at=datetime.utcnow())
+        )
+
+    def insert_if_absent(self, entry: MLCacheEntry) -> bool:
+        """True — запись добавлена; False — такая уже есть (параллельная загрузка того же файла)."""
+        values = entry.dict()
+        dialect_insert = _UPSERT_INSERTS.get(self.session.get_bind().dialect.name)
+        if dialect_insert is not None:
+            stmt = dialect_insert(MLCacheEntry).values(**values).on_conflict_do_nothing(
+                index_elements=["image_sha256", "model_version"]
+            )
+            return self.session.exec(stmt).rowcount == 1
+        # прочие СУБД: обычный read-then-insert
+        if self.session.get(MLCacheEntry, (entry.image_sha256, entry.model_version)) is not None:
+            return False
+        self.session.add(MLCacheEntry(**values))
+        self.session.flush()
+        return True
+
+    def count(self) -> int:
+        return self.session.exec(select(func.count()).select_from(MLCacheEntry)).one()
+
+    def expired(self, created_before: datetime, limit: int) -> List[MLCacheEntry]:
+        query = select(MLCacheEntry).where(MLCacheEntry.created_at < created_before).limit(limit)
+        return list(self.session.exec(query).all())
+
+    def least_recently_used(self, limit: int) -> List[MLCacheEntry]:
+        query = select(MLCacheEntry).order_by(MLCacheEntry.last_used_at).limit(limit)
+        return list(self.session.exec(query).all())
+
+    def delete(self, entry: MLCacheEntry) -> bool:
+        """Удаляет запись, если её ещё не удалил параллельный вызов; True — удалили мы."""
+        result = self.session.exec(
+            delete(MLCacheEntry).where(
+                MLCacheEntry.image_sha256 == entry.image_sha256,
+                MLCacheEntry.model_version == entry.model_version,
+            )
+        )
+        return result.rowcount == 1
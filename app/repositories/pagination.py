@@ -0,0 +1,65 @@
+import os
+import json
+import base64
+from datetime import datetime
+from typing import Optional, Sequence
+from sqlalchemy import and_, or_
+
+# Размер страницы списков по умолчанию и верхняя граница для ?limit=
+PAGE_SIZE_DEFAULT = int(os.getenv("PAGE_SIZE_DEFAULT", "50"))
+PAGE_SIZE_MAX = int(os.getenv("PAGE_SIZE_MAX", "500"))
+
+
+class InvalidCursorError(ValueError):
+    pass
+
+
+def page_size(limit: Optional[int]) -> int:
+    if not limit or limit < 1:
+        return PAGE_SIZE_DEFAULT
+    return min(limit, PAGE_SIZE_MAX)
+
+
+def encode_cursor(values: Sequence) -> str:
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> list:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list) or len(values) != size:
+            raise ValueError
+        # первый ключ — всегда дата (created_at / exam_date), последний — id
+        values[0] = datetime.fromisoformat(values[0])
+        values[-1] = int(values[-1])
+        return values
+    except (ValueError, TypeError):
+        raise InvalidCursorError("Некорректный курсор страницы")
+
+
+def keyset(query, columns: Sequence, cursor: Optional[str], limit: int):
+    """
+    Keyset (seek) пагинация: сортировка по columns по убыванию
+    и условие «строго после курсора» вместо OFFSET — стоимость страницы
+    не растёт с её номером и опирается на составной индекс по тем же колонкам.
+    Запрашивается limit + 1 строка, чтобы понять, есть ли следующая страница.
+    """
+    if cursor:
+        values = decode_cursor(cursor, len(columns))
+        # (a, b) < (va, vb)  ->  a < va OR (a = va AND b < vb)
+        conditions = []
+        for i, column in enumerate(columns):
+            equal = [columns[j] == values[j] for j in range(i)]
+            conditions.append(and_(*equal, column < values[i]))
+        query = query.where(or_(*conditions))
+    return query.order_by(*[column.desc() for column in columns]).limit(limit + 1)
+
+
+def page(rows: list, limit: int, key) -> tuple:
+    """Отрезает лишнюю строку, возвращает (строки, next_cursor)."""
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(key(rows[-1]))
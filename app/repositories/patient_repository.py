@@ -1,29 +1,37 @@
-from sqlmodel import Session, select
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from app.models.patients import Patient
+from app.repositories.pagination import keyset, page, page_size
 
 class PatientRepository:
-    def __init__(self, session: Session):
+    def __init__(self, session: AsyncSession):
         self.session = session
 
-    def create(self, patient: Patient) -> Patient:
+    async def create(self, patient: Patient) -> Patient:
         self.session.add(patient)
-        self.session.commit()
-        self.session.refresh(patient)
+        await self.session.flush()
+        await self.session.refresh(patient)
         return patient
 
-    def get_all(self) -> list[Patient]:
-        return self.session.exec(select(Patient)).all()
+    async def get_all(self) -> list[Patient]:
+        return (await self.session.exec(select(Patient))).all()
 
-    def get_by_id(self, patient_id: str) -> Patient | None:
+    async def list_page(self, cursor: str | None = None, limit: int | None = None) -> tuple[list[Patient], str | None]:
+        """Страница пациентов, новые первыми: keyset по (created_at, id)."""
+        limit = page_size(limit)
+        query = keyset(select(Patient), (Patient.created_at, Patient.id), cursor, limit)
+        return page((await self.session.exec(query)).all(), limit, lambda p: (p.created_at, p.id))
+
+    async def get_by_id(self, patient_id: str) -> Patient | None:
         statement = select(Patient).where(Patient.patient_id == patient_id)
-        return self.session.exec(statement).first()
+        return (await self.session.exec(statement)).first()
 
-    def update(self, patient: Patient) -> Patient:
+    async def update(self, patient: Patient) -> Patient:
         self.session.add(patient)
-        self.session.commit()
-        self.session.refresh(patient)
+        await self.session.flush()
+        await self.session.refresh(patient)
         return patient
 
-    def delete(self, patient: Patient):
-        self.session.delete(patient)
-        self.session.commit()
+    async def delete(self, patient: Patient):
+        await self.session.delete(patient)
+        await self.session.flush()
@@ -0,0 +1,95 @@
+from sqlmodel import Session, select, update, delete
+from sqlalchemy import func, or_
+from app.models.qc_jobs import QCJob
+from app.models.enums.qc_job_status import QCJobStatus
+from datetime import datetime
+from typing import Dict, List, Optional
+
+class QCJobRepository:
+    def __init__(self, session: Session):
+        self.session = session
+
+    def create(self, job: QCJob) -> QCJob:
+        self.session.add(job)
+        self.session.flush()
+        self.session.refresh(job)
+        return job
+
+    def get(self, job_id: int) -> Optional[QCJob]:
+        return self.session.get(QCJob, job_id)
+
+    def claim_next(self) -> Optional[QCJob]:
+        """
+        Забирает самую старую задачу из очереди (вызывающий сразу делает commit).
+        FOR UPDATE SKIP LOCKED работает в Postgres; условный UPDATE по статусу
+        гарантирует, что задачу не заберут два воркера и на SQLite.
+        """
+        now = datetime.utcnow()
+        candidate = self.session.exec(
+            select(QCJob.id)
+            .where(QCJob.status == QCJobStatus.QUEUED, or_(QCJob.not_before.is_(None), QCJob.not_before <= now))
+            .order_by(QCJob.id)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        ).first()
+        if candidate is None:
+            return None
+
+        result = self.session.exec(
+            update(QCJob)
+            .where(QCJob.id == candidate, QCJob.status == QCJobStatus.QUEUED)
+            .values(status=QCJobStatus.RUNNING, started_at=now, attempts=QCJob.attempts + 1)
+        )
+        if result.rowcount != 1:
+            return None
+        return self.get(candidate)
+
+    def finish(
+        self, job: QCJob, status: QCJobStatus, qc_record_id: int = None, error: str = None, not_before: datetime = None
+    ) -> QCJob:
+        job.status = status
+        job.not_before = not_before
+        job.qc_record_id = qc_record_id
+        job.error = error
+        job.finished_at = datetime.utcnow() if status in (QCJobStatus.DONE, QCJobStatus.FAILED) else None
+        self.session.add(job)
+        self.session.flush()
+        self.session.refresh(job)
+        return job
+
+    def delete_for_exams(self, exam_ids: List[int]) -> List[str]:
+        """Удаляет задачи исследований (перед удалением самих исследований); пути загруженных файлов."""
+        if not exam_ids:
+            return []
+        paths = self.session.exec(select(QCJob.upload_path).where(QCJob.exam_id.in_(exam_ids))).all()
+        self.session.exec(delete(QCJob).where(QCJob.exam_id.in_(exam_ids)))
+        return list(paths)
+
+    def requeue_stale(self, started_before: datetime) -> int:
+        # задачи, которые «висят» в RUNNING после падения процесса
+        result = self.session.exec(
+            update(QCJob)
+            .where(QCJob.status == QCJobStatus.RUNNING, QCJob.started_at < started_before)
+            .values(status=QCJobStatus.QUEUED, started_at=None)
+        )
+        return result.rowcount
+
+    def count_by_status(self) -> Dict[str, int]:
+        rows = self.session.exec(
+            select(QCJob.status, func.count(QCJob.id)).group_by(QCJob.status)
+        ).all()
+        counts = {status.value: 0 for status in QCJobStatus}
+        for status, count in rows:
+            counts[QCJobStatus(status).value] = count
+        return counts
+
+    def pending(self) -> int:
+        return self.session.exec(
+            select(func.count(QCJob.id)).where(QCJob.status.in_([QCJobStatus.QUEUED, QCJobStatus.RUNNING]))
+        ).one()
+
+    def position(self, job: QCJob) -> int:
+        # сколько задач в очереди перед этой
+        return self.session.exec(
+            select(func.count(QCJob.id)).where(QCJob.status == QCJobStatus.QUEUED, QCJob.id < job.id)
+        ).one()
@@ -1,63 +1,192 @@
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import func
+from sqlalchemy.orm import selectinload
 from app.models.qc_records import QCRecord
+from app.models.qc_flags import QCFlag
 from app.models.exams import Exam
-from typing import List, Optional
-import json
-from collections import Counter
+from typing import List, Optional, Tuple
+from app.config.replicas import replica_read
+from app.repositories.pagination import keyset, page, page_size
+from app.repositories.filters import Period, period
 
 class QCRepository:
     def __init__(self, session: Session):
         self.session = session
 
     def list_all(self) -> List[QCRecord]:
-        query = select(QCRecord)
+        query = select(QCRecord).options(selectinload(QCRecord.flags))
         return self.session.exec(query).all()
 
+    @replica_read
     def list(
         self,
         patient_id: Optional[str] = None,
-        date_from: Optional[str] = None,
-        date_to: Optional[str] = None,
-        flag: Optional[str] = None
+        date_from: Period = None,
+        date_to: Period = None,
+        flag: Optional[str] = None,
+        exam_id: Optional[int] = None,
     ) -> List[QCRecord]:
-        query = select(QCRecord)
-        if patient_id:
+        query = self._filtered(select(QCRecord), patient_id, date_from, date_to, flag, exam_id)
+        return self.session.exec(query.options(selectinload(QCRecord.flags))).all()
+
+    @replica_read
+    def list_page(
+        self,
+        patient_id: Optional[str] = None,
+        date_from: Period = None,
+        date_to: Period = None,
+        flag: Optional[str] = None,
+        cursor: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> Tuple[List[QCRecord], Optional[str]]:
+        """Страница QC записей, новые первыми: keyset по (created_at, id)."""
+        limit = page_size(limit)
+        records = self.session.exec(self._page_query(patient_id, date_from, date_to, flag, cursor, limit)).all()
+        return page(records, limit, lambda r: (r.created_at, r.id))
+
+    @classmethod
+    def _page_query(cls, patient_id, date_from, date_to, flag, cursor: Optional[str], limit: int):
+        query = cls._filtered(select(QCRecord), patient_id, date_from, date_to, flag)
+        query = keyset(query, (QCRecord.created_at, QCRecord.id), cursor, limit)
+        return query.options(selectinload(QCRecord.flags))
+
+    @staticmethod
+    def _filtered(
+        query,
+        patient_id: Optional[str] = None,
+        date_from: Period = None,
+        date_to: Period = None,
+        flag: Optional[str] = None,
+        exam_id: Optional[int] = None,
+    ):
+        if patient_id is not None:
             query = query.join(QCRecord.exam).where(Exam.patient_id == patient_id)
-        if date_from:
-            query = query.where(QCRecord.created_at >= date_from)
-        if date_to:
-            query = query.where(QCRecord.created_at <= date_to)
+        if exam_id is not None:
+            query = query.where(QCRecord.exam_id == exam_id)
+        query = query.where(*period(QCRecord.created_at, date_from, date_to))
         if flag:
-            query = query.where(QCRecord.ml_results_json.contains(flag))
-        return self.session.exec(query).all()
+            # EXISTS по индексу qcflag(name, qc_id) вместо LIKE по JSON
+            query = query.where(QCRecord.flags.any(QCFlag.name == flag))
+        return query
+
+    def latest_for_exam(self, exam_id: int) -> Optional[QCRecord]:
+        return self.session.exec(self._latest_query(exam_id)).first()
+
+    @staticmethod
+    def _latest_query(exam_id: int):
+        return (
+            select(QCRecord)
+            .options(selectinload(QCRecord.flags))
+            .where(QCRecord.exam_id == exam_id)
+            .order_by(QCRecord.created_at.desc(), QCRecord.id.desc())
+            .limit(1)
+        )
+
+    def image_paths(self, qc_id: int) -> Optional[Tuple[str, Optional[str]]]:
+        """(original_image_path, corrected_image_path) без загрузки ml_results_json."""
+        return self.session.exec(self._image_paths_query(qc_id)).first()
+
+    @staticmethod
+    def _image_paths_query(qc_id: int):
+        return select(QCRecord.original_image_path, QCRecord.corrected_image_path).where(QCRecord.id == qc_id)
+
+    def list_by_patient(self, patient_id: str) -> List[QCRecord]:
+        return self.list(patient_id=patient_id)
+
+    def list_by_exam(self, exam_id: int) -> List[QCRecord]:
+        return self.list(exam_id=exam_id)
+
+    @staticmethod
+    def _scoped(query, patient_id: Optional[str] = None, exam_id: Optional[int] = None):
+        if patient_id:
+            query = query.join(Exam, Exam.id == QCRecord.exam_id).where(Exam.patient_id == patient_id)
+        if exam_id is not None:
+            query = query.where(QCRecord.exam_id == exam_id)
+        return query
 
+    @replica_read
     def summary(
         self,
         patient_id: Optional[str] = None,
+        exam_id: Optional[int] = None,
     ):
-        qcs = self.list(patient_id=patient_id)
-
-        total = len(qcs)
-        statuses = Counter()
-        major_flags = Counter()
-        critical_flags = Counter()
-
-        for qc in qcs:
-            if qc.ml_results_json:
-                data = json.loads(qc.ml_results_json)
-                status = data.get("status", "UNKNOWN")
-                statuses[status] += 1
-
-                for k, v in data.get("major_flags", {}).items():
-                    if v: major_flags[k] += 1
-                for k, v in data.get("critical_flags", {}).items():
-                    if v: critical_flags[k] += 1
-            else:
-                statuses["UNKNOWN"] += 1
+        """Счётчики статусов и флагов — GROUP BY в БД, в Python приходят только итоги."""
+        status_query, flag_query = self._summary_queries(patient_id, exam_id)
+        status_rows = self.session.exec(status_query).all()
+        flag_rows = self.session.exec(flag_query).all()
+        return self._summary_result(status_rows, flag_rows)
+
+    @classmethod
+    def _summary_queries(cls, patient_id: Optional[str] = None, exam_id: Optional[int] = None):
+        status = func.coalesce(QCRecord.status, "UNKNOWN")
+        status_query = cls._scoped(select(status, func.count(QCRecord.id)), patient_id, exam_id).group_by(status)
+
+        flag_query = select(QCFlag.kind, QCFlag.name, func.count(QCFlag.id)).where(QCFlag.kind.in_(["major", "critical"]))
+        if patient_id or exam_id is not None:
+            scoped_ids = cls._scoped(select(QCRecord.id), patient_id, exam_id)
+            flag_query = flag_query.where(QCFlag.qc_id.in_(scoped_ids))
+        return status_query, flag_query.group_by(QCFlag.kind, QCFlag.name)
+
+    @staticmethod
+    def _summary_result(status_rows, flag_rows) -> dict:
+        statuses = {name: count for name, count in status_rows}
+        major_flags = {name: count for kind, name, count in flag_rows if kind == "major"}
+        critical_flags = {name: count for kind, name, count in flag_rows if kind == "critical"}
 
         return {
-            "total": total,
-            "statuses": dict(statuses),
-            "major_flags": dict(major_flags),
-            "critical_flags": dict(critical_flags),
+            "total": sum(statuses.values()),
+            "statuses": statuses,
+            "major_flags": major_flags,
+            "critical_flags": critical_flags,
         }
+
+
+class AsyncQCRepository:
+    """
+    Чтение QC записей для async-эндпоинтов. Запросы — общие с QCRepository;
+    флаги загружаются заранее (selectinload): ленивая загрузка в async-сессии недоступна.
+    """
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def get(self, qc_id: int) -> Optional[QCRecord]:
+        return await self.session.get(QCRecord, qc_id)
+
+    @replica_read
+    async def list_page(
+        self,
+        patient_id: Optional[str] = None,
+        date_from: Period = None,
+        date_to: Period = None,
+        flag: Optional[str] = None,
+        cursor: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> Tuple[List[QCRecord], Optional[str]]:
+        limit = page_size(limit)
+        query = QCRepository._page_query(patient_id, date_from, date_to, flag, cursor, limit)
+        records = (await self.session.exec(query)).all()
+        return page(records, limit, lambda r: (r.created_at, r.id))
+
+    async def get_by_exam(self, exam_id: int) -> Optional[QCRecord]:
+        query = select(QCRecord).options(selectinload(QCRecord.flags)).where(QCRecord.exam_id == exam_id)
+        return (await self.session.exec(query.limit(1))).first()
+
+    async def latest_for_exam(self, exam_id: int) -> Optional[QCRecord]:
+        return (await self.session.exec(QCRepository._latest_query(exam_id))).first()
+
+    async def image_paths(self, qc_id: int) -> Optional[Tuple[str, Optional[str]]]:
+        return (await self.session.exec(QCRepository._image_paths_query(qc_id))).first()
+
+    async def ml_results(self, qc_id: int) -> Optional[Tuple[int, Optional[str]]]:
+        """(id, ml_results_json); None — записи нет."""
+        query = select(QCRecord.id, QCRecord.ml_results_json).where(QCRecord.id == qc_id)
+        return (await self.session.exec(query)).first()
+
+    @replica_read
+    async def summary(self, patient_id: Optional[str] = None, exam_id: Optional[int] = None):
+        status_query, flag_query = QCRepository._summary_queries(patient_id, exam_id)
+        status_rows = (await self.session.exec(status_query)).all()
+        flag_rows = (await self.session.exec(flag_query)).all()
+        return QCRepository._summary_result(status_rows, flag_rows)
@@ -0,0 +1,176 @@
+from sqlmodel import Session, select, delete
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import func, insert, literal
+from sqlalchemy.dialects import postgresql, sqlite
+from app.models.qc_rollups import QCRollup
+from app.models.qc_records import QCRecord
+from app.models.qc_flags import QCFlag
+from app.models.exams import Exam
+from collections import Counter
+from datetime import date
+from typing import List, Optional
+from app.config.replicas import replica_read
+
+_UPSERT_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+class QCRollupRepository:
+    def __init__(self, session: Session):
+        self.session = session
+
+    # --- инкрементальное обновление ---
+
+    def apply(self, records: List[QCRecord], sign: int = 1):
+        """
+        Добавляет (sign=1) или вычитает (sign=-1) записи из счётчиков.
+        Выполняется в текущей транзакции — вместе с записью/удалением QCRecord.
+        """
+        if not records:
+            return
+        exam_ids = {r.exam_id for r in records}
+        exams = {
+            exam_id: (device, modality)
+            for exam_id, device, modality in self.session.exec(
+                select(Exam.id, Exam.device, Exam.modality).where(Exam.id.in_(exam_ids))
+            ).all()
+        }
+
+        deltas = Counter()
+        for r in records:
+            device, modality = exams.get(r.exam_id, ("", ""))
+            key = (r.created_at.date(), device or "", modality or "")
+            deltas[key + ("status", r.status or "UNKNOWN")] += sign
+            for flag in r.flags:
+                deltas[key + (flag.kind, flag.name)] += sign
+
+        for (day, device, modality, kind, name), delta in sorted(deltas.items()):
+            self._upsert(day, device, modality, kind, name, delta)
+
+    def _upsert(self, day: date, device: str, modality: str, kind: str, name: str, delta: int):
+        values = dict(day=day, device=device, modality=modality, kind=kind, name=name, count=delta)
+        dialect_insert = _UPSERT_INSERTS.get(self.session.get_bind().dialect.name)
+        if dialect_insert is not None:
+            stmt = dialect_insert(QCRollup).values(**values)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["day", "device", "modality", "kind", "name"],
+                set_={"count": QCRollup.count + stmt.excluded.count},
+            )
+            self.session.exec(stmt)
+            return
+        # прочие СУБД: обычный read-modify-write
+        row = self.session.get(QCRollup, (day, device, modality, kind, name))
+        if row is None:
+            self.session.add(QCRollup(**values))
+        else:
+            row.count += delta
+            self.session.add(row)
+
+    # --- чтение ---
+
+    @replica_read
+    def summary(
+        self,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None,
+        device: Optional[str] = None,
+        modality: Optional[str] = None,
+    ):
+        rows = self.session.exec(self._summary_query(date_from, date_to, device, modality)).all()
+        return self._summary_result(rows)
+
+    @staticmethod
+    def _summary_query(
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None,
+        device: Optional[str] = None,
+        modality: Optional[str] = None,
+    ):
+        query = select(QCRollup.kind, QCRollup.name, func.sum(QCRollup.count))
+        if date_from:
+            query = query.where(QCRollup.day >= date_from)
+        if date_to:
+            query = query.where(QCRollup.day <= date_to)
+        if device:
+            query = query.where(QCRollup.device == device)
+        if modality:
+            query = query.where(QCRollup.modality == modality)
+        return query.group_by(QCRollup.kind, QCRollup.name)
+
+    @staticmethod
+    def _summary_result(rows) -> dict:
+        by_kind = {"status": {}, "major": {}, "critical": {}}
+        for kind, name, count in rows:
+            if kind in by_kind and count:
+                by_kind[kind][name] = int(count)
+
+        return {
+            "total": sum(by_kind["status"].values()),
+            "statuses": by_kind["status"],
+            "major_flags": by_kind["major"],
+            "critical_flags": by_kind["critical"],
+        }
+
+    # --- пересчёт и проверка ---
+
+    def _live_rollups(self):
+        """SELECT, считающий те же строки счётчиков прямо по qcrecord/qcflag."""
+        day = func.date(QCRecord.created_at)
+        status = func.coalesce(QCRecord.status, "UNKNOWN")
+        statuses = (
+            select(day, Exam.device, Exam.modality, literal("status"), status, func.count(QCRecord.id))
+            .join(Exam, Exam.id == QCRecord.exam_id)
+            .group_by(day, Exam.device, Exam.modality, status)
+        )
+        flags = (
+            select(day, Exam.device, Exam.modality, QCFlag.kind, QCFlag.name, func.count(QCFlag.id))
+            .join(QCRecord, QCRecord.id == QCFlag.qc_id)
+            .join(Exam, Exam.id == QCRecord.exam_id)
+            .group_by(day, Exam.device, Exam.modality, QCFlag.kind, QCFlag.name)
+        )
+        return statuses, flags
+
+    def rebuild(self) -> int:
+        """Пересчитывает счётчики с нуля (одной транзакцией — commit за вызывающим)."""
+        columns = ["day", "device", "modality", "kind", "name", "count"]
+        self.session.exec(delete(QCRollup))
+        for query in self._live_rollups():
+            self.session.exec(insert(QCRollup).from_select(columns, query))
+        self.session.flush()
+        return self.session.exec(select(func.count()).select_from(QCRollup)).one()
+
+    def check(self) -> list:
+        """Сравнивает счётчики с живыми данными; возвращает расхождения."""
+        expected = Counter()
+        for query in self._live_rollups():
+            for day, device, modality, kind, name, count in self.session.exec(query).all():
+                expected[(str(day), device, modality, kind, name)] += count
+
+        actual = Counter()
+        for row in self.session.exec(select(QCRollup)).all():
+            if row.count:
+                actual[(str(row.day), row.device, row.modality, row.kind, row.name)] += row.count
+
+        return [
+            {"day": key[0], "device": key[1], "modality": key[2], "kind": key[3], "name": key[4],
+             "expected": expected.get(key, 0), "actual": actual.get(key, 0)}
+            for key in sorted(set(expected) | set(actual))
+            if expected.get(key, 0) != actual.get(key, 0)
+        ]
+
+
+class AsyncQCRollupRepository:
+    """Чтение счётчиков для async-эндпоинтов; запросы — общие с QCRollupRepository."""
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    @replica_read
+    async def summary(
+        self,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None,
+        device: Optional[str] = None,
+        modality: Optional[str] = None,
+    ):
+        query = QCRollupRepository._summary_query(date_from, date_to, device, modality)
+        rows = (await self.session.exec(query)).all()
+        return QCRollupRepository._summary_result(rows)
@@ -0,0 +1,205 @@
+from sqlmodel import Session, select
+from sqlalchemy import func, and_, cast, Integer, Date
+from app.models.exams import Exam
+from app.models.patients import Patient
+from app.models.qc_records import QCRecord
+from datetime import date, datetime, timedelta
+from typing import List, Optional
+from app.config.replicas import replica_read
+
+class ReportRepository:
+    """
+    Статистика для PDF отчёта — только агрегаты в БД.
+    В Python приходят итоги GROUP BY, стоимость не зависит от объёма истории
+    (кроме самого сканирования индексов в СУБД).
+    """
+
+    def __init__(self, session: Session):
+        self.session = session
+
+    @property
+    def _dialect(self) -> str:
+        return self.session.get_bind().dialect.name
+
+    # --- выражения, зависящие от СУБД ---
+
+    def _day(self, column):
+        if self._dialect == "postgresql":
+            return cast(column, Date)
+        return func.date(column)
+
+    def _format(self, column, sqlite_fmt: str, pg_fmt: str):
+        if self._dialect == "postgresql":
+            return func.to_char(column, pg_fmt)
+        return func.strftime(sqlite_fmt, column)
+
+    def _iso_week(self, column):
+        """Неделя ISO 8601 "IYYY-IW" (с понедельника; неделя — того года, на который приходится её четверг)."""
+        if self._dialect == "postgresql":
+            return func.to_char(column, "IYYY-IW")
+        # %G/%V в SQLite только с 3.46: считаем от четверга той же недели
+        thursday = func.date(column, func.printf("%d days", 3 - self._weekday(column)))
+        week = (cast(func.strftime("%j", thursday), Integer) - 1) / 7 + 1
+        return func.printf("%s-%02d", func.strftime("%Y", thursday), week)
+
+    def _weekday(self, column):
+        # 0 = понедельник, как datetime.weekday()
+        if self._dialect == "postgresql":
+            return cast(func.extract("isodow", column), Integer) - 1
+        return (cast(func.strftime("%w", column), Integer) + 6) % 7
+
+    def _hour(self, column):
+        if self._dialect == "postgresql":
+            return cast(func.extract("hour", column), Integer)
+        return cast(func.strftime("%H", column), Integer)
+
+    def _age_days(self):
+        if self._dialect == "postgresql":
+            return cast(Exam.exam_date, Date) - Patient.birth_date
+        return func.julianday(func.date(Exam.exam_date)) - func.julianday(Patient.birth_date)
+
+    # --- исследования и пациенты ---
+
+    def count_exams(self) -> int:
+        return self.session.exec(select(func.count(Exam.id))).one()
+
+    def count_patients(self) -> int:
+        return self.session.exec(select(func.count(Patient.id))).one()
+
+    def _counts_by(self, key, limit: Optional[int] = None) -> list:
+        query = (
+            select(key, func.count(Exam.id))
+            .where(Exam.exam_date.is_not(None))
+            .group_by(key)
+            .order_by(key.desc())
+        )
+        if limit:
+            query = query.limit(limit)
+        return list(reversed(self.session.exec(query).all()))
+
+    def counts_by_day(self, limit: Optional[int] = None) -> List[tuple]:
+        """[(date, count)] по возрастанию даты; limit — только последние дни."""
+        rows = self._counts_by(self._day(Exam.exam_date), limit)
+        return [(d if isinstance(d, date) else date.fromisoformat(d), n) for d, n in rows]
+
+    def counts_by_week(self, limit: Optional[int] = None) -> List[tuple]:
+        """[("IYYY-IW", count)] — ISO недели, одинаково в PostgreSQL и SQLite"""
+        return self._counts_by(self._iso_week(Exam.exam_date), limit)
+
+    def counts_by_month(self, limit: Optional[int] = None) -> List[tuple]:
+        """[("YYYY-MM", count)]"""
+        return self._counts_by(self._format(Exam.exam_date, "%Y-%m", "YYYY-MM"), limit)
+
+    def heatmap(self) -> dict:
+        """{(день недели, час): count}"""
+        weekday = self._weekday(Exam.exam_date)
+        hour = self._hour(Exam.exam_date)
+        rows = self.session.exec(
+            select(weekday, hour, func.count(Exam.id))
+            .where(Exam.exam_date.is_not(None))
+            .group_by(weekday, hour)
+        ).all()
+        return {(int(dow), int(hr)): n for dow, hr, n in rows}
+
+    def average_age(self) -> Optional[float]:
+        """Средний возраст пациента на дату исследования (лет)."""
+        value = self.session.exec(
+            select(func.avg(self._age_days()))
+            .select_from(Exam)
+            .join(Patient, Patient.patient_id == Exam.patient_id)
+            .where(Exam.exam_date.is_not(None), Patient.birth_date.is_not(None))
+        ).one()
+        return float(value) / 365.25 if value is not None else None
+
+    def distribution(self, column, limit: Optional[int] = None) -> List[tuple]:
+        """[(значение, count)] по убыванию count."""
+        count = func.count(Exam.id)
+        query = (
+            select(column, count)
+            .where(column.is_not(None), column != "")
+            .group_by(column)
+            .order_by(count.desc(), column)
+        )
+        if limit:
+            query = query.limit(limit)
+        return self.session.exec(query).all()
+
+    def count_frequent_patients(self, since: datetime, min_exams: int = 3) -> int:
+        """Пациенты, у которых больше min_exams исследований начиная с since."""
+        frequent = (
+            select(Exam.patient_id)
+            .where(Exam.exam_date >= since)
+            .group_by(Exam.patient_id)
+            .having(func.count(Exam.id) > min_exams)
+            .subquery()
+        )
+        return self.session.exec(select(func.count()).select_from(frequent)).one()
+
+    # --- QC ---
+
+    def qc_totals(self, exam_id: Optional[int] = None) -> tuple:
+        """(всего QC записей, из них с исправленным изображением)"""
+        corrected = and_(QCRecord.corrected_image_path.is_not(None), QCRecord.corrected_image_path != "")
+        query = select(
+            func.count(QCRecord.id),
+            func.coalesce(func.sum(cast(corrected, Integer)), 0),
+        )
+        if exam_id is not None:
+            query = query.where(QCRecord.exam_id == exam_id)
+        total, fixed = self.session.exec(query).one()
+        return total, int(fixed)
+
+    def exam_qc_history(self, exam_id: int) -> List[QCRecord]:
+        query = (
+            select(QCRecord)
+            .where(QCRecord.exam_id == exam_id)
+            .order_by(QCRecord.created_at, QCRecord.id)
+        )
+        return self.session.exec(query).all()
+
+    # --- версии для кэша отчётов ---
+
+    def exam_version(self, exam_id: int) -> Optional[str]:
+        """Меняется при новых/удалённых QC записях исследования и при правке исследования/пациента."""
+        row = self.session.exec(
+            select(Exam, Patient)
+            .outerjoin(Patient, Patient.patient_id == Exam.patient_id)
+            .where(Exam.id == exam_id)
+        ).first()
+        if row is None:
+            return None
+        exam, patient = row
+        qc_count, qc_max_id, qc_last = self.session.exec(
+            select(func.count(QCRecord.id), func.max(QCRecord.id), func.max(QCRecord.created_at))
+            .where(QCRecord.exam_id == exam_id)
+        ).one()
+        parts = [exam.json(), patient.json() if patient else "", qc_count, qc_max_id, qc_last]
+        return "|".join(str(p) for p in parts)
+
+    # --- всё для раздела глобальной статистики ---
+
+    @replica_read
+    def global_stats(self, days: int = 20, top: int = 10, now: Optional[datetime] = None) -> dict:
+        now = now or datetime.utcnow()
+        total_exams = self.count_exams()
+        total_patients = self.count_patients()
+        frequent_patients = self.count_frequent_patients(now - timedelta(days=365))
+        total_qc, corrected_qc = self.qc_totals()
+        return {
+            "total_exams": total_exams,
+            "total_patients": total_patients,
+            "counts_by_day": self.counts_by_day(days),
+            "counts_by_week": self.counts_by_week(52),
+            "counts_by_month": self.counts_by_month(24),
+            "heatmap": self.heatmap(),
+            "avg_age": self.average_age(),
+            "modality_counts": self.distribution(Exam.modality, top),
+            "view_counts": self.distribution(Exam.view_type, top),
+            "device_counts": self.distribution(Exam.device, top),
+            "avg_exams_per_patient": (total_exams / total_patients) if total_patients else 0,
+            "frequent_patients": frequent_patients,
+            "frequent_patients_share": (frequent_patients / total_patients) if total_patients else 0,
+            "total_qc": total_qc,
+            "corrected_qc": corrected_qc,
+            "corrected_percent": (corrected_qc / total_qc * 100) if total_qc else 0,
+        }
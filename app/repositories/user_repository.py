@@ -1,31 +1,39 @@
 from app.models.users import User
-from sqlmodel import Session, select
-from typing import Optional, List
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import Optional, List, Tuple
+from app.repositories.pagination import keyset, page, page_size
 
 class UserRepository:
-    def __init__(self, session: Session):
+    def __init__(self, session: AsyncSession):
         self.session = session
 
-    def get(self, user_id: int) -> Optional[User]:
-        return self.session.exec(select(User).where(User.id == user_id)).first()
+    async def get(self, user_id: int) -> Optional[User]:
+        return (await self.session.exec(select(User).where(User.id == user_id))).first()
 
-    def get_by_username(self, username: str) -> Optional[User]:
-        return self.session.exec(select(User).where(User.username == username)).first()
+    async def get_by_username(self, username: str) -> Optional[User]:
+        return (await self.session.exec(select(User).where(User.username == username))).first()
 
-    def get_first_user(self) -> Optional[User]:
-        return self.session.exec(select(User)).first()
+    async def get_first_user(self) -> Optional[User]:
+        return (await self.session.exec(select(User))).first()
 
-    def get_all(self) -> List[User]:
-        return self.session.exec(select(User)).all()
+    async def get_all(self) -> List[User]:
+        return (await self.session.exec(select(User))).all()
 
-    def add(self, user: User) -> User:
+    async def list_page(self, cursor: Optional[str] = None, limit: Optional[int] = None) -> Tuple[List[User], Optional[str]]:
+        """Страница пользователей, новые первыми: keyset по (created_at, id)."""
+        limit = page_size(limit)
+        query = keyset(select(User), (User.created_at, User.id), cursor, limit)
+        return page((await self.session.exec(query)).all(), limit, lambda u: (u.created_at, u.id))
+
+    async def add(self, user: User) -> User:
         self.session.add(user)
-        self.session.commit()
-        self.session.refresh(user)
+        await self.session.flush()
+        await self.session.refresh(user)
         return user
 
-    def update(self, user_id: int, **kwargs) -> User:
-        user = self.get(user_id)
+    async def update(self, user_id: int, **kwargs) -> User:
+        user = await self.get(user_id)
         if not user:
             raise ValueError(f"User with id={user_id} not found")
 
@@ -34,10 +42,10 @@ class UserRepository:
             setattr(user, key, value)
 
         self.session.add(user)
-        self.session.commit()
-        self.session.refresh(user)
+        await self.session.flush()
+        await self.session.refresh(user)
         return user
 
-    def delete(self, user: User):
-        self.session.delete(user)
-        self.session.commit()
+    async def delete(self, user: User):
+        await self.session.delete(user)
+        await self.session.flush()
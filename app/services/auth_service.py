@@ -1,16 +1,31 @@
 # app/services/auth_service.py
 from app.repositories.user_repository import UserRepository
+from app.models.users import User
+from app.config.unit_of_work import AsyncUnitOfWork
+from fastapi.concurrency import run_in_threadpool
 from passlib.context import CryptContext
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 class AuthService:
-    def __init__(self, session):
-        self.user_repo = UserRepository(session)
+    def __init__(self, uow: AsyncUnitOfWork):
+        self.uow = uow
+        self.user_repo = UserRepository(uow.session)
 
-    def login(self, username: str, password: str):
-        user = self.user_repo.get_by_username(username)
-        if not user or not self._check_password(password, user.hashed_password):
+    async def register_first_admin(self, username: str, password: str, full_name: str) -> User:
+        # после того как создан хотя бы один пользователь, регистрация запрещена
+        if await self.user_repo.get_first_user():
+            raise PermissionError("Регистрация доступна только для первого админа")
+        # bcrypt — сотни мс CPU, не в event loop
+        hashed_password = await run_in_threadpool(self.get_password_hash, password)
+        user = User(username=username, full_name=full_name, hashed_password=hashed_password, role="ADMIN")
+        await self.user_repo.add(user)
+        await self.uow.commit()
+        return user
+
+    async def login(self, username: str, password: str):
+        user = await self.user_repo.get_by_username(username)
+        if not user or not await run_in_threadpool(self._check_password, password, user.hashed_password):
             raise Exception("Invalid credentials")
         return {"username": user.username, "role": user.role}
 
@@ -0,0 +1,295 @@
+"""
+Массовый импорт пациентов и исследований (миграция истории RIS) из CSV или NDJSON.
+
+Файл читается потоком, строки проверяются и пишутся пачками по BULK_IMPORT_CHUNK_SIZE:
+upsert по patient_id / accession_number (повторный импорт того же файла ничего не дублирует),
+commit на каждую пачку. Ошибочные строки (формат, нет пациента, ограничения БД) попадают
+в отчёт пачки с номером строки файла и не прерывают импорт.
+
+    API: POST /import/patients, POST /import/exams   (ответ — NDJSON, строка на пачку)
+    CLI: python -m app.cli.imports exams exams.csv
+"""
+import csv
+import io
+import json
+import os
+import time
+from datetime import date, datetime
+from typing import BinaryIO, Iterator, List, Optional, Tuple
+
+from sqlalchemy.exc import DataError, IntegrityError
+from sqlalchemy.orm import selectinload
+from sqlmodel import select
+
+from app.config.unit_of_work import UnitOfWork
+from app.models.exams import Exam
+from app.models.patients import Patient
+from app.models.qc_records import QCRecord
+from app.repositories.bulk_import_repository import BulkImportRepository
+from app.repositories.qc_rollup_repository import QCRollupRepository
+
+BULK_IMPORT_CHUNK_SIZE = int(os.getenv("BULK_IMPORT_CHUNK_SIZE", "5000"))
+IMPORT_FORMATS = ("csv", "ndjson")
+_FORMAT_EXTENSIONS = {".csv": "csv", ".ndjson": "ndjson", ".jsonl": "ndjson"}
+
+
+class BulkImportError(ValueError):
+    pass
+
+
+class RowError(ValueError):
+    pass
+
+
+def _text(value, required: bool = True) -> Optional[str]:
+    if isinstance(value, (dict, list)):
+        raise RowError("ожидается строка")
+    value = "" if value is None else str(value).strip()
+    if not value:
+        if required:
+            raise RowError("обязательное поле")
+        return None
+    return value
+
+
+def _optional_text(value) -> Optional[str]:
+    return _text(value, required=False)
+
+
+def _date(value) -> date:
+    try:
+        return date.fromisoformat(_text(value))
+    except ValueError:
+        raise RowError("ожидается дата YYYY-MM-DD")
+
+
+def _datetime(value) -> datetime:
+    try:
+        return datetime.fromisoformat(_text(value))
+    except ValueError:
+        raise RowError("ожидается дата и время ISO 8601")
+
+
+class ImportKind:
+    """Что импортируется: таблица, ключ upsert и разбор колонок."""
+
+    def __init__(self, model, key: str, fields: dict):
+        self.model = model
+        self.table = model.__table__
+        self.key = key
+        self.fields = fields
+        self.required = [name for name, parse in fields.items() if parse is not _optional_text]
+        # при обновлении меняются все колонки файла, кроме ключа
+        self.update_columns = [name for name in fields if name != key]
+
+    def validate(self, record: dict) -> dict:
+        values = {}
+        for name, parse in self.fields.items():
+            try:
+                values[name] = parse(record.get(name))
+            except RowError as e:
+                raise RowError(f"{name}: {e}")
+        return values
+
+
+IMPORT_KINDS = {
+    "patients": ImportKind(Patient, "patient_id", {
+        "patient_id": _text,
+        "first_name": _text,
+        "last_name": _text,
+        "birth_date": _date,
+        "sex": _text,
+    }),
+    "exams": ImportKind(Exam, "accession_number", {
+        "accession_number": _text,
+        "patient_id": _text,
+        "exam_date": _datetime,
+        "modality": _text,
+        "view_type": _text,
+        "device": _text,
+        "technician": _text,
+        "notes": _optional_text,
+    }),
+}
+
+
+def detect_format(filename: Optional[str], content_type: Optional[str] = None) -> str:
+    extension = os.path.splitext(filename or "")[1].lower()
+    if extension in _FORMAT_EXTENSIONS:
+        return _FORMAT_EXTENSIONS[extension]
+    if content_type in ("text/csv", "application/csv"):
+        return "csv"
+    if content_type in ("application/x-ndjson", "application/jsonl"):
+        return "ndjson"
+    raise BulkImportError(f"Не удалось определить формат файла, укажите format: {', '.join(IMPORT_FORMATS)}")
+
+
+def read_records(stream: BinaryIO, fmt: str, required: List[str]) -> Iterator[Tuple[int, Optional[dict], Optional[str]]]:
+    """(номер строки файла, запись, ошибка разбора) — по одной, не загружая файл целиком."""
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", errors="replace", newline="")
+    if fmt == "csv":
+        reader = csv.DictReader(text)
+        missing = [name for name in required if name not in (reader.fieldnames or [])]
+        if missing:
+            raise BulkImportError(f"В заголовке CSV нет колонок: {', '.join(missing)}")
+        while True:
+            try:
+                record = next(reader)
+            except StopIteration:
+                return
+            except csv.Error as e:
+                yield reader.line_num, None, f"CSV: {e}"
+                continue
+            yield reader.line_num, record, None
+    elif fmt == "ndjson":
+        for number, line in enumerate(text, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield number, None, f"JSON: {e}"
+                continue
+            if not isinstance(record, dict):
+                yield number, None, "JSON: ожидается объект"
+                continue
+            yield number, record, None
+    else:
+        raise BulkImportError(f"format должен быть одним из: {', '.join(IMPORT_FORMATS)}")
+
+
+def _row_error(line: int, key, message: str) -> dict:
+    return {"line": line, "key": key, "error": message}
+
+
+class BulkImportService:
+    def __init__(self, uow: UnitOfWork, chunk_size: int = BULK_IMPORT_CHUNK_SIZE):
+        self.uow = uow
+        self.chunk_size = max(chunk_size, 1)
+
+    def run(self, kind_name: str, stream: BinaryIO, fmt: str) -> Iterator[dict]:
+        """
+        Импорт файла; отдаёт итог каждой пачки по мере записи, последним — общий итог (done=True).
+        BulkImportError — импорт невозможен целиком (тип, формат, заголовок CSV).
+        """
+        kind = IMPORT_KINDS.get(kind_name)
+        if kind is None:
+            raise BulkImportError(f"Неизвестный тип импорта: {kind_name}")
+        records = read_records(stream, fmt, kind.required)
+        # заголовок CSV проверяется при первом чтении — до первой пачки
+        first = next(records, None)
+        return self._run(kind, self._chunks(first, records))
+
+    def _chunks(self, first, records) -> Iterator[list]:
+        if first is None:
+            return
+        chunk = [first]
+        for item in records:
+            if len(chunk) >= self.chunk_size:
+                yield chunk
+                chunk = []
+            chunk.append(item)
+        yield chunk
+
+    def _run(self, kind: ImportKind, chunks) -> Iterator[dict]:
+        started = time.perf_counter()
+        totals = {"rows": 0, "created": 0, "updated": 0, "duplicates": 0, "failed": 0}
+        for number, chunk in enumerate(chunks, 1):
+            result = self._import_chunk(kind, chunk)
+            for name in totals:
+                totals[name] += result[name]
+            yield {"chunk": number, **result}
+        elapsed = time.perf_counter() - started
+        yield {
+            "done": True,
+            **totals,
+            "seconds": round(elapsed, 3),
+            "rows_per_second": round(totals["rows"] / elapsed) if elapsed else None,
+        }
+
+    def _import_chunk(self, kind: ImportKind, chunk: list) -> dict:
+        errors = []
+        rows = {}
+        for line, record, error in chunk:
+            if error is None:
+                try:
+                    values = kind.validate(record)
+                except RowError as e:
+                    error = str(e)
+            if error is not None:
+                errors.append(_row_error(line, record.get(kind.key) if record else None, error))
+                continue
+            # повтор ключа в пачке — как последовательные upsert: остаётся последняя строка
+            rows.pop(values[kind.key], None)
+            rows[values[kind.key]] = (line, values)
+        duplicates = len(chunk) - len(errors) - len(rows)
+
+        repo = BulkImportRepository(self.uow.session)
+        if kind.model is Exam:
+            # FK на пациента проверяем сами: SQLite его не проверяет, а ошибка БД отменила бы всю пачку
+            patient_ids = {values["patient_id"] for _, values in rows.values()}
+            known = repo.existing(Patient.__table__, "patient_id", patient_ids)
+            for key in [k for k, (_, values) in rows.items() if values["patient_id"] not in known]:
+                line, values = rows.pop(key)
+                errors.append(_row_error(line, key, f"patient_id: пациент {values['patient_id']} не найден"))
+
+        try:
+            created, updated = self._write(kind, rows)
+            self.uow.commit()
+        except (IntegrityError, DataError):
+            self.uow.rollback()
+            # в пачке есть строка, которую не приняла БД: пишем по одной, остальные сохраняются
+            created = updated = 0
+            for key, item in rows.items():
+                try:
+                    c, u = self._write(kind, {key: item}, copy=False)
+                    self.uow.commit()
+                except (IntegrityError, DataError) as e:
+                    self.uow.rollback()
+                    errors.append(_row_error(item[0], key, str(e.orig).strip()))
+                    continue
+                created += c
+                updated += u
+
+        errors.sort(key=lambda e: e["line"])
+        return {
+            "rows": len(chunk),
+            "created": created,
+            "updated": updated,
+            "duplicates": duplicates,
+            "failed": len(errors),
+            "errors": errors,
+        }
+
+    def _write(self, kind: ImportKind, rows: dict, copy: bool = True) -> Tuple[int, int]:
+        """Upsert строк пачки в текущей транзакции; (создано, обновлено)."""
+        if not rows:
+            return 0, 0
+        session = self.uow.session
+        repo = BulkImportRepository(session)
+        table_rows = [values for _, values in rows.values()]
+
+        if kind.model is Exam:
+            existing = repo.existing(kind.table, kind.key, rows, "id", "device", "modality")
+            # счётчики дашборда разложены по device/modality исследования: QC записи
+            # исследований, у которых они меняются, переносятся в новые счётчики
+            moved = [
+                row.id for key, row in existing.items()
+                if (row.device, row.modality) != (rows[key][1]["device"], rows[key][1]["modality"])
+            ]
+            records = []
+            if moved:
+                records = session.exec(
+                    select(QCRecord).options(selectinload(QCRecord.flags)).where(QCRecord.exam_id.in_(moved))
+                ).all()
+            rollups = QCRollupRepository(session)
+            rollups.apply(records, sign=-1)
+            repo.upsert(kind.table, kind.key, table_rows, kind.update_columns, copy=copy)
+            rollups.apply(records, sign=1)
+        else:
+            existing = repo.existing(kind.table, kind.key, rows)
+            now = datetime.utcnow()
+            table_rows = [dict(values, created_at=now) for values in table_rows]
+            repo.upsert(kind.table, kind.key, table_rows, kind.update_columns, copy=copy)
+
+        return len(rows) - len(existing), len(existing)
@@ -1,48 +1,27 @@
-import json
 from typing import List, Dict, Any
-from sqlmodel import Session
+from app.config.unit_of_work import UnitOfWork
 from app.repositories.qc_repository import QCRepository
+from app.repositories.qc_rollup_repository import QCRollupRepository
 
 class DashboardService:
-    def __init__(self, session: Session):
-        self.qc_repo = QCRepository(session)
+    def __init__(self, uow: UnitOfWork):
+        self.qc_repo = QCRepository(uow.session)
+        self.rollup_repo = QCRollupRepository(uow.session)
 
     def get_summary(self) -> Dict[str, Any]:
-        records = self.qc_repo.list_all()
-        summary = {
-            "total": len(records),
-            "statuses": {},
-            "major_flags": {},
-            "critical_flags": {},
-        }
-
-        for r in records:
-            data = json.loads(r.ml_results_json or "{}")
-            status = data.get("status", "UNKNOWN")
-            summary["statuses"][status] = summary["statuses"].get(status, 0) + 1
-
-            for flag, value in data.get("major_flags", {}).items():
-                if value:
-                    summary["major_flags"][flag] = summary["major_flags"].get(flag, 0) + 1
-
-            for flag, value in data.get("critical_flags", {}).items():
-                if value:
-                    summary["critical_flags"][flag] = summary["critical_flags"].get(flag, 0) + 1
-
-        return summary
+        return self.rollup_repo.summary()
 
     def get_patient_dashboard(self, patient_id: str) -> List[Dict[str, Any]]:
         records = self.qc_repo.list_by_patient(patient_id)
         result = []
 
         for r in records:
-            data = json.loads(r.ml_results_json or "{}")
             result.append({
                 "exam_id": r.exam_id,
-                "status": data.get("status"),
-                "applied_fixes": data.get("applied_fixes", []),
-                "major_flags": data.get("major_flags", {}),
-                "critical_flags": data.get("critical_flags", {}),
+                "status": r.status,
+                "applied_fixes": r.applied_fixes or [],
+                "major_flags": {name: True for name in r.flags_of("major")},
+                "critical_flags": {name: True for name in r.flags_of("critical")},
             })
 
         return result
@@ -53,11 +32,10 @@ class DashboardService:
             return {}
 
         r = records[0]  # обычно один QCRecord на exam
-        data = json.loads(r.ml_results_json or "{}")
         return {
             "exam_id": r.exam_id,
-            "status": data.get("status"),
-            "applied_fixes": data.get("applied_fixes", []),
-            "major_flags": data.get("major_flags", {}),
-            "critical_flags": data.get("critical_flags", {}),
+            "status": r.status,
+            "applied_fixes": r.applied_fixes or [],
+            "major_flags": {name: True for name in r.flags_of("major")},
+            "critical_flags": {name: True for name in r.flags_of("critical")},
         }
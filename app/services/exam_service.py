@@ -1,17 +1,34 @@
-from app.repositories.exam_repository import ExamRepository
+from app.repositories.exam_repository import AsyncExamRepository
+from app.repositories.qc_repository import AsyncQCRepository
 from app.models.exams import Exam
-from sqlmodel import Session
-from typing import List, Optional
+from app.models.qc_records import QCRecord
+from app.config.unit_of_work import AsyncUnitOfWork
+from app.repositories.filters import Period
+from typing import Optional
 
 class ExamService:
-    def __init__(self, session: Session):
-        self.repo = ExamRepository(session)
+    def __init__(self, uow: AsyncUnitOfWork):
+        self.uow = uow
+        self.repo = AsyncExamRepository(uow.session)
+        self.qc_repo = AsyncQCRepository(uow.session)
 
-    def create_exam(self, exam: Exam) -> Exam:
-        return self.repo.create(exam)
+    async def create_exam(self, exam: Exam) -> Exam:
+        exam = await self.repo.create(exam)
+        await self.uow.commit()
+        return exam
 
-    def get_exam(self, exam_id: int) -> Optional[Exam]:
-        return self.repo.get(exam_id)
+    async def get_exam(self, exam_id: int) -> Optional[Exam]:
+        return await self.repo.get(exam_id)
 
-    def list_exams(self, patient_id: Optional[int] = None, date_from: Optional[str] = None, date_to: Optional[str] = None) -> List[Exam]:
-        return self.repo.list(patient_id, date_from, date_to)
+    async def list_exams_with_qc(
+        self,
+        patient_id: Optional[str] = None,
+        date_from: Period = None,
+        date_to: Period = None,
+        cursor: Optional[str] = None,
+        limit: Optional[int] = None,
+    ):
+        return await self.repo.list_with_latest_qc(patient_id, date_from, date_to, cursor, limit)
+
+    async def get_latest_qc(self, exam_id: int) -> Optional[QCRecord]:
+        return await self.qc_repo.latest_for_exam(exam_id)
@@ -0,0 +1,96 @@
+import os
+import json
+import asyncio
+import hashlib
+import threading
+from datetime import datetime
+from fastapi.concurrency import run_in_threadpool
+
+from app.config.unit_of_work import UnitOfWork
+from app.repositories.report_repository import ReportRepository
+from app.reports.charts import build_charts
+
+# Как долго снимок глобальной статистики считается свежим (секунды)
+REPORT_STATS_TTL = int(os.getenv("REPORT_STATS_TTL", "300"))
+
+
+class GlobalStatsSnapshot:
+    """Раздел «Общая активность и нагрузка» на момент created_at: числа и готовые векторные графики."""
+
+    def __init__(self, stats: dict, charts: dict = None):
+        self.stats = stats
+        self.charts = charts
+        self.created_at = datetime.utcnow()
+        # версия по содержимому: одинаковые данные -> одинаковая версия -> кэш отчётов остаётся валиден
+        normalized = dict(stats, heatmap=sorted(stats["heatmap"].items()))
+        payload = json.dumps(normalized, default=str, sort_keys=True).encode()
+        self.version = hashlib.sha256(payload).hexdigest()[:16]
+
+    def age(self) -> float:
+        return (datetime.utcnow() - self.created_at).total_seconds()
+
+
+class GlobalStatsService:
+    """
+    Общий для всех отчётов снимок глобальной статистики.
+    Считается не чаще раза в ttl секунд (фоновая задача + ленивое обновление в get()),
+    графики строятся один раз на снимок. Статистика пересчитывается по истечении ttl всегда
+    (её меняют и правки исследований/пациентов, и окна «от сегодня»); если итог совпал
+    с прежним снимком, графики не перестраиваются.
+    """
+
+    def __init__(self, ttl: int = REPORT_STATS_TTL):
+        self.ttl = ttl
+        self._snapshot = None
+        self._lock = threading.Lock()
+        self._task = None
+        self.refreshes = 0
+
+    def get(self) -> GlobalStatsSnapshot:
+        snapshot = self._snapshot
+        if snapshot is None or snapshot.age() >= self.ttl:
+            snapshot = self.refresh(force=False)
+        return snapshot
+
+    def refresh(self, force: bool = True) -> GlobalStatsSnapshot:
+        with self._lock:
+            # пока ждали блокировку, снимок мог обновить другой поток
+            current = self._snapshot
+            if not force and current is not None and current.age() < self.ttl:
+                return current
+
+            with UnitOfWork(name="global stats") as uow:
+                stats = ReportRepository(uow.session).global_stats()
+
+            snapshot = GlobalStatsSnapshot(stats)
+            if current is not None and current.version == snapshot.version:
+                snapshot.charts = current.charts
+            else:
+                snapshot.charts = build_charts(stats)
+            self._snapshot = snapshot
+            self.refreshes += 1
+            return self._snapshot
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await run_in_threadpool(self.refresh)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # БД недоступна — попробуем в следующий раз, get() обновит лениво
+                pass
+            await asyncio.sleep(max(self.ttl, 1))
+
+
+global_stats_service = GlobalStatsService()
@@ -0,0 +1,96 @@
+"""
+Уменьшенные копии QC изображений: миниатюра для списков и отчётов, превью для просмотра.
+Создаются один раз при загрузке и лежат рядом с оригиналом:
+app/uploads/original/12.png -> app/uploads/original/12.thumb.webp, 12.preview.webp.
+Для записей, загруженных раньше, создаются при первом запросе.
+"""
+import os
+import tempfile
+from PIL import Image, features
+
+from app.storage.codecs import open_image
+
+# имя размера -> максимальная сторона, px
+PREVIEW_SIZES = {
+    "thumb": int(os.getenv("PREVIEW_THUMB_PX", "256")),
+    "preview": int(os.getenv("PREVIEW_MEDIUM_PX", "1024")),
+}
+PREVIEW_QUALITY = int(os.getenv("PREVIEW_QUALITY", "80"))
+# WebP, если Pillow собран с libwebp, иначе JPEG
+PREVIEW_FORMAT = "WEBP" if features.check("webp") else "JPEG"
+PREVIEW_MEDIA_TYPES = {"WEBP": "image/webp", "JPEG": "image/jpeg"}
+_EXTENSIONS = {"WEBP": "webp", "JPEG": "jpg"}
+
+
+def preview_path(image_path: str, size: str) -> str:
+    base, _ = os.path.splitext(image_path)
+    return f"{base}.{size}.{_EXTENSIONS[PREVIEW_FORMAT]}"
+
+
+def _to_8bit(img: Image.Image) -> Image.Image:
+    """
+    16-битные и float снимки (I;16, I, F) растягиваются по фактическому диапазону в L:
+    convert("L") просто обрезал бы значения выше 255 и дал белый кадр.
+    """
+    if img.mode in ("I;16", "I;16B", "I;16L", "I", "F"):
+        img = img.convert("F") if img.mode == "F" else img.convert("I")
+        low, high = img.getextrema()
+        scale = 255.0 / (high - low) if high > low else 0
+        return img.point(lambda v: (v - low) * scale).convert("L")
+    if img.mode in ("L", "RGB"):
+        return img
+    if img.mode in ("LA", "RGBA", "P", "PA"):
+        # прозрачность на белом фоне — JPEG альфа-канал не поддерживает
+        img = img.convert("RGBA")
+        background = Image.new("RGB", img.size, (255, 255, 255))
+        background.paste(img, mask=img.getchannel("A"))
+        return background
+    return img.convert("RGB")
+
+
+def _save_atomic(img: Image.Image, path: str):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            img.save(f, format=PREVIEW_FORMAT, quality=PREVIEW_QUALITY)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def generate_previews(image_path: str) -> dict:
+    """
+    Создаёт все размеры из PREVIEW_SIZES за одно декодирование оригинала:
+    от большего к меньшему, каждый следующий уменьшается из предыдущего.
+    Возвращает {размер: путь}.
+    """
+    paths = {}
+    with open_image(image_path) as img:
+        img.draft("RGB", (max(PREVIEW_SIZES.values()),) * 2)  # JPEG декодируется сразу уменьшенным
+        current = _to_8bit(img)
+        for size, px in sorted(PREVIEW_SIZES.items(), key=lambda item: -item[1]):
+            current.thumbnail((px, px), Image.LANCZOS, reducing_gap=3.0)
+            path = preview_path(image_path, size)
+            _save_atomic(current, path)
+            paths[size] = path
+    return paths
+
+
+def ensure_preview(image_path: str, size: str) -> str:
+    """Путь к уменьшенной копии; если её нет (или оригинал новее) — создаёт."""
+    path = preview_path(image_path, size)
+    try:
+        if os.path.getmtime(path) >= os.path.getmtime(image_path):
+            return path
+    except OSError:
+        pass
+    return generate_previews(image_path)[size]
+
+
+def remove_previews(image_path: str):
+    for size in PREVIEW_SIZES:
+        path = preview_path(image_path, size)
+        if os.path.isfile(path):
+            os.remove(path)
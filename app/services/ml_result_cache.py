@@ -0,0 +1,121 @@
+import os
+import json
+import hashlib
+import threading
+from datetime import datetime, timedelta
+from typing import Optional
+
+from app.models.ml_cache_entries import MLCacheEntry
+from app.repositories.ml_cache_repository import MLCacheRepository
+from app.storage.image_store import image_store
+
+# Версия модели ML сервиса входит в ключ: после обновления модели старые результаты не используются
+ML_MODEL_VERSION = os.getenv("ML_MODEL_VERSION", "1")
+ML_RESULT_CACHE_TTL = int(os.getenv("ML_RESULT_CACHE_TTL", str(7 * 24 * 3600)))  # 0 — кэш выключен
+ML_RESULT_CACHE_MAX_ENTRIES = int(os.getenv("ML_RESULT_CACHE_MAX_ENTRIES", "10000"))
+_PRUNE_BATCH = 500
+
+
+class MLResultCache:
+    """
+    Кэш результатов ML по содержимому загруженного файла.
+    Повторная загрузка того же файла (обрыв сети, дубль из PACS) создаёт QCRecord
+    из сохранённого ответа без вызова ML сервиса. Записи живут ttl секунд с момента создания,
+    сверх max_entries вытесняются давно не использованные.
+    """
+
+    def __init__(
+        self,
+        model_version: str = ML_MODEL_VERSION,
+        ttl: int = ML_RESULT_CACHE_TTL,
+        max_entries: int = ML_RESULT_CACHE_MAX_ENTRIES,
+    ):
+        self.model_version = model_version
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    @staticmethod
+    def digest(image_bytes: bytes) -> str:
+        return hashlib.sha256(image_bytes).hexdigest()
+
+    def _count(self, counter: str, n: int = 1):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + n)
+
+    def get(self, session, image_sha256: str) -> Optional[tuple]:
+        """(ml_result, {"original"/"corrected": ссылка на блоб}) или None; счётчик использования — в транзакции вызывающего."""
+        if not self.enabled:
+            return None
+        repo = MLCacheRepository(session)
+        entry = repo.get(image_sha256, self.model_version, datetime.utcnow() - timedelta(seconds=self.ttl))
+        if entry is None:
+            self._count("misses")
+            return None
+        ml_result = json.loads(entry.ml_results_json)
+        images = {"original": entry.original_ref, "corrected": entry.corrected_ref}
+        repo.touch(entry)
+        self._count("hits")
+        return ml_result, {kind: ref for kind, ref in images.items() if ref}
+
+    def put(self, session, image_sha256: str, ml_result: dict, original_ref: str, corrected_ref: str = None):
+        """Запоминает результат в транзакции сохранения QCRecord; ссылки на блобы — уже сохранённые."""
+        if not self.enabled:
+            return
+        entry = MLCacheEntry(
+            image_sha256=image_sha256,
+            model_version=self.model_version,
+            ml_results_json=json.dumps(ml_result),
+            original_ref=original_ref or None,
+            corrected_ref=corrected_ref or None,
+        )
+        repo = MLCacheRepository(session)
+        if not repo.insert_if_absent(entry):
+            return
+        image_store.add_reference(session, entry.original_ref)
+        image_store.add_reference(session, entry.corrected_ref)
+        self._count("stores")
+        self._prune(repo)
+
+    def _prune(self, repo: MLCacheRepository):
+        victims = repo.expired(datetime.utcnow() - timedelta(seconds=self.ttl), _PRUNE_BATCH)
+        overflow = repo.count() - len(victims) - self.max_entries
+        if overflow > 0:
+            victims += repo.least_recently_used(min(overflow + len(victims), _PRUNE_BATCH))
+        seen = set()
+        for entry in victims:
+            key = (entry.image_sha256, entry.model_version)
+            if key in seen:
+                continue
+            seen.add(key)
+            if repo.delete(entry):
+                image_store.release(repo.session, entry.original_ref)
+                image_store.release(repo.session, entry.corrected_ref)
+                self._count("evictions")
+
+    def stats(self, session) -> dict:
+        lookups = self.hits + self.misses
+        entries = MLCacheRepository(session).count()
+        return {
+            "model_version": self.model_version,
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": (self.hits / lookups) if lookups else 0,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+        }
+
+
+ml_result_cache = MLResultCache()
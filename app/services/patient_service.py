@@ -1,46 +1,78 @@
+import os
 from sqlmodel import Session, select
 from app.models.patients import Patient
 from app.models.exams import Exam
 from app.repositories.patient_repository import PatientRepository
 from fastapi import HTTPException
 from app.models.qc_records import QCRecord
+from app.repositories.qc_rollup_repository import QCRollupRepository
+from app.repositories.qc_job_repository import QCJobRepository
+from app.services.report_cache import report_cache
+from app.storage.image_store import image_store
+from app.config.unit_of_work import AsyncUnitOfWork
 
 class PatientService:
-    def __init__(self, session: Session):
-        self.repo = PatientRepository(session)
+    def __init__(self, uow: AsyncUnitOfWork):
+        self.uow = uow
+        self.repo = PatientRepository(uow.session)
 
-    def create_patient(self, patient_data: dict) -> Patient:
-        patient = Patient(**patient_data)
-        return self.repo.create(patient)
+    async def create_patient(self, patient_data: dict) -> Patient:
+        patient = await self.repo.create(Patient(**patient_data))
+        await self.uow.commit()
+        return patient
 
-    def get_patients(self) -> list[Patient]:
-        return self.repo.get_all()
+    async def get_patients(self, cursor: str | None = None, limit: int | None = None) -> tuple[list[Patient], str | None]:
+        return await self.repo.list_page(cursor, limit)
 
-    def get_patient(self, patient_id: str) -> Patient | None:
-        return self.repo.get_by_id(patient_id)
+    async def get_patient(self, patient_id: str) -> Patient | None:
+        return await self.repo.get_by_id(patient_id)
 
-    def update_patient(self, patient_id: str, update_data: dict) -> Patient | None:
-        patient = self.repo.get_by_id(patient_id)
+    async def update_patient(self, patient_id: str, update_data: dict) -> Patient | None:
+        patient = await self.repo.get_by_id(patient_id)
         if not patient:
             return None
         for key, value in update_data.items():
             setattr(patient, key, value)
-        return self.repo.update(patient)
+        patient = await self.repo.update(patient)
+        await self.uow.commit()
+        return patient
 
-    def delete_patient(self, patient_id: str) -> bool:
-        patient = self.repo.get_by_id(patient_id)
+    async def delete_patient(self, patient_id: str) -> bool:
+        patient = await self.repo.get_by_id(patient_id)
         if not patient:
             return False
 
-        session: Session = self.repo.session
+        # каскад — синхронный код счётчиков и хранилища, на соединении этой же транзакции
+        exams, upload_paths = await self.uow.run_sync(self._delete_cascade, patient)
+        await self.uow.commit()
+
+        for exam in exams:
+            report_cache.invalidate(exam.id)
+        # файлы фоновых задач QC, которые так и не были обработаны
+        for path in upload_paths:
+            if path and os.path.isfile(path):
+                os.remove(path)
+
+        return True
+
+    @staticmethod
+    def _delete_cascade(session: Session, patient: Patient) -> tuple[list[Exam], list[str]]:
+        patient_id = patient.patient_id
 
         # 1️⃣ Получаем все экзамены пациента
         exams = session.exec(select(Exam).where(Exam.patient_id == patient_id)).all()
 
+        # задачи фоновой очереди QC ссылаются на экзамены (FK) — удаляются первыми
+        upload_paths = QCJobRepository(session).delete_for_exams([exam.id for exam in exams])
+
         for exam in exams:
-            # 2️⃣ Удаляем все QC-записи для экзамена
+            # 2️⃣ Удаляем все QC-записи для экзамена (и вычитаем их из счётчиков дашборда)
             qc_records = session.exec(select(QCRecord).where(QCRecord.exam_id == exam.id)).all()
+            QCRollupRepository(session).apply(qc_records, sign=-1)
             for qc in qc_records:
+                # ссылки на изображения в хранилище; сами файлы удалит gc
+                image_store.release(session, qc.original_image_path)
+                image_store.release(session, qc.corrected_image_path)
                 session.delete(qc)
 
             # 3️⃣ Удаляем сам экзамен
@@ -48,6 +80,4 @@ class PatientService:
 
         # 4️⃣ Удаляем пациента
         session.delete(patient)
-        session.commit()
-
-        return True
+        return exams, upload_paths
@@ -0,0 +1,236 @@
+import os
+import asyncio
+import logging
+import shutil
+import uuid
+from datetime import datetime, timedelta
+from fastapi import UploadFile
+from fastapi.concurrency import run_in_threadpool
+
+from app.config.unit_of_work import UnitOfWork
+from app.models.qc_jobs import QCJob
+from app.models.enums.qc_job_status import QCJobStatus
+from app.repositories.qc_job_repository import QCJobRepository
+from app.services.qc_service import QCService
+
+QC_WORKERS = int(os.getenv("QC_WORKERS", "2"))
+QC_QUEUE_MAX_DEPTH = int(os.getenv("QC_QUEUE_MAX_DEPTH", "1000"))
+QC_JOB_MAX_ATTEMPTS = int(os.getenv("QC_JOB_MAX_ATTEMPTS", "3"))
+QC_JOB_POLL_INTERVAL = float(os.getenv("QC_JOB_POLL_INTERVAL", "2"))
+QC_JOB_STALE_AFTER = int(os.getenv("QC_JOB_STALE_AFTER", "600"))
+# как часто искать задачи, зависшие в RUNNING (воркер или процесс упал посреди задачи), с
+QC_JOB_STALE_CHECK_INTERVAL = float(os.getenv("QC_JOB_STALE_CHECK_INTERVAL", "60"))
+# повтор после ошибки: QC_JOB_RETRY_DELAY * 2^(попытка-1), не больше QC_JOB_RETRY_MAX_DELAY, с
+QC_JOB_RETRY_DELAY = float(os.getenv("QC_JOB_RETRY_DELAY", "5"))
+QC_JOB_RETRY_MAX_DELAY = float(os.getenv("QC_JOB_RETRY_MAX_DELAY", "300"))
+
+INCOMING_DIR = os.path.join("app", "uploads", "incoming")
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(RuntimeError):
+    pass
+
+
+def _with_repo(fn, *args):
+    # одна операция с очередью — одна транзакция
+    with UnitOfWork(name="qc worker") as uow:
+        result = fn(QCJobRepository(uow.session), *args)
+        uow.commit()
+        return result
+
+
+def retry_delay(attempts: int) -> float:
+    """Пауза перед повтором задачи после attempts неудачных попыток (экспоненциальный backoff)."""
+    return min(QC_JOB_RETRY_DELAY * 2 ** max(attempts - 1, 0), QC_JOB_RETRY_MAX_DELAY)
+
+
+class QCWorkerPool:
+    """
+    Пул фоновых воркеров QC.
+    Очередь — таблица qcjob, поэтому задачи переживают перезапуск
+    и могут разбираться несколькими процессами приложения.
+    Воркеры — задачи asyncio: ML вызов асинхронный, БД и диск — в threadpool.
+    """
+
+    def __init__(self, workers: int = QC_WORKERS):
+        self.workers = workers
+        self._tasks = []
+        self._wakeup = None
+        self.processed_total = 0
+        self.failed_total = 0
+        self.busy = 0
+
+    async def start(self):
+        if self._tasks:
+            return
+        self._wakeup = asyncio.Event()
+        await run_in_threadpool(self._requeue_stale)
+        self._tasks = [asyncio.create_task(self._run()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._watch_stale()))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def notify(self):
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    @staticmethod
+    def _requeue_stale() -> int:
+        stale_before = datetime.utcnow() - timedelta(seconds=QC_JOB_STALE_AFTER)
+        return _with_repo(QCJobRepository.requeue_stale, stale_before)
+
+    async def _watch_stale(self):
+        # задачи, зависшие в RUNNING, возвращаются в очередь и без перезапуска приложения
+        while True:
+            await asyncio.sleep(max(QC_JOB_STALE_CHECK_INTERVAL, 1))
+            try:
+                if await run_in_threadpool(self._requeue_stale):
+                    self.notify()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("не удалось вернуть зависшие QC задачи в очередь")
+
+    async def _run(self):
+        while True:
+            try:
+                job = await run_in_threadpool(_with_repo, QCJobRepository.claim_next)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                job = None
+            if job is None:
+                # ждём новую задачу или следующий опрос таблицы
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=QC_JOB_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            self.busy += 1
+            try:
+                await self._process(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # не удалось записать результат задачи (БД недоступна и т.п.): воркер продолжает работу,
+                # задача останется в RUNNING и вернётся в очередь через QC_JOB_STALE_AFTER (_watch_stale)
+                logger.exception("QC задача %s: не удалось записать результат", job.id)
+            finally:
+                self.busy -= 1
+
+    async def _process(self, job: QCJob):
+        try:
+            with open(job.upload_path, "rb") as f:
+                image_bytes = await run_in_threadpool(f.read)
+            with UnitOfWork(name="qc job") as uow:
+                service = QCService(uow)
+                ml_result, images, cache_key = await service.analyze(
+                    image_bytes, filename=job.filename, content_type=job.content_type, force=job.force
+                )
+                qc_record = await run_in_threadpool(
+                    service._save_qc_record, job.exam_id, job.created_by, ml_result, images, cache_key
+                )
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            retry = job.attempts < QC_JOB_MAX_ATTEMPTS
+            status = QCJobStatus.QUEUED if retry else QCJobStatus.FAILED
+            # временный сбой ML сервиса не должен съесть все попытки за миллисекунды
+            not_before = datetime.utcnow() + timedelta(seconds=retry_delay(job.attempts)) if retry else None
+            await run_in_threadpool(_with_repo, QCJobRepository.finish, job, status, None, str(e), not_before)
+            if not retry:
+                self.failed_total += 1
+                self._remove_upload(job)
+            return
+
+        await run_in_threadpool(_with_repo, QCJobRepository.finish, job, QCJobStatus.DONE, qc_record.id)
+        self.processed_total += 1
+        self._remove_upload(job)
+
+    @staticmethod
+    def _remove_upload(job: QCJob):
+        if job.upload_path and os.path.isfile(job.upload_path):
+            os.remove(job.upload_path)
+
+
+qc_worker_pool = QCWorkerPool()
+
+
+class QCJobService:
+    def __init__(self, uow: UnitOfWork):
+        self.uow = uow
+
+    def enqueue(self, exam_id: int, file: UploadFile, user_id: int, force: bool = False) -> QCJob:
+        if not file:
+            raise RuntimeError("Файл не передан")
+
+        repo = QCJobRepository(self.uow.session)
+        # backpressure: не принимаем больше, чем успеваем обработать
+        pending = repo.pending()
+        # файл копируется без открытой транзакции
+        self.uow.rollback()
+        if pending >= QC_QUEUE_MAX_DEPTH:
+            raise QueueFullError("Очередь QC переполнена, повторите позже")
+
+        os.makedirs(INCOMING_DIR, exist_ok=True)
+        upload_path = os.path.join(INCOMING_DIR, uuid.uuid4().hex)
+        with open(upload_path, "wb") as f:
+            shutil.copyfileobj(file.file, f)
+
+        job = repo.create(QCJob(
+            exam_id=exam_id,
+            created_by=user_id,
+            filename=file.filename or "image.png",
+            content_type=file.content_type or "application/octet-stream",
+            upload_path=upload_path,
+            force=force,
+        ))
+        self.uow.commit()
+
+        qc_worker_pool.notify()
+        return job
+
+    def get_job_status(self, job_id: int) -> dict:
+        repo = QCJobRepository(self.uow.session)
+        job = repo.get(job_id)
+        if not job:
+            raise RuntimeError("Задача не найдена")
+        result = {
+            "id": job.id,
+            "exam_id": job.exam_id,
+            "status": job.status,
+            "attempts": job.attempts,
+            "error": job.error,
+            "not_before": job.not_before,
+            "created_at": job.created_at,
+            "started_at": job.started_at,
+            "finished_at": job.finished_at,
+            "qc_record_id": job.qc_record_id,
+        }
+        if job.status == QCJobStatus.QUEUED:
+            result["queue_position"] = repo.position(job)
+        if job.qc_record_id:
+            result["original_image_url"] = f"/qc/{job.qc_record_id}/image?original=true"
+            result["processed_image_url"] = f"/qc/{job.qc_record_id}/image?original=false"
+        return result
+
+    def metrics(self) -> dict:
+        counts = QCJobRepository(self.uow.session).count_by_status()
+        return {
+            "queue_depth": counts[QCJobStatus.QUEUED.value],
+            "running": counts[QCJobStatus.RUNNING.value],
+            "by_status": counts,
+            "max_depth": QC_QUEUE_MAX_DEPTH,
+            "workers": qc_worker_pool.workers,
+            "busy_workers": qc_worker_pool.busy,
+            "processed_total": qc_worker_pool.processed_total,
+            "failed_total": qc_worker_pool.failed_total,
+        }
@@ -0,0 +1,48 @@
+from fastapi.concurrency import run_in_threadpool
+
+from app.config.unit_of_work import AsyncUnitOfWork
+from app.repositories.filters import Period
+from app.repositories.qc_repository import AsyncQCRepository
+from app.services.qc_service import QCService
+
+
+class QCReadService:
+    """
+    Чтение QC записей и изображений для async-эндпоинтов: запросы к БД не занимают поток,
+    чтение с диска и превью — в threadpool. Загрузка, отчёты и экспорт — QCService.
+    """
+
+    def __init__(self, uow: AsyncUnitOfWork):
+        self.uow = uow
+        self.repo = AsyncQCRepository(uow.session)
+
+    async def get_qc_by_exam(self, exam_id: int):
+        return await self.repo.get_by_exam(exam_id)
+
+    async def list_qc(
+        self,
+        patient_id: str = None,
+        date_from: Period = None,
+        date_to: Period = None,
+        flag: str = None,
+        cursor: str = None,
+        limit: int = None,
+    ):
+        """Страница QC записей и курсор следующей; все фильтры — в SQL."""
+        return await self.repo.list_page(patient_id, date_from, date_to, flag, cursor, limit)
+
+    async def get_image_file(self, qc_id: int, original: bool = True, size: str = "full"):
+        """См. QCService.image_file; None — изображение только в ml_results (get_image_response)."""
+        paths = await self.repo.image_paths(qc_id)
+        # дальше — диск и перекодирование, соединение больше не нужно
+        await self.uow.rollback()
+        if paths is None:
+            raise RuntimeError("QC record not found")
+        return await run_in_threadpool(QCService.image_file, paths, original, size)
+
+    async def get_image_response(self, qc_id: int, original: bool = True):
+        row = await self.repo.ml_results(qc_id)
+        await self.uow.rollback()
+        if row is None:
+            raise RuntimeError("QC record not found")
+        return QCService.image_response(row[1], original)
@@ -0,0 +1,125 @@
+import os
+import glob
+import hashlib
+import threading
+import uuid
+from typing import Optional
+
+REPORT_CACHE_DIR = os.getenv("REPORT_CACHE_DIR", os.path.join("app", "uploads", "reports"))
+REPORT_CACHE_MAX_BYTES = int(os.getenv("REPORT_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+
+class ReportCache:
+    """
+    Дисковый кэш готовых PDF отчётов.
+    Имя файла — {exam_id}-{sha256(версия)}: версия собирается из QC записей исследования
+    и глобальной статистики, поэтому устаревший отчёт просто не находится.
+    Размер ограничен max_bytes, вытесняются давно не читавшиеся файлы (mtime обновляется при попадании).
+    """
+
+    def __init__(self, directory: str = REPORT_CACHE_DIR, max_bytes: int = REPORT_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._size = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def key(exam_id: int, version: str) -> str:
+        return f"{exam_id}-{hashlib.sha256(version.encode()).hexdigest()[:32]}"
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.pdf")
+
+    def _entries(self) -> list:
+        return glob.glob(os.path.join(self.directory, "*.pdf"))
+
+    def _current_size(self) -> int:
+        if self._size is None:
+            self._size = sum(os.path.getsize(p) for p in self._entries() if os.path.isfile(p))
+        return self._size
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return data
+
+    def put(self, key: str, data: bytes):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+        tmp_path = os.path.join(self.directory, f".{uuid.uuid4().hex}.tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        with self._lock:
+            size = self._current_size()
+            if os.path.isfile(path):
+                size -= os.path.getsize(path)
+            os.replace(tmp_path, path)
+            self._size = size + len(data)
+            self._evict(keep=path)
+
+    def _evict(self, keep: str):
+        if self._size <= self.max_bytes:
+            return
+        entries = []
+        for path in self._entries():
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        for _, size, path in sorted(entries):
+            if self._size <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            self._remove(path, size)
+            self.evictions += 1
+
+    def _remove(self, path: str, size: int):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            return
+        self._size = max(0, (self._size or 0) - size)
+
+    def invalidate(self, exam_id: int):
+        """Удаляет все версии отчёта исследования (новые QC данные)."""
+        with self._lock:
+            self._current_size()
+            for path in glob.glob(os.path.join(self.directory, f"{exam_id}-*.pdf")):
+                try:
+                    size = os.path.getsize(path)
+                except FileNotFoundError:
+                    continue
+                self._remove(path, size)
+                self.invalidations += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": (self.hits / lookups) if lookups else 0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "entries": len(self._entries()),
+                "size_bytes": self._current_size(),
+                "max_bytes": self.max_bytes,
+            }
+
+
+report_cache = ReportCache()
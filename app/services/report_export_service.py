@@ -0,0 +1,219 @@
+import io
+import os
+import tempfile
+import threading
+import zipfile
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+
+from app.config.unit_of_work import UnitOfWork
+from app.repositories.exam_repository import ExamRepository
+from app.reports.blocks import render_qc_report
+from app.reports.fonts import register_fonts
+from app.services.global_stats_service import global_stats_service
+from app.services.qc_service import QCService
+from app.services.report_cache import report_cache
+
+try:
+    from pypdf import PdfWriter
+except ImportError:  # объединённый PDF — только с pypdf
+    PdfWriter = None
+
+REPORT_EXPORT_WORKERS = int(os.getenv("REPORT_EXPORT_WORKERS", str(os.cpu_count() or 2)))
+REPORT_EXPORT_MAX_EXAMS = int(os.getenv("REPORT_EXPORT_MAX_EXAMS", "2000"))
+# объединённый PDF собирается в памяти (pypdf держит все страницы до write()) — его размер ограничен;
+# больше отчётов — только zip, он пишется потоком
+REPORT_EXPORT_PDF_MAX_EXAMS = int(os.getenv("REPORT_EXPORT_PDF_MAX_EXAMS", "200"))
+# Сколько отчётов одновременно «в работе» (в пуле или ждут выдачи) на одну выгрузку
+REPORT_EXPORT_WINDOW = int(os.getenv("REPORT_EXPORT_WINDOW", str(2 * REPORT_EXPORT_WORKERS)))
+
+EXPORT_FORMATS = ("zip", "pdf")
+_CHUNK = 1024 * 1024
+
+
+class ExportError(ValueError):
+    pass
+
+
+def _parse_date(value: str, name: str):
+    # дата без времени — весь день (см. app.repositories.filters.period)
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise ExportError(f"{name}: ожидается дата YYYY-MM-DD")
+
+
+class ReportProcessPool:
+    """
+    Пул процессов для рендера PDF: reportlab упирается в CPU и GIL.
+    Создаётся при первой выгрузке; spawn — воркеры не наследуют потоки и соединения с БД.
+    """
+
+    def __init__(self, workers: int = REPORT_EXPORT_WORKERS):
+        self.workers = workers
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def get(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=register_fonts,
+                )
+            return self._executor
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+report_process_pool = ReportProcessPool()
+
+
+class _ZipSink:
+    """Несжимаемый «файл» для zipfile: накапливает записанное, drain() отдаёт и очищает."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+class ReportExportService:
+    """
+    Пакетная выгрузка QC отчётов.
+    Общие данные (снимок глобальной статистики и графики) берутся один раз на выгрузку,
+    отчёты рендерятся в пуле процессов скользящим окном и отдаются по порядку —
+    в памяти одновременно не больше window отчётов. Готовые отчёты берутся из report_cache
+    и кладутся в него.
+    """
+
+    def __init__(self, uow: UnitOfWork, pool: ReportProcessPool = report_process_pool, window: int = REPORT_EXPORT_WINDOW):
+        self.uow = uow
+        self.pool = pool
+        self.window = max(1, window)
+
+    def resolve_exam_ids(self, exam_ids=None, date_from: str = None, date_to: str = None, patient_id: str = None) -> list:
+        if not exam_ids and not (date_from or date_to or patient_id):
+            raise ExportError("Укажите exam_ids или период (date_from/date_to)")
+        ids = ExamRepository(self.uow.session).list_ids(
+            exam_ids or None, patient_id, _parse_date(date_from, "date_from"), _parse_date(date_to, "date_to"),
+            limit=REPORT_EXPORT_MAX_EXAMS + 1,
+        )
+        self.uow.rollback()
+        if exam_ids:
+            missing = sorted(set(exam_ids) - set(ids))
+            if missing:
+                raise ExportError(f"Исследования не найдены: {missing[:20]}")
+        if len(ids) > REPORT_EXPORT_MAX_EXAMS:
+            raise ExportError(f"Слишком много исследований, максимум {REPORT_EXPORT_MAX_EXAMS}")
+        if not ids:
+            raise ExportError("Нет исследований для выгрузки")
+        return ids
+
+    def iter_reports(self, exam_ids: list):
+        """(exam_id, pdf bytes) в порядке exam_ids."""
+        snapshot = global_stats_service.get()
+        session = self.uow.session
+        pending = deque()
+        try:
+            for exam_id in exam_ids:
+                key = QCService.report_cache_key(session, exam_id, snapshot)
+                if key is None:
+                    continue
+                pdf = report_cache.get(key)
+                future = None
+                if pdf is None:
+                    data = QCService.report_data(session, exam_id, snapshot)
+                    future = self.pool.get().submit(render_qc_report, data)
+                pending.append((exam_id, key, future, pdf))
+                if len(pending) >= self.window:
+                    # пока клиент читает отчёты, соединение не держим
+                    self.uow.rollback()
+                while len(pending) >= self.window:
+                    yield self._collect(pending.popleft())
+            self.uow.rollback()
+            while pending:
+                yield self._collect(pending.popleft())
+        finally:
+            for _, _, future, _ in pending:
+                if future is not None:
+                    future.cancel()
+            self.uow.rollback()
+
+    @staticmethod
+    def _collect(item) -> tuple:
+        exam_id, key, future, pdf = item
+        if future is not None:
+            pdf = future.result()
+            report_cache.put(key, pdf)
+        return exam_id, pdf
+
+    def stream_zip(self, exam_ids: list):
+        """Zip архив кусками: по отчёту на исследование, без сжатия (PDF уже сжат)."""
+        sink = _ZipSink()
+        with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_STORED) as archive:
+            for exam_id, pdf in self.iter_reports(exam_ids):
+                info = zipfile.ZipInfo(f"qc_report_exam_{exam_id}.pdf", date_time=datetime.now().timetuple()[:6])
+                archive.writestr(info, pdf)
+                yield sink.drain()
+        yield sink.drain()
+
+    def stream_merged_pdf(self, exam_ids: list):
+        """
+        Один PDF из всех отчётов; собирается во временном файле и отдаётся кусками.
+        pypdf держит разобранные страницы до write(), поэтому отчётов не больше REPORT_EXPORT_PDF_MAX_EXAMS.
+        """
+        writer = PdfWriter()
+        for _, pdf in self.iter_reports(exam_ids):
+            writer.append(io.BytesIO(pdf))
+        with tempfile.TemporaryFile() as tmp:
+            writer.write(tmp)
+            writer.close()
+            tmp.seek(0)
+            while True:
+                chunk = tmp.read(_CHUNK)
+                if not chunk:
+                    break
+                yield chunk
+
+    def export(self, exam_ids: list, fmt: str = "zip"):
+        if fmt not in EXPORT_FORMATS:
+            raise ExportError(f"Формат должен быть одним из {EXPORT_FORMATS}")
+        if fmt == "pdf":
+            if PdfWriter is None:
+                raise ExportError("Объединённый PDF недоступен: не установлен пакет pypdf")
+            if len(exam_ids) > REPORT_EXPORT_PDF_MAX_EXAMS:
+                raise ExportError(
+                    f"В объединённый PDF — не больше {REPORT_EXPORT_PDF_MAX_EXAMS} отчётов, для большего числа используйте format=zip"
+                )
+            return self.stream_merged_pdf(exam_ids)
+        return self.stream_zip(exam_ids)
+
+    def export_to_file(self, exam_ids: list, path: str, fmt: str = "zip"):
+        with open(path, "wb") as f:
+            for chunk in self.export(exam_ids, fmt):
+                f.write(chunk)
+
@@ -1,28 +1,34 @@
 from app.repositories.user_repository import UserRepository
 from app.models.users import User
-from sqlmodel import Session
-from typing import List
+from app.config.unit_of_work import AsyncUnitOfWork
+from typing import List, Optional, Tuple
 
 class UserService:
-    def __init__(self, session: Session):
-        self.user_repo = UserRepository(session)
+    def __init__(self, uow: AsyncUnitOfWork):
+        self.uow = uow
+        self.user_repo = UserRepository(uow.session)
 
-    def list_users(self) -> List[User]:
-        return self.user_repo.get_all()
+    async def list_users(self, cursor: Optional[str] = None, limit: Optional[int] = None) -> Tuple[List[User], Optional[str]]:
+        return await self.user_repo.list_page(cursor, limit)
 
-    def get_user(self, user_id: int) -> User:
-        user = self.user_repo.get(user_id)
+    async def get_user(self, user_id: int) -> User:
+        user = await self.user_repo.get(user_id)
         if not user:
             raise Exception(f"User {user_id} not found")
         return user
 
-    def create_user(self, user: User) -> User:
-        return self.user_repo.add(user)
+    async def create_user(self, user: User) -> User:
+        user = await self.user_repo.add(user)
+        await self.uow.commit()
+        return user
 
-    def update_user(self, user_id: int, **kwargs) -> User:
+    async def update_user(self, user_id: int, **kwargs) -> User:
         # вызываем update напрямую с user_id и kwargs
-        return self.user_repo.update(user_id, **kwargs)
+        user = await self.user_repo.update(user_id, **kwargs)
+        await self.uow.commit()
+        return user
 
-    def delete_user(self, user_id: int):
-        user = self.get_user(user_id)
-        self.user_repo.delete(user)
+    async def delete_user(self, user_id: int):
+        user = await self.get_user(user_id)
+        await self.user_repo.delete(user)
+        await self.uow.commit()
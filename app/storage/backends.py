@@ -0,0 +1,163 @@
+"""
+Бэкенды хранилища блобов. Ключ — относительный путь вида "ab/cd/<sha256>.png"
+(две ступени шардирования по 256 каталогов — в одном каталоге не копятся миллионы файлов).
+Запись атомарна: по ключу либо нет ничего, либо полный файл.
+"""
+import os
+import re
+import shutil
+import tempfile
+from typing import Iterator, Tuple
+
+try:
+    import boto3
+except ImportError:  # S3 — только с boto3
+    boto3 = None
+
+_BLOB_NAME = re.compile(r"^[0-9a-f]{64}\.[a-z0-9]+$")
+
+
+def _move_atomic(src_path: str, path: str):
+    """Перемещает файл на место path; между файловыми системами — копия во временный файл рядом и rename."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    try:
+        os.replace(src_path, path)
+        return
+    except OSError:
+        pass
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as dst, open(src_path, "rb") as src:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    os.remove(src_path)
+
+
+class StorageBackend:
+    """Интерфейс бэкенда; ImageStore работает только через эти методы."""
+
+    def exists(self, key: str) -> bool:
+        raise NotImplementedError
+
+    def put_file(self, key: str, src_path: str):
+        """Сохраняет src_path под ключом; src_path забирается (перемещается или удаляется)."""
+        raise NotImplementedError
+
+    def local_path(self, key: str, fetch: bool = True) -> str:
+        """Путь к локальной копии для чтения (PIL, reportlab, FileResponse); fetch=False — не скачивать."""
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    def iter_keys(self) -> Iterator[Tuple[str, float]]:
+        """(ключ, время записи) всех блобов — для сборки мусора."""
+        raise NotImplementedError
+
+
+class LocalStorageBackend(StorageBackend):
+    def __init__(self, root: str):
+        self.root = root
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, *key.split("/"))
+
+    def exists(self, key: str) -> bool:
+        return os.path.isfile(self._path(key))
+
+    def put_file(self, key: str, src_path: str):
+        _move_atomic(src_path, self._path(key))
+
+    def local_path(self, key: str, fetch: bool = True) -> str:
+        return self._path(key)
+
+    def delete(self, key: str):
+        path = self._path(key)
+        if os.path.isfile(path):
+            os.remove(path)
+
+    def iter_keys(self) -> Iterator[Tuple[str, float]]:
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                # рядом лежат уменьшенные копии (<sha>.thumb.webp) и недописанные .tmp — это не блобы
+                if not _BLOB_NAME.match(name):
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    mtime = os.path.getmtime(path)
+                except OSError:
+                    continue
+                yield os.path.relpath(path, self.root).replace(os.sep, "/"), mtime
+
+
+class S3StorageBackend(StorageBackend):
+    """
+    S3-совместимое хранилище (AWS S3, MinIO, Ceph RGW). client — boto3 S3 client или совместимый объект
+    (head_object, upload_file, download_file, delete_object, get_paginator("list_objects_v2")):
+    локально можно поднять MinIO и указать S3_ENDPOINT_URL.
+    Для чтения объекты скачиваются в cache_dir — PIL и FileResponse работают с локальными файлами.
+    """
+
+    def __init__(self, bucket: str, cache_dir: str, prefix: str = "", client=None, endpoint_url: str = None):
+        if client is None:
+            if boto3 is None:
+                raise RuntimeError("Для S3 хранилища нужен пакет boto3")
+            client = boto3.client("s3", endpoint_url=endpoint_url or None)
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+        self.cache = LocalStorageBackend(cache_dir)
+
+    def _object_key(self, key: str) -> str:
+        return f"{self.prefix}/{key}" if self.prefix else key
+
+    @staticmethod
+    def _is_not_found(e: Exception) -> bool:
+        code = getattr(e, "response", {}).get("Error", {}).get("Code")
+        return code in ("404", "NoSuchKey", "NotFound")
+
+    def exists(self, key: str) -> bool:
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self._object_key(key))
+            return True
+        except Exception as e:
+            if self._is_not_found(e):
+                return False
+            raise
+
+    def put_file(self, key: str, src_path: str):
+        # объект в S3 появляется целиком только после успешной загрузки
+        self.client.upload_file(src_path, self.bucket, self._object_key(key))
+        # загруженный файл сразу становится локальной копией
+        self.cache.put_file(key, src_path)
+
+    def local_path(self, key: str, fetch: bool = True) -> str:
+        path = self.cache.local_path(key)
+        if fetch and not os.path.isfile(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            os.close(fd)
+            try:
+                self.client.download_file(self.bucket, self._object_key(key), tmp_path)
+                os.replace(tmp_path, path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+        return path
+
+    def delete(self, key: str):
+        self.client.delete_object(Bucket=self.bucket, Key=self._object_key(key))
+        self.cache.delete(key)
+
+    def iter_keys(self) -> Iterator[Tuple[str, float]]:
+        paginator = self.client.get_paginator("list_objects_v2")
+        prefix = f"{self.prefix}/" if self.prefix else ""
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix):
+            for obj in page.get("Contents", []):
+                key = obj["Key"][len(prefix):]
+                if _BLOB_NAME.match(key.rsplit("/", 1)[-1]):
+                    yield key, obj["LastModified"].timestamp()
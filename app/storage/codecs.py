@@ -0,0 +1,176 @@
+"""
+Формат хранения изображений в app.storage (IMAGE_STORAGE_CODEC):
+
+    original — как прислал ML сервис (PNG), без перекодирования (по умолчанию)
+    png      — PNG с уровнем сжатия IMAGE_PNG_COMPRESS_LEVEL (0-9)
+    webp     — WebP lossless; только 8 бит, 16-битные снимки сохраняются в PNG
+    jxl      — JPEG XL lossless (нужен плагин pillow-jxl-plugin), иначе PNG
+    npz      — массив numpy как есть (в т.ч. uint16) в сжатом .npz, нужен numpy
+
+Все варианты без потерь. Выбор под конкретную установку — benchmarks/bench_image_codecs.py.
+"""
+import io
+import os
+from typing import Optional
+
+from PIL import Image, features
+
+try:
+    import numpy
+except ImportError:  # npz — только с numpy
+    numpy = None
+
+try:
+    import pillow_jxl  # noqa: F401  регистрирует формат JXL в Pillow
+    _HAS_JXL = True
+except ImportError:
+    _HAS_JXL = False
+
+IMAGE_STORAGE_CODEC = os.getenv("IMAGE_STORAGE_CODEC", "original")
+IMAGE_PNG_COMPRESS_LEVEL = int(os.getenv("IMAGE_PNG_COMPRESS_LEVEL", "6"))
+IMAGE_WEBP_METHOD = int(os.getenv("IMAGE_WEBP_METHOD", "4"))  # 0 — быстро, 6 — плотнее
+IMAGE_JXL_EFFORT = int(os.getenv("IMAGE_JXL_EFFORT", "7"))
+
+_HIGH_DEPTH_MODES = ("I;16", "I;16B", "I;16L", "I", "F")
+
+
+class Codec:
+    name = ""
+    extension = ""
+    media_type = None  # None — браузер не покажет, при отдаче перекодируется в PNG
+
+    @property
+    def available(self) -> bool:
+        return True
+
+    def supports(self, img: Image.Image) -> bool:
+        return True
+
+    def encode(self, img: Image.Image, fp):
+        raise NotImplementedError
+
+    def decode(self, path: str) -> Image.Image:
+        return Image.open(path)
+
+
+class PNGCodec(Codec):
+    name = "png"
+    extension = "png"
+    media_type = "image/png"
+
+    def __init__(self, compress_level: int = IMAGE_PNG_COMPRESS_LEVEL):
+        self.compress_level = compress_level
+
+    def encode(self, img: Image.Image, fp):
+        img.save(fp, format="PNG", compress_level=self.compress_level)
+
+
+class WebPCodec(Codec):
+    name = "webp"
+    extension = "webp"
+    media_type = "image/webp"
+
+    def __init__(self, method: int = IMAGE_WEBP_METHOD):
+        self.method = method
+
+    @property
+    def available(self) -> bool:
+        return features.check("webp")
+
+    def supports(self, img: Image.Image) -> bool:
+        # WebP — 8 бит на канал: 16-битный снимок потерял бы точность
+        return img.mode not in _HIGH_DEPTH_MODES
+
+    def encode(self, img: Image.Image, fp):
+        img.save(fp, format="WEBP", lossless=True, quality=100, method=self.method)
+
+
+class JXLCodec(Codec):
+    name = "jxl"
+    extension = "jxl"
+
+    def __init__(self, effort: int = IMAGE_JXL_EFFORT):
+        self.effort = effort
+
+    @property
+    def available(self) -> bool:
+        return _HAS_JXL
+
+    def supports(self, img: Image.Image) -> bool:
+        return img.mode not in ("I", "F")
+
+    def encode(self, img: Image.Image, fp):
+        img.save(fp, format="JXL", lossless=True, effort=self.effort)
+
+
+class NPZCodec(Codec):
+    name = "npz"
+    extension = "npz"
+
+    @property
+    def available(self) -> bool:
+        return numpy is not None
+
+    def supports(self, img: Image.Image) -> bool:
+        return img.mode in ("L", "RGB", "RGBA") + _HIGH_DEPTH_MODES
+
+    def encode(self, img: Image.Image, fp):
+        if img.mode in ("I;16B", "I;16L"):
+            img = img.convert("I;16")
+        numpy.savez_compressed(fp, image=numpy.asarray(img))
+
+    def decode(self, path: str) -> Image.Image:
+        with numpy.load(path) as data:
+            return Image.fromarray(data["image"])
+
+
+CODECS = {codec.name: codec for codec in (PNGCodec(), WebPCodec(), JXLCodec(), NPZCodec())}
+_BY_EXTENSION = {codec.extension: codec for codec in CODECS.values()}
+
+
+def codec_for_path(path: str) -> Codec:
+    return _BY_EXTENSION.get(os.path.splitext(path)[1].lstrip(".").lower(), CODECS["png"])
+
+
+def open_image(path: str) -> Image.Image:
+    """Открывает изображение из хранилища в любом из форматов выше."""
+    return codec_for_path(path).decode(path)
+
+
+def encode_for_storage(img: Image.Image, codec_name: str = IMAGE_STORAGE_CODEC) -> tuple:
+    """(байты, расширение); если кодек недоступен или не подходит для изображения — PNG."""
+    codec = CODECS.get(codec_name)
+    if codec is None or not codec.available or not codec.supports(img):
+        codec = CODECS["png"]
+    buf = io.BytesIO()
+    codec.encode(img, buf)
+    return buf.getvalue(), codec.extension
+
+
+def transcode_file(tmp_path: str, codec_name: str = IMAGE_STORAGE_CODEC) -> Optional[str]:
+    """
+    Перекодирует временный файл на месте (атомарно) в формат хранения; возвращает расширение.
+    original — файл не трогается, None.
+    """
+    if codec_name == "original":
+        return None
+    with Image.open(tmp_path) as img:
+        img.load()
+        data, extension = encode_for_storage(img, codec_name)
+    part_path = tmp_path + ".part"
+    try:
+        with open(part_path, "wb") as f:
+            f.write(data)
+        os.replace(part_path, tmp_path)
+    finally:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+    return extension
+
+
+def to_png_bytes(path: str) -> bytes:
+    """Для отдачи браузеру форматов без media_type (jxl, npz)."""
+    with open_image(path) as img:
+        buf = io.BytesIO()
+        CODECS["png"].encode(img, buf)
+        return buf.getvalue()
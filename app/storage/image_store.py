@@ -0,0 +1,176 @@
+"""
+Контентно-адресуемое хранилище QC изображений.
+
+В qcrecord.original_image_path/corrected_image_path хранится ссылка "sha256:<hex>"
+(PNG) или "sha256:<hex>.<расширение>" для других форматов хранения (app.storage.codecs);
+одинаковые файлы (повторная загрузка того же снимка) лежат один раз.
+Записи до появления хранилища хранят путь к файлу — resolve() понимает оба вида.
+Число ссылок ведётся в таблице imageblob в транзакции вызывающего, блобы без ссылок
+удаляет collect_garbage (python -m app.cli.storage gc).
+"""
+import hashlib
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+from app.config.unit_of_work import UnitOfWork
+from app.repositories.image_blob_repository import ImageBlobRepository
+from app.services.image_previews import remove_previews
+from app.storage import backends
+from app.storage.backends import StorageBackend, LocalStorageBackend, S3StorageBackend
+from app.storage.codecs import transcode_file
+
+IMAGE_STORAGE = os.getenv("IMAGE_STORAGE", "local")  # local | s3
+IMAGE_STORAGE_DIR = os.getenv("IMAGE_STORAGE_DIR", os.path.join("app", "uploads", "blobs"))
+IMAGE_STORAGE_CACHE_DIR = os.getenv("IMAGE_STORAGE_CACHE_DIR", os.path.join("app", "uploads", "blob_cache"))
+S3_BUCKET = os.getenv("S3_BUCKET", "")
+S3_PREFIX = os.getenv("S3_PREFIX", "qc-images")
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL", "")
+# блоб без ссылок (или без строки в imageblob) удаляется не раньше, чем через столько секунд
+IMAGE_GC_GRACE_SECONDS = int(os.getenv("IMAGE_GC_GRACE_SECONDS", "3600"))
+
+BLOB_REF_PREFIX = "sha256:"
+DEFAULT_EXTENSION = "png"
+_HASH_CHUNK = 1024 * 1024
+
+
+def is_blob_ref(value: Optional[str]) -> bool:
+    return bool(value) and value.startswith(BLOB_REF_PREFIX)
+
+
+def _parse_ref(ref: str) -> Tuple[str, str]:
+    sha256, _, extension = ref[len(BLOB_REF_PREFIX):].partition(".")
+    return sha256, extension or DEFAULT_EXTENSION
+
+
+class ImageStore:
+    def __init__(self, backend: StorageBackend):
+        self.backend = backend
+
+    @staticmethod
+    def key(sha256: str, extension: str = DEFAULT_EXTENSION) -> str:
+        return f"{sha256[:2]}/{sha256[2:4]}/{sha256}.{extension}"
+
+    @staticmethod
+    def ref(sha256: str, extension: str = DEFAULT_EXTENSION) -> str:
+        if extension == DEFAULT_EXTENSION:
+            return BLOB_REF_PREFIX + sha256
+        return f"{BLOB_REF_PREFIX}{sha256}.{extension}"
+
+    @staticmethod
+    def file_sha256(path: str) -> Tuple[str, int]:
+        digest = hashlib.sha256()
+        size = 0
+        with open(path, "rb") as f:
+            while True:
+                chunk = f.read(_HASH_CHUNK)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                size += len(chunk)
+        return digest.hexdigest(), size
+
+    def put(self, session, tmp_path: str) -> str:
+        """
+        Забирает временный файл в хранилище и возвращает ссылку для qcrecord.
+        Файл перекодируется в формат IMAGE_STORAGE_CODEC; хэш — от сохраняемых байт
+        (кодеки детерминированы, поэтому дедупликация работает и после перекодирования).
+        Ссылка учитывается до записи файла: пока транзакция не завершена, gc этот блоб не удалит.
+        Если транзакция откатится, записанный файл останется без строки — его уберёт gc.
+        """
+        extension = transcode_file(tmp_path) or DEFAULT_EXTENSION
+        sha256, size = self.file_sha256(tmp_path)
+        ImageBlobRepository(session).acquire(sha256, size, extension)
+        key = self.key(sha256, extension)
+        if self.backend.exists(key):
+            os.remove(tmp_path)
+        else:
+            self.backend.put_file(key, tmp_path)
+        return self.ref(sha256, extension)
+
+    def add_reference(self, session, ref: Optional[str]):
+        """Ещё одна ссылка на уже сохранённый блоб — без записи файла (например, результат из кэша ML)."""
+        if not is_blob_ref(ref):
+            return
+        if not ImageBlobRepository(session).add_reference(_parse_ref(ref)[0]):
+            raise RuntimeError(f"Изображение {ref} не найдено в хранилище")
+
+    def release(self, session, ref: Optional[str]):
+        """Снимает ссылку удаляемой записи (в транзакции удаления); старые пути игнорируются."""
+        if is_blob_ref(ref):
+            ImageBlobRepository(session).release(_parse_ref(ref)[0])
+
+    def resolve(self, ref: Optional[str]) -> Optional[str]:
+        """Локальный путь к файлу изображения или None, если его нет."""
+        if not ref:
+            return None
+        if not is_blob_ref(ref):
+            return ref if os.path.isfile(ref) else None
+        try:
+            path = self.backend.local_path(self.key(*_parse_ref(ref)))
+        except Exception:
+            return None
+        return path if os.path.isfile(path) else None
+
+    def _delete_blob(self, key: str):
+        remove_previews(self.backend.local_path(key, fetch=False))
+        self.backend.delete(key)
+
+    def collect_garbage(self, grace_seconds: int = IMAGE_GC_GRACE_SECONDS, batch: int = 500) -> dict:
+        """
+        1) блобы с refcount = 0, не менявшиеся grace_seconds: строка удаляется условно (refcount всё ещё 0),
+           файл — до commit, пока строка заблокирована: параллельный acquire дождётся и запишет файл заново;
+        2) файлы без строки в imageblob старше grace_seconds — остатки откатившихся транзакций.
+        """
+        removed, orphans = 0, 0
+        with UnitOfWork(name="image gc") as uow:
+            repo = ImageBlobRepository(uow.session)
+            while True:
+                blobs = repo.unreferenced(datetime.utcnow() - timedelta(seconds=grace_seconds), limit=batch)
+                if not blobs:
+                    break
+                for sha256, extension in blobs:
+                    if repo.delete_unreferenced(sha256):
+                        self._delete_blob(self.key(sha256, extension))
+                        removed += 1
+                    uow.commit()
+
+            cutoff = time.time() - grace_seconds
+            pending = []
+
+            def sweep():
+                nonlocal orphans
+                known = repo.known([sha256 for sha256, _ in pending])
+                for sha256, key in pending:
+                    if sha256 not in known:
+                        self._delete_blob(key)
+                        orphans += 1
+                pending.clear()
+                # соединение не держим, пока листается хранилище
+                uow.commit()
+
+            for key, mtime in self.backend.iter_keys():
+                if mtime < cutoff:
+                    pending.append((key.rsplit("/", 1)[-1].split(".", 1)[0], key))
+                if len(pending) >= batch:
+                    sweep()
+            sweep()
+        return {"removed": removed, "orphans": orphans}
+
+
+def create_backend() -> StorageBackend:
+    """Бэкенд по IMAGE_STORAGE; вызывается при импорте — ошибка настройки видна при старте."""
+    if IMAGE_STORAGE == "s3":
+        if not S3_BUCKET:
+            raise RuntimeError("IMAGE_STORAGE=s3 требует S3_BUCKET")
+        # при старте приложения, а не при первой записи изображения
+        if backends.boto3 is None:
+            raise RuntimeError("IMAGE_STORAGE=s3 требует пакет boto3: pip install boto3 (см. app/requirements.txt)")
+        return S3StorageBackend(S3_BUCKET, IMAGE_STORAGE_CACHE_DIR, S3_PREFIX, endpoint_url=S3_ENDPOINT_URL)
+    if IMAGE_STORAGE != "local":
+        raise RuntimeError(f"Неизвестный IMAGE_STORAGE: {IMAGE_STORAGE}")
+    return LocalStorageBackend(IMAGE_STORAGE_DIR)
+
+
+image_store = ImageStore(create_backend())
@@ -0,0 +1,135 @@
+"""
+Нагрузочный бенчмарк: один и тот же список исследований (страница + последние QC записи)
+через sync-эндпоинт (Session, def — поток threadpool на запрос) и async-эндпоинт
+(AsyncSession, async def — без потока на время запроса в БД).
+
+    python -m benchmarks.bench_async_api --exams 5000 --requests 3000 --concurrency 100
+    python -m benchmarks.bench_async_api --url postgresql://... --pool-size 20
+
+Запросы идут в приложение в том же процессе (httpx + ASGI), без сети до API: меряется
+сервер, а не клиент. --threads — размер threadpool (у FastAPI/anyio по умолчанию 40):
+sync-эндпоинты упираются в него, когда одновременных запросов больше.
+Выигрыш — на серверной БД (asyncpg) с сетевой задержкой: пока запрос ждёт ответа БД,
+sync-эндпоинт держит поток, async — нет. У aiosqlite каждое обращение к БД — переход в поток
+соединения, поэтому на локальной SQLite async не быстрее. --db-latency-ms добавляет к каждому
+запросу ожидание (как round-trip до удалённой БД): sync упирается в --threads / задержку
+запросов в секунду, async — только в CPU:
+
+    python -m benchmarks.bench_async_api --page 5 --concurrency 300 --db-latency-ms 300
+
+По умолчанию создаёт отдельную SQLite базу bench_async.db (рабочая БД не трогается).
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import anyio.to_thread
+import httpx
+from fastapi import FastAPI
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import Session, create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.repositories.exam_repository import AsyncExamRepository, ExamRepository
+from benchmarks.bench_dashboard_summary import seed
+
+ASYNC_DRIVERS = {"postgresql": "asyncpg", "sqlite": "aiosqlite", "mysql": "aiomysql"}
+
+
+def make_engines(url: str, pool_size: int):
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    options = {} if backend == "sqlite" else {"pool_size": pool_size, "max_overflow": 0}
+    async_url = parsed.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}")
+    return create_engine(url, **options), create_async_engine(async_url, **options)
+
+
+def make_app(engine, async_engine, page: int, latency: float) -> FastAPI:
+    app = FastAPI()
+
+    def rows(items):
+        return [{"id": e.id, "exam_date": e.exam_date, "qc_id": qc.id if qc else None} for e, qc in items]
+
+    @app.get("/sync/exams")
+    def sync_exams():
+        with Session(engine, expire_on_commit=False) as session:
+            items, _ = ExamRepository(session).list_with_latest_qc(limit=page)
+            if latency:
+                time.sleep(latency)
+        return rows(items)
+
+    @app.get("/async/exams")
+    async def async_exams():
+        async with AsyncSession(async_engine, expire_on_commit=False) as session:
+            items, _ = await AsyncExamRepository(session).list_with_latest_qc(limit=page)
+            if latency:
+                await asyncio.sleep(latency)
+        return rows(items)
+
+    return app
+
+
+async def load(app: FastAPI, path: str, requests: int, concurrency: int) -> dict:
+    latencies = []
+    remaining = iter(range(requests))
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        async def worker():
+            for _ in remaining:
+                t0 = time.perf_counter()
+                response = await client.get(path)
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - t0)
+
+        await client.get(path)  # прогрев: соединения пула, компиляция запросов
+        t0 = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - t0
+
+    latencies.sort()
+    return {
+        "rps": requests / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95)] * 1000,
+    }
+
+
+async def run(args):
+    anyio.to_thread.current_default_thread_limiter().total_tokens = args.threads
+    engine, async_engine = make_engines(args.url, args.pool_size)
+    app = make_app(engine, async_engine, args.page, args.db_latency_ms / 1000)
+    try:
+        results = {}
+        for name in ("sync", "async"):
+            results[name] = await load(app, f"/{name}/exams", args.requests, args.concurrency)
+            r = results[name]
+            print(f"{name:5}: {r['rps']:8.0f} req/s  p50 {r['p50_ms']:7.1f} ms  p95 {r['p95_ms']:7.1f} ms")
+        print(f"async / sync throughput: x{results['async']['rps'] / results['sync']['rps']:.2f}")
+    finally:
+        await async_engine.dispose()
+        engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="sqlite:///bench_async.db", help="синхронный URL; async-драйвер выводится из него")
+    parser.add_argument("--exams", type=int, default=5_000)
+    parser.add_argument("--requests", type=int, default=3_000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--threads", type=int, default=40, help="размер threadpool для sync-эндпоинтов")
+    parser.add_argument("--pool-size", type=int, default=20, help="размер пула соединений (не для SQLite)")
+    parser.add_argument("--page", type=int, default=50, help="исследований на странице")
+    parser.add_argument("--db-latency-ms", type=float, default=0, help="имитация сетевой задержки БД на запрос")
+    parser.add_argument("--skip-seed", action="store_true", help="использовать уже заполненную базу")
+    args = parser.parse_args()
+
+    if not args.skip_seed:
+        print(f"seeding {args.exams} exams into {args.url} ...")
+        seed(create_engine(args.url), args.exams, args.exams)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Бенчмарк импорта исследований: по одной строке (как POST /exams/ — add + flush + refresh + commit)
+против BulkImportService (пачки, upsert одним executemany / COPY на PostgreSQL + psycopg2).
+
+    python -m benchmarks.bench_bulk_import --exams 100000
+    python -m benchmarks.bench_bulk_import --url postgresql://... --exams 1000000 --single 5000
+
+Файл импорта (CSV) генерируется в памяти. Построчный путь меряется на первых --single строках
+(на миллионе строк он идёт часами), скорость пересчитывается в строки/с. Второй прогон bulk —
+повторный импорт того же файла: все строки обновляются.
+По умолчанию создаёт отдельную SQLite базу bench_import.db (рабочая БД не трогается).
+"""
+import argparse
+import csv
+import io
+import time
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import insert
+from sqlmodel import SQLModel, Session, create_engine
+
+from app.config.unit_of_work import UnitOfWork
+from app.models.exams import Exam
+from app.models.patients import Patient
+from app.repositories.exam_repository import ExamRepository
+from app.services.bulk_import_service import BulkImportService, IMPORT_KINDS
+
+PATIENTS = 1_000
+
+
+def make_csv(exams: int) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(IMPORT_KINDS["exams"].fields)
+    start = datetime(2020, 1, 1)
+    for i in range(exams):
+        writer.writerow([
+            f"ACC{i:09d}", f"P{i % PATIENTS}", (start + timedelta(minutes=i)).isoformat(),
+            "DX" if i % 3 else "CR", "PA" if i % 2 else "AP", f"D{i % 7}", f"T{i % 11}", "",
+        ])
+    return buffer.getvalue().encode()
+
+
+def reset(engine):
+    SQLModel.metadata.drop_all(engine)
+    SQLModel.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(Patient.__table__), [
+            {"patient_id": f"P{i}", "first_name": "Bench", "last_name": str(i),
+             "birth_date": date(1970, 1, 1), "sex": "M", "created_at": datetime(2020, 1, 1)}
+            for i in range(PATIENTS)
+        ])
+
+
+def bench_single(engine, content: bytes, rows: int) -> float:
+    reader = csv.DictReader(io.StringIO(content.decode()))
+    started = time.perf_counter()
+    with Session(engine) as session:
+        repo = ExamRepository(session)
+        for _, row in zip(range(rows), reader):
+            repo.create(Exam(
+                **{k: v or None for k, v in row.items() if k != "exam_date"},
+                exam_date=datetime.fromisoformat(row["exam_date"]),
+            ))
+            session.commit()
+    return time.perf_counter() - started
+
+
+def bench_bulk(engine, content: bytes, chunk_size: int) -> dict:
+    with UnitOfWork(bind=engine, name="bench import") as uow:
+        *_, total = BulkImportService(uow, chunk_size).run("exams", io.BytesIO(content), "csv")
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="sqlite:///bench_import.db")
+    parser.add_argument("--exams", type=int, default=100_000)
+    parser.add_argument("--single", type=int, default=2_000, help="строк для построчного импорта")
+    parser.add_argument("--chunk-size", type=int, default=5_000)
+    args = parser.parse_args()
+
+    engine = create_engine(args.url)
+    content = make_csv(args.exams)
+
+    reset(engine)
+    single_rows = min(args.single, args.exams)
+    elapsed = bench_single(engine, content, single_rows)
+    single_rps = single_rows / elapsed
+    print(f"по одной : {single_rows:>9} строк за {elapsed:7.2f} с  {single_rps:9.0f} строк/с")
+
+    reset(engine)
+    for name in ("bulk", "повторно"):
+        total = bench_bulk(engine, content, args.chunk_size)
+        print(
+            f"{name:9}: {total['rows']:>9} строк за {total['seconds']:7.2f} с  {total['rows_per_second']:9.0f} строк/с"
+            f"  (создано {total['created']}, обновлено {total['updated']}, ошибок {total['failed']})"
+        )
+        if name == "bulk":
+            print(f"bulk / по одной: x{total['rows_per_second'] / single_rps:.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Бенчмарк /dashboard/summary: старый путь (все QCRecord в Python + json.loads + Counter)
+против QCRepository.summary (GROUP BY в БД).
+
+    python -m benchmarks.bench_dashboard_summary --records 1000000
+    python -m benchmarks.bench_dashboard_summary --url postgresql://... --records 1000000
+
+По умолчанию создаёт отдельную SQLite базу bench_dashboard.db (рабочая БД не трогается).
+"""
+import argparse
+import json
+import random
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+from sqlmodel import SQLModel, Session, create_engine, select
+from sqlalchemy import insert
+
+from app.models.users import User
+from app.models.patients import Patient
+from app.models.exams import Exam
+from app.models.qc_records import QCRecord
+from app.models.qc_flags import QCFlag
+from app.repositories.qc_repository import QCRepository
+
+STATUSES = ["OK", "FIXED", "FLAGGED", "REJECTED"]
+MAJOR = ["rotation", "noise", "underexposed", "overexposed"]
+CRITICAL = ["lung_coverage_low", "artifact", "wrong_view"]
+BATCH = 20_000
+
+
+def seed(engine, records: int, exams: int):
+    SQLModel.metadata.drop_all(engine)
+    SQLModel.metadata.create_all(engine)
+    rnd = random.Random(42)
+    start = datetime(2024, 1, 1)
+
+    with engine.begin() as conn:
+        conn.execute(insert(User.__table__), [{"id": 1, "username": "bench", "hashed_password": "-", "role": "admin", "created_at": start}])
+        conn.execute(insert(Patient.__table__), [
+            {"id": i, "patient_id": f"P{i}", "first_name": "A", "last_name": "B",
+             "birth_date": datetime(1960 + i % 50, 1, 1).date(), "sex": "F", "created_at": start}
+            for i in range(1, exams // 5 + 2)
+        ])
+        conn.execute(insert(Exam.__table__), [
+            {"id": i, "patient_id": f"P{i % (exams // 5) + 1}", "accession_number": f"ACC{i}",
+             "exam_date": start + timedelta(minutes=i), "modality": "CR", "view_type": "PA",
+             "device": f"D{i % 7}", "technician": "T", "notes": None}
+            for i in range(1, exams + 1)
+        ])
+
+    qc_id = 0
+    while qc_id < records:
+        rows, flags = [], []
+        for _ in range(min(BATCH, records - qc_id)):
+            qc_id += 1
+            major = {name: rnd.random() < 0.2 for name in MAJOR}
+            critical = {name: rnd.random() < 0.05 for name in CRITICAL}
+            data = {
+                "status": rnd.choice(STATUSES),
+                "needs_fix": rnd.random() < 0.3,
+                "qc_probs": {name: round(rnd.random(), 3) for name in CRITICAL},
+                "applied_fixes": [],
+                "major_flags": major,
+                "critical_flags": critical,
+            }
+            rows.append({
+                "id": qc_id, "exam_id": qc_id % exams + 1, "original_image_path": "", "corrected_image_path": None,
+                "ml_results_json": json.dumps(data), "created_at": start + timedelta(seconds=qc_id), "created_by": 1,
+                "status": data["status"], "needs_fix": data["needs_fix"], "qc_probs": data["qc_probs"], "applied_fixes": [],
+            })
+            flags += [{"qc_id": qc_id, "kind": "major", "name": n} for n, v in major.items() if v]
+            flags += [{"qc_id": qc_id, "kind": "critical", "name": n} for n, v in critical.items() if v]
+        with engine.begin() as conn:
+            conn.execute(insert(QCRecord.__table__), rows)
+            if flags:
+                conn.execute(insert(QCFlag.__table__), flags)
+        print(f"  seeded {qc_id}/{records}", end="\r", flush=True)
+    print()
+
+
+def legacy_summary(session: Session):
+    """Прежняя реализация: все записи в память, json.loads на каждой строке."""
+    statuses, major_flags, critical_flags = Counter(), Counter(), Counter()
+    qcs = session.exec(select(QCRecord)).all()
+    for qc in qcs:
+        if qc.ml_results_json:
+            data = json.loads(qc.ml_results_json)
+            statuses[data.get("status", "UNKNOWN")] += 1
+            for k, v in data.get("major_flags", {}).items():
+                if v: major_flags[k] += 1
+            for k, v in data.get("critical_flags", {}).items():
+                if v: critical_flags[k] += 1
+        else:
+            statuses["UNKNOWN"] += 1
+    return {"total": len(qcs), "statuses": dict(statuses),
+            "major_flags": dict(major_flags), "critical_flags": dict(critical_flags)}
+
+
+def timed(fn, engine, repeat: int):
+    best, result = None, None
+    for _ in range(repeat):
+        with Session(engine) as session:
+            t0 = time.perf_counter()
+            result = fn(session)
+            elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="sqlite:///bench_dashboard.db")
+    parser.add_argument("--records", type=int, default=1_000_000)
+    parser.add_argument("--exams", type=int, default=50_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--skip-seed", action="store_true", help="использовать уже заполненную базу")
+    parser.add_argument("--skip-legacy", action="store_true", help="не запускать старый путь (долго на 1M)")
+    args = parser.parse_args()
+
+    engine = create_engine(args.url)
+    if not args.skip_seed:
+        print(f"seeding {args.records} QC records into {args.url} ...")
+        t0 = time.perf_counter()
+        seed(engine, args.records, min(args.exams, args.records))
+        print(f"  done in {time.perf_counter() - t0:.1f}s")
+
+    new_time, new_result = timed(lambda s: QCRepository(s).summary(), engine, args.repeat)
+    print(f"sql   summary: {new_time * 1000:10.1f} ms")
+    patient_time, _ = timed(lambda s: QCRepository(s).summary(patient_id="P1"), engine, args.repeat)
+    print(f"sql   summary (patient P1): {patient_time * 1000:10.1f} ms")
+
+    if not args.skip_legacy:
+        old_time, old_result = timed(legacy_summary, engine, 1)
+        print(f"legacy summary: {old_time * 1000:10.1f} ms  (x{old_time / new_time:.1f})")
+        assert old_result == new_result, "результаты старого и нового пути расходятся"
+        print("results match")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Бенчмарк форматов хранения QC изображений (app.storage.codecs): размер, время кодирования и декодирования.
+
+    python -m benchmarks.bench_image_codecs --repeat 3
+    python -m benchmarks.bench_image_codecs --images "/data/cxr/*.png"
+
+Без --images берутся синтетические снимки 2500x2048: 16 бит (12 значащих, как у DR детекторов)
+и 8 бит (как отдаёт ML сервис). Все варианты проверяются на точное совпадение пикселей после декодирования.
+Недоступные кодеки (jxl без pillow-jxl-plugin, npz без numpy) пропускаются.
+"""
+import argparse
+import glob
+import io
+import random
+import statistics
+import time
+
+from PIL import Image, ImageChops, ImageDraw, ImageFilter
+
+from app.storage.codecs import CODECS, NPZCodec, PNGCodec, WebPCodec, JXLCodec
+
+
+def synthetic_radiograph(width: int = 2048, height: int = 2500, bits: int = 16, seed: int = 7) -> Image.Image:
+    """Грудная клетка «в первом приближении»: фон, два лёгочных поля, рёбра, позвоночник, квантовый шум."""
+    random.seed(seed)
+    img = Image.new("L", (width, height), 40)
+    draw = ImageDraw.Draw(img)
+    draw.ellipse((width * 0.08, height * 0.1, width * 0.92, height * 0.95), fill=150)
+    for x0 in (0.15, 0.55):
+        draw.ellipse((width * x0, height * 0.18, width * (x0 + 0.3), height * 0.8), fill=80)
+    for i in range(10):
+        y = height * (0.2 + i * 0.06)
+        for side in (-1, 1):
+            cx = width / 2 + side * width * 0.22
+            draw.arc((cx - width * 0.25, y, cx + width * 0.25, y + height * 0.08), 180, 360, fill=175, width=18)
+    draw.rectangle((width * 0.47, height * 0.05, width * 0.53, height), fill=200)
+    img = img.filter(ImageFilter.GaussianBlur(12))
+    img = ImageChops.add(img, Image.effect_noise((width, height), 12), offset=-128)
+    if bits == 8:
+        return img
+    # 16 бит: 12 значащих бит, младшие 4 — шум детектора
+    high = bytes(img.tobytes())
+    low = Image.effect_noise((width, height), 32).tobytes()
+    data = bytearray(2 * width * height)
+    for i in range(width * height):
+        value = high[i] * 16 + low[i] % 16
+        data[2 * i] = value & 0xFF
+        data[2 * i + 1] = value >> 8
+    return Image.frombytes("I;16", (width, height), bytes(data))
+
+
+def variants(levels) -> list:
+    result = [(f"png-{level}", PNGCodec(level)) for level in levels]
+    result += [("webp-ll-m4", WebPCodec(4)), ("webp-ll-m6", WebPCodec(6))]
+    result += [("jxl-ll-e7", JXLCodec(7)), ("npz", NPZCodec())]
+    return result
+
+
+def same_pixels(a: Image.Image, b: Image.Image) -> bool:
+    if a.size != b.size:
+        return False
+    if a.mode != b.mode:
+        b = b.convert(a.mode)
+    return a.tobytes() == b.tobytes()
+
+
+def bench(name: str, codec, img: Image.Image, repeat: int):
+    if not codec.available:
+        return name, None, "недоступен"
+    if not codec.supports(img):
+        return name, None, f"не поддерживает {img.mode}"
+    encode_times, decode_times = [], []
+    for _ in range(repeat):
+        buf = io.BytesIO()
+        t0 = time.perf_counter()
+        codec.encode(img, buf)
+        encode_times.append(time.perf_counter() - t0)
+    data = buf.getvalue()
+    path = f"/tmp/bench_codec.{codec.extension}"
+    with open(path, "wb") as f:
+        f.write(data)
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        decoded = codec.decode(path)
+        decoded.load()
+        decode_times.append(time.perf_counter() - t0)
+    if not same_pixels(img, decoded):
+        return name, None, "ПОТЕРИ: пиксели не совпадают"
+    return name, (len(data), statistics.median(encode_times), statistics.median(decode_times)), None
+
+
+def report(title: str, img: Image.Image, repeat: int, levels):
+    raw = len(img.tobytes())
+    print(f"\n{title}: {img.size[0]}x{img.size[1]} {img.mode}, raw {raw / 2**20:.1f} MiB")
+    print(f"{'формат':12s} {'размер, KiB':>12s} {'от raw':>7s} {'encode, ms':>11s} {'decode, ms':>11s}")
+    for name, codec in variants(levels):
+        name, result, note = bench(name, codec, img, repeat)
+        if result is None:
+            print(f"{name:12s} — {note}")
+            continue
+        size, enc, dec = result
+        print(f"{name:12s} {size / 1024:12.0f} {size / raw:7.1%} {enc * 1000:11.0f} {dec * 1000:11.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", help="glob с реальными снимками (PNG/TIFF)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--png-levels", default="1,6,9")
+    args = parser.parse_args()
+    levels = [int(level) for level in args.png_levels.split(",")]
+
+    if args.images:
+        for path in sorted(glob.glob(args.images)):
+            with Image.open(path) as img:
+                img.load()
+                report(path, img, args.repeat, levels)
+        return
+    report("синтетический 16 бит", synthetic_radiograph(bits=16), args.repeat, levels)
+    report("синтетический 8 бит", synthetic_radiograph(bits=8), args.repeat, levels)
+    print(f"\nдоступные кодеки: {', '.join(name for name, codec in CODECS.items() if codec.available)}")
+
+
+if __name__ == "__main__":
+    main()
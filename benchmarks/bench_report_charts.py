@@ -0,0 +1,142 @@
+"""
+Бенчмарк графиков отчёта: прежний путь (pyplot -> savefig PNG 150 dpi -> ImageReader -> drawImage)
+против векторных рисунков reportlab (app.reports.charts).
+
+    python -m benchmarks.bench_report_charts --repeat 20 --threads 4
+
+Меряется время графиков одного отчёта: построение трёх графиков и их отрисовка в PDF canvas.
+--threads > 1 — параллельные «отчёты» в потоках (старый путь под общей блокировкой:
+pyplot не потокобезопасен). Для старого пути нужен matplotlib, без него он пропускается.
+"""
+import argparse
+import io
+import random
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+from reportlab.pdfgen import canvas
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import cm
+from reportlab.lib.utils import ImageReader
+
+from app.reports.charts import build_charts, draw_chart
+
+WIDTH, HEIGHT = A4
+MARGIN = 2 * cm
+_pyplot_lock = threading.Lock()
+
+
+def make_stats(days: int = 400, seed: int = 42) -> dict:
+    rnd = random.Random(seed)
+    start = date(2024, 1, 1)
+    return {
+        "counts_by_day": [(start + timedelta(days=i), rnd.randint(20, 120)) for i in range(days)][-20:],
+        "modality_counts": [("CR", 5200), ("DX", 3100), ("CT", 800), ("MG", 120)],
+        "heatmap": {(d, h): rnd.randint(0, 50) if 7 <= h <= 20 else rnd.randint(0, 3) for d in range(7) for h in range(24)},
+    }
+
+
+def legacy_charts(c, stats: dict):
+    """Прежняя реализация из generate_report_pdf."""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    def draw_fig(fig, x, y_pos, max_w, max_h):
+        img_buf = io.BytesIO()
+        fig.savefig(img_buf, bbox_inches="tight", dpi=150)
+        plt.close(fig)
+        img_buf.seek(0)
+        img = ImageReader(img_buf)
+        iw, ih = img.getSize()
+        scale = min(max_w / iw, max_h / ih, 1.0)
+        c.drawImage(img, x, y_pos - ih * scale, width=iw * scale, height=ih * scale)
+        return ih * scale
+
+    y = HEIGHT - MARGIN
+    with _pyplot_lock:
+        dates, counts = zip(*stats["counts_by_day"])
+        fig = plt.figure(figsize=(6, 2))
+        plt.bar(dates[-20:], counts[-20:])
+        plt.xticks(rotation=45, fontsize=6)
+        plt.title("Exams per day")
+        y -= draw_fig(fig, MARGIN, y, WIDTH - 2 * MARGIN, 120) + 8
+
+        labels = [k for k, _ in stats["modality_counts"]][:8]
+        sizes = [v for _, v in stats["modality_counts"]][:8]
+        fig = plt.figure(figsize=(4, 3))
+        plt.pie(sizes, labels=labels, autopct="%1.1f%%")
+        plt.title("Modality distribution")
+        draw_fig(fig, MARGIN, y, WIDTH / 2 - MARGIN, 150)
+
+        heat = [[stats["heatmap"].get((dow, hr), 0) for hr in range(24)] for dow in range(7)]
+        fig = plt.figure(figsize=(4, 3))
+        plt.imshow(heat, aspect="auto", cmap="hot")
+        plt.title("Heatmap (weekday x hour)")
+        plt.xlabel("Hour")
+        plt.ylabel("Weekday")
+        draw_fig(fig, MARGIN + WIDTH / 2, y, WIDTH / 2 - MARGIN, 150)
+
+
+def vector_charts(c, stats: dict, charts: dict = None):
+    charts = charts or build_charts(stats)
+    y = HEIGHT - MARGIN
+    y -= draw_chart(c, charts["exams_per_day"], MARGIN, y, WIDTH - 2 * MARGIN, 120) + 8
+    draw_chart(c, charts["modality"], MARGIN, y, WIDTH / 2 - MARGIN, 150)
+    draw_chart(c, charts["heatmap"], MARGIN + WIDTH / 2, y, WIDTH / 2 - MARGIN, 150)
+
+
+def one_report(fn, stats: dict) -> tuple:
+    buf = io.BytesIO()
+    c = canvas.Canvas(buf, pagesize=A4)
+    t0 = time.perf_counter()
+    fn(c, stats)
+    c.showPage()
+    c.save()
+    return time.perf_counter() - t0, len(buf.getvalue())
+
+
+def run(name: str, fn, stats: dict, repeat: int, threads: int):
+    one_report(fn, stats)  # прогрев: импорты, шрифты
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(lambda _: one_report(fn, stats), range(repeat)))
+    wall = time.perf_counter() - t0
+    times = [t for t, _ in results]
+    size = results[-1][1]
+    print(
+        f"{name:7s} charts/report: median {statistics.median(times) * 1000:8.1f} ms, "
+        f"p95 {sorted(times)[int(len(times) * 0.95) - 1] * 1000:8.1f} ms, "
+        f"throughput {repeat / wall:7.1f} reports/s, pdf {size / 1024:7.1f} KiB"
+    )
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--skip-legacy", action="store_true")
+    args = parser.parse_args()
+
+    stats = make_stats()
+    new_time = run("vector", vector_charts, stats, args.repeat, args.threads)
+    # как в приложении: графики построены один раз в снимке статистики, отчёт только рисует
+    prebuilt = build_charts(stats)
+    run("cached", lambda c, s: vector_charts(c, s, prebuilt), stats, args.repeat, args.threads)
+
+    if not args.skip_legacy:
+        try:
+            import matplotlib  # noqa: F401
+        except ImportError:
+            print("matplotlib не установлен — старый путь пропущен")
+            return
+        old_time = run("pyplot", legacy_charts, stats, args.repeat, args.threads)
+        print(f"speedup x{old_time / new_time:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+import io
+import os
+import tempfile
+import time
+from datetime import date, datetime
+
+# до импорта app: своя SQLite база вместо DATABASE_URL из .env
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="autoqc-tests-"), "test.db")
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from PIL import Image  # noqa: E402
+from sqlmodel import SQLModel, select  # noqa: E402
+
+from app.config.db import engine  # noqa: E402
+from app.config.unit_of_work import UnitOfWork  # noqa: E402
+from app.models.exams import Exam  # noqa: E402
+from app.models.patients import Patient  # noqa: E402
+from app.models.users import User  # noqa: E402
+# приложение целиком — вместе с ним импортируются все модели (таблицы)
+from app.main import app  # noqa: E402
+
+
+@pytest.fixture(scope="session", autouse=True)
+def database():
+    SQLModel.metadata.create_all(engine)
+    yield
+    engine.dispose()
+
+
+@pytest.fixture(autouse=True)
+def clean_tables():
+    """Каждый тест начинает с пустых таблиц."""
+    yield
+    with engine.begin() as conn:
+        for table in reversed(SQLModel.metadata.sorted_tables):
+            conn.execute(table.delete())
+
+
+@pytest.fixture
+def api():
+    # без with: startup (воркеры QC, снимок статистики) не запускается
+    return TestClient(app)
+
+
+@pytest.fixture
+def make_png(tmp_path):
+    def make(value: int) -> str:
+        path = tmp_path / f"upload-{value}-{time.monotonic_ns()}.png"
+        buf = io.BytesIO()
+        Image.new("L", (16, 16), value).save(buf, format="PNG")
+        path.write_bytes(buf.getvalue())
+        return str(path)
+    return make
+
+
+@pytest.fixture
+def user_id() -> int:
+    with UnitOfWork(name="test") as uow:
+        user = User(username="qc-tester", hashed_password="-")
+        uow.session.add(user)
+        uow.commit()
+        return user.id
+
+
+@pytest.fixture
+def make_exam():
+    """Исследование (и его пациент, если ещё нет); возвращает exam.id."""
+    def make(accession: str, exam_date: datetime, patient_id: str = "P1", device: str = "D1", modality: str = "DX") -> int:
+        with UnitOfWork(name="test") as uow:
+            session = uow.session
+            if session.exec(select(Patient).where(Patient.patient_id == patient_id)).first() is None:
+                session.add(Patient(patient_id=patient_id, first_name="Test", last_name=patient_id,
+                                    birth_date=date(1970, 1, 1), sex="M"))
+            exam = Exam(patient_id=patient_id, accession_number=accession, exam_date=exam_date,
+                        modality=modality, view_type="PA", device=device, technician="T1")
+            session.add(exam)
+            uow.commit()
+            return exam.id
+    return make
@@ -0,0 +1,126 @@
+"""Массовый импорт (POST /import/{kind}): повторный импорт ничего не дублирует, ошибки — построчно."""
+import json
+from datetime import datetime
+
+from sqlmodel import func, select
+
+from app.config.unit_of_work import UnitOfWork
+from app.models.exams import Exam
+from app.models.patients import Patient
+from app.models.qc_records import QCRecord
+from app.repositories.qc_rollup_repository import QCRollupRepository
+
+PATIENTS_CSV = (
+    "patient_id,first_name,last_name,birth_date,sex\n"
+    "P1,Ivan,Petrov,1970-01-01,M\n"
+    "P2,Anna,Ivanova,1985-05-20,F\n"
+    "P3,Aidos,Nurlanov,1990-12-31,M\n"
+)
+
+
+def run_import(api, kind: str, content: str, filename: str, **params) -> list:
+    response = api.post(f"/import/{kind}", params=params, files={"file": (filename, content.encode())})
+    assert response.status_code == 200, response.text
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def count(model) -> int:
+    with UnitOfWork(name="test") as uow:
+        return uow.session.exec(select(func.count()).select_from(model)).one()
+
+
+def exam_line(accession: str, patient_id: str = "P1", device: str = "D1", **overrides) -> str:
+    record = {
+        "accession_number": accession, "patient_id": patient_id, "exam_date": "2024-03-01T09:00:00",
+        "modality": "DX", "view_type": "PA", "device": device, "technician": "T1",
+    }
+    record.update(overrides)
+    return json.dumps(record)
+
+
+def test_reimport_updates_instead_of_duplicating(api):
+    first = run_import(api, "patients", PATIENTS_CSV, "patients.csv")
+    assert first[-1]["done"] and (first[-1]["created"], first[-1]["updated"]) == (3, 0)
+
+    changed = PATIENTS_CSV.replace("Petrov", "Sidorov")
+    second = run_import(api, "patients", changed, "patients.csv")
+
+    assert (second[-1]["created"], second[-1]["updated"], second[-1]["failed"]) == (0, 3, 0)
+    assert count(Patient) == 3
+    with UnitOfWork(name="test") as uow:
+        assert uow.session.exec(select(Patient.last_name).where(Patient.patient_id == "P1")).one() == "Sidorov"
+
+
+def test_chunks_are_reported_separately(api):
+    results = run_import(api, "patients", PATIENTS_CSV, "patients.csv", chunk_size=2)
+
+    assert [r["chunk"] for r in results[:-1]] == [1, 2]
+    assert [r["created"] for r in results[:-1]] == [2, 1]
+    assert results[-1]["rows"] == 3
+
+
+def test_bad_rows_reported_with_line_numbers(api):
+    run_import(api, "patients", PATIENTS_CSV, "patients.csv")
+    content = "\n".join([
+        exam_line("ACC1"),
+        exam_line("ACC2", exam_date="01.03.2024"),
+        "{not json",
+        exam_line("ACC3", patient_id="P404"),
+        "",
+        exam_line("ACC4", device=""),
+        "[1, 2]",
+        exam_line("ACC5", patient_id="P2"),
+    ])
+
+    results = run_import(api, "exams", content, "exams.ndjson")
+
+    errors, total = results[0]["errors"], results[-1]
+    assert [(e["line"], e["key"]) for e in errors] == [(2, "ACC2"), (3, None), (4, "ACC3"), (6, "ACC4"), (7, None)]
+    assert errors[0]["error"].startswith("exam_date:")
+    assert "P404" in errors[2]["error"]
+    assert errors[3]["error"].startswith("device:")
+    assert (total["rows"], total["created"], total["failed"]) == (7, 2, 5)
+    with UnitOfWork(name="test") as uow:
+        assert set(uow.session.exec(select(Exam.accession_number)).all()) == {"ACC1", "ACC5"}
+
+
+def test_duplicate_keys_in_file_keep_last_row(api):
+    run_import(api, "patients", PATIENTS_CSV, "patients.csv")
+    content = "\n".join([exam_line("ACC1", device="D1"), exam_line("ACC1", device="D2")])
+
+    total = run_import(api, "exams", content, "exams.ndjson")[-1]
+
+    assert (total["created"], total["duplicates"]) == (1, 1)
+    with UnitOfWork(name="test") as uow:
+        assert uow.session.exec(select(Exam.device)).all() == ["D2"]
+
+
+def test_reimport_moves_rollups_of_changed_exams(api, user_id):
+    run_import(api, "patients", PATIENTS_CSV, "patients.csv")
+    run_import(api, "exams", exam_line("ACC1", device="D1"), "exams.ndjson")
+    with UnitOfWork(name="test") as uow:
+        exam_id = uow.session.exec(select(Exam.id)).one()
+        record = QCRecord(exam_id=exam_id, original_image_path="", created_by=user_id, created_at=datetime(2024, 3, 1))
+        record.set_ml_results({"status": "FIX", "major_flags": {"rotation": True}})
+        uow.session.add(record)
+        uow.session.flush()
+        QCRollupRepository(uow.session).apply([record])
+        uow.commit()
+
+    total = run_import(api, "exams", exam_line("ACC1", device="D2"), "exams.ndjson")[-1]
+
+    assert total["updated"] == 1
+    with UnitOfWork(name="test") as uow:
+        repo = QCRollupRepository(uow.session)
+        assert repo.check() == []
+        assert repo.summary(device="D1")["total"] == 0
+        assert repo.summary(device="D2")["major_flags"] == {"rotation": 1}
+
+
+def test_whole_file_errors_are_400(api):
+    assert api.post("/import/visits", files={"file": ("x.csv", b"a\n1\n")}).status_code == 400
+    response = api.post("/import/patients", files={"file": ("patients.csv", b"patient_id,sex\nP1,M\n")})
+    assert response.status_code == 400
+    assert "first_name" in response.json()["detail"]
+    assert api.post("/import/patients", files={"file": ("patients.txt", b"")}).status_code == 400
+    assert count(Patient) == 0
@@ -0,0 +1,126 @@
+"""Кэш результатов ML: срок жизни, вытеснение давно не использованных и ссылки на блобы изображений."""
+from datetime import datetime, timedelta
+
+import pytest
+from sqlmodel import select, update
+
+from app.config.unit_of_work import UnitOfWork
+from app.models.image_blobs import ImageBlob
+from app.models.ml_cache_entries import MLCacheEntry
+from app.services import ml_result_cache as ml_result_cache_module
+from app.services.ml_result_cache import MLResultCache
+from app.storage.backends import LocalStorageBackend
+from app.storage.image_store import ImageStore
+
+ML_RESULT = {"status": "OK", "qc_probs": {"rotation": 0.1}}
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = ImageStore(LocalStorageBackend(str(tmp_path / "blobs")))
+    monkeypatch.setattr(ml_result_cache_module, "image_store", store)
+    return store
+
+
+@pytest.fixture
+def blob(store, make_png):
+    """Сохранённое изображение (одна ссылка — как у QCRecord); возвращает ссылку."""
+    def make(value: int) -> str:
+        with UnitOfWork(name="test") as uow:
+            ref = store.put(uow.session, make_png(value))
+            uow.commit()
+        return ref
+    return make
+
+
+def refcount(ref: str) -> int:
+    with UnitOfWork(name="test") as uow:
+        return uow.session.get(ImageBlob, ref.split(":", 1)[1]).refcount
+
+
+def put(cache: MLResultCache, sha256: str, original: str, corrected: str = None):
+    with UnitOfWork(name="test") as uow:
+        cache.put(uow.session, sha256, ML_RESULT, original, corrected)
+        uow.commit()
+
+
+def get(cache: MLResultCache, sha256: str):
+    with UnitOfWork(name="test") as uow:
+        result = cache.get(uow.session, sha256)
+        uow.commit()
+    return result
+
+
+def set_times(sha256: str, **values):
+    with UnitOfWork(name="test") as uow:
+        uow.session.exec(update(MLCacheEntry).where(MLCacheEntry.image_sha256 == sha256).values(**values))
+        uow.commit()
+
+
+def entries() -> set:
+    with UnitOfWork(name="test") as uow:
+        return set(uow.session.exec(select(MLCacheEntry.image_sha256)).all())
+
+
+def test_hit_returns_result_and_holds_blob_references(store, blob):
+    cache = MLResultCache(model_version="1", ttl=3600, max_entries=10)
+    original, corrected = blob(10), blob(20)
+
+    put(cache, "a" * 64, original, corrected)
+
+    assert refcount(original) == 2 and refcount(corrected) == 2
+    assert get(cache, "a" * 64) == (ML_RESULT, {"original": original, "corrected": corrected})
+    # тот же файл ещё раз (параллельная загрузка) — ссылки не удваиваются
+    put(cache, "a" * 64, original, corrected)
+    assert refcount(original) == 2
+    assert (cache.hits, cache.stores) == (1, 1)
+
+
+def test_other_model_version_misses(store, blob):
+    put(MLResultCache(model_version="1", ttl=3600), "a" * 64, blob(10))
+
+    assert get(MLResultCache(model_version="2", ttl=3600), "a" * 64) is None
+
+
+def test_expired_entry_is_ignored_and_pruned(store, blob):
+    cache = MLResultCache(model_version="1", ttl=3600, max_entries=10)
+    old = blob(10)
+    put(cache, "a" * 64, old)
+    set_times("a" * 64, created_at=datetime.utcnow() - timedelta(hours=2))
+
+    assert get(cache, "a" * 64) is None
+
+    # удаляется при следующей записи в кэш и отпускает своё изображение
+    put(cache, "b" * 64, blob(20))
+    assert entries() == {"b" * 64}
+    assert refcount(old) == 1
+    assert cache.evictions == 1
+
+
+def test_least_recently_used_evicted_over_max_entries(store, blob):
+    cache = MLResultCache(model_version="1", ttl=3600, max_entries=2)
+    refs = {}
+    for i, sha256 in enumerate(("a" * 64, "b" * 64)):
+        refs[sha256] = blob(10 * (i + 1))
+        put(cache, sha256, refs[sha256])
+        set_times(sha256, last_used_at=datetime.utcnow() - timedelta(minutes=10 - i))
+    # попадание освежает «a»: самой давней становится «b»
+    assert get(cache, "a" * 64) is not None
+
+    refs["c" * 64] = blob(30)
+    put(cache, "c" * 64, refs["c" * 64])
+
+    assert entries() == {"a" * 64, "c" * 64}
+    assert refcount(refs["b" * 64]) == 1
+    assert refcount(refs["a" * 64]) == 2 and refcount(refs["c" * 64]) == 2
+
+
+def test_disabled_cache_stores_nothing(store, blob):
+    cache = MLResultCache(model_version="1", ttl=0)
+    original = blob(10)
+
+    put(cache, "a" * 64, original)
+
+    assert entries() == set()
+    assert refcount(original) == 1
+    assert get(cache, "a" * 64) is None
@@ -0,0 +1,95 @@
+"""Счётчики дашборда (qcrollup): инкрементальное обновление совпадает с пересчётом с нуля."""
+from datetime import datetime
+
+from app.config.unit_of_work import UnitOfWork
+from app.models.qc_records import QCRecord
+from app.repositories.qc_rollup_repository import QCRollupRepository
+
+ML_RESULTS = [
+    {"status": "OK"},
+    {"status": "FIX", "needs_fix": True, "major_flags": {"rotation": True, "blur": False}},
+    {"status": "FIX", "major_flags": {"rotation": True}, "critical_flags": {"cropped": True}},
+    {"status": "FAIL", "severe_flags": ["foreign_object"], "critical_flags": {"cropped": True}},
+    {},
+]
+
+
+def add_records(exam_id: int, user_id: int, created_at: datetime, results=ML_RESULTS):
+    """Как QCService.save_results: записи и счётчики — одной транзакцией."""
+    with UnitOfWork(name="test") as uow:
+        records = []
+        for ml_result in results:
+            record = QCRecord(exam_id=exam_id, original_image_path="", created_by=user_id, created_at=created_at)
+            record.set_ml_results(ml_result)
+            records.append(record)
+        uow.session.add_all(records)
+        uow.session.flush()
+        QCRollupRepository(uow.session).apply(records)
+        uow.commit()
+
+
+def summary() -> dict:
+    with UnitOfWork(name="test") as uow:
+        return QCRollupRepository(uow.session).summary()
+
+
+def check() -> list:
+    with UnitOfWork(name="test") as uow:
+        return QCRollupRepository(uow.session).check()
+
+
+def rebuild():
+    with UnitOfWork(name="test") as uow:
+        QCRollupRepository(uow.session).rebuild()
+        uow.commit()
+
+
+def test_apply_matches_live_data(make_exam, user_id):
+    add_records(make_exam("ACC1", datetime(2024, 3, 1)), user_id, datetime(2024, 3, 1, 10))
+    add_records(make_exam("ACC2", datetime(2024, 3, 2), device="D2", modality="CR"), user_id, datetime(2024, 3, 2, 23, 59))
+
+    assert check() == []
+    assert summary() == {
+        "total": 10,
+        "statuses": {"OK": 2, "FIX": 4, "FAIL": 2, "UNKNOWN": 2},
+        "major_flags": {"rotation": 4},
+        "critical_flags": {"cropped": 4},
+    }
+
+
+def test_rebuild_gives_same_counters(make_exam, user_id):
+    add_records(make_exam("ACC1", datetime(2024, 3, 1)), user_id, datetime(2024, 3, 1, 10))
+    add_records(make_exam("ACC2", datetime(2024, 3, 2), device="D2"), user_id, datetime(2024, 3, 2, 10))
+    incremental = summary()
+
+    rebuild()
+
+    assert check() == []
+    assert summary() == incremental
+
+
+def test_deleting_patient_subtracts_records(api, make_exam, user_id):
+    add_records(make_exam("ACC1", datetime(2024, 3, 1), patient_id="P1"), user_id, datetime(2024, 3, 1, 10))
+    add_records(make_exam("ACC2", datetime(2024, 3, 1), patient_id="P2"), user_id, datetime(2024, 3, 1, 11))
+
+    assert api.delete("/patients/patients/P1").status_code == 200
+
+    assert check() == []
+    assert summary()["total"] == len(ML_RESULTS)
+    assert api.get("/dashboard/dashboard/summary").json() == summary()
+
+
+def test_check_reports_drift(make_exam, user_id):
+    exam_id = make_exam("ACC1", datetime(2024, 3, 1))
+    add_records(exam_id, user_id, datetime(2024, 3, 1, 10))
+    # запись без счётчиков (например, вставленная в обход QCService)
+    with UnitOfWork(name="test") as uow:
+        uow.session.add(QCRecord(exam_id=exam_id, original_image_path="", created_by=user_id,
+                                 created_at=datetime(2024, 3, 1, 12), status="OK"))
+        uow.commit()
+
+    diffs = check()
+    assert [(d["kind"], d["name"], d["expected"], d["actual"]) for d in diffs] == [("status", "OK", 2, 1)]
+
+    rebuild()
+    assert check() == []
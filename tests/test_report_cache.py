@@ -0,0 +1,101 @@
+"""Дисковый кэш PDF отчётов: версии, сброс при новых данных и вытеснение по размеру."""
+import os
+from datetime import datetime
+
+import pytest
+
+from app.services import patient_service
+from app.services.report_cache import ReportCache
+
+PDF = b"%PDF-" + b"x" * 95  # 100 байт
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ReportCache(str(tmp_path / "reports"), max_bytes=300)
+
+
+def age(cache: ReportCache, key: str, seconds: int):
+    """Делает файл отчёта «давно прочитанным»."""
+    path = cache._path(key)
+    mtime = os.path.getmtime(path) - seconds
+    os.utime(path, (mtime, mtime))
+
+
+def test_get_returns_stored_version_only(cache):
+    key = ReportCache.key(1, "qc:1#stats:1")
+    cache.put(key, PDF)
+
+    assert cache.get(key) == PDF
+    # новые QC данные или новая статистика — другой ключ, старый отчёт не находится
+    assert cache.get(ReportCache.key(1, "qc:2#stats:1")) is None
+    assert cache.get(ReportCache.key(1, "qc:1#stats:2")) is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 2
+
+
+def test_invalidate_removes_all_versions_of_exam(cache):
+    cache.put(ReportCache.key(1, "a"), PDF)
+    cache.put(ReportCache.key(1, "b"), PDF)
+    # exam 11 начинается с той же цифры — его отчёт остаётся
+    other = ReportCache.key(11, "a")
+    cache.put(other, PDF)
+
+    cache.invalidate(1)
+
+    assert cache.get(ReportCache.key(1, "a")) is None
+    assert cache.get(ReportCache.key(1, "b")) is None
+    assert cache.get(other) == PDF
+    stats = cache.stats()
+    assert stats["invalidations"] == 2
+    assert stats["entries"] == 1 and stats["size_bytes"] == len(PDF)
+
+
+def test_evicts_least_recently_read(cache):
+    keys = [ReportCache.key(exam_id, "v") for exam_id in (1, 2, 3)]
+    for i, key in enumerate(keys):
+        cache.put(key, PDF)
+        age(cache, key, 100 - i * 10)
+    # чтение освежает отчёт 1: самым давним становится отчёт 2
+    assert cache.get(keys[0]) == PDF
+
+    fresh = ReportCache.key(4, "v")
+    cache.put(fresh, PDF)
+
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) == PDF and cache.get(keys[2]) == PDF and cache.get(fresh) == PDF
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["size_bytes"] == 300 == sum(os.path.getsize(cache._path(k)) for k in (keys[0], keys[2], fresh))
+
+
+def test_oversized_report_is_kept_alone(cache):
+    cache.put(ReportCache.key(1, "v"), PDF)
+    big = ReportCache.key(2, "v")
+    cache.put(big, PDF * 4)
+
+    # только что записанный отчёт не вытесняется, даже если он больше предела
+    assert cache.get(big) == PDF * 4
+    assert cache.stats()["entries"] == 1
+
+
+def test_replacing_same_key_keeps_size(cache):
+    key = ReportCache.key(1, "v")
+    cache.put(key, PDF)
+    cache.put(key, PDF[:50])
+
+    assert cache.stats()["size_bytes"] == 50
+    # размер считается заново по файлам — тот же результат
+    assert ReportCache(cache.directory, cache.max_bytes).stats()["size_bytes"] == 50
+
+
+def test_deleting_patient_invalidates_reports(api, make_exam, cache, monkeypatch):
+    monkeypatch.setattr(patient_service, "report_cache", cache)
+    exam_id = make_exam("ACC1", datetime(2024, 3, 1), patient_id="P1")
+    kept = ReportCache.key(make_exam("ACC2", datetime(2024, 3, 1), patient_id="P2"), "v")
+    cache.put(ReportCache.key(exam_id, "v"), PDF)
+    cache.put(kept, PDF)
+
+    assert api.delete("/patients/patients/P1").status_code == 200
+
+    assert cache.get(ReportCache.key(exam_id, "v")) is None
+    assert cache.get(kept) == PDF
@@ -0,0 +1,191 @@
+"""
+S3StorageBackend через ImageStore на подставном S3 клиенте (объекты в памяти, тот же интерфейс
+и те же ошибки «нет объекта», что у boto3) — без сети, MinIO и boto3.
+"""
+import os
+from datetime import datetime, timezone
+
+import pytest
+
+from app.config.unit_of_work import UnitOfWork
+from app.models.image_blobs import ImageBlob
+from app.storage.backends import S3StorageBackend
+from app.storage.image_store import ImageStore
+
+BUCKET = "qc"
+PREFIX = "qc-images"
+
+
+class FakeClientError(Exception):
+    """Как botocore.exceptions.ClientError: код ошибки в response["Error"]["Code"]."""
+
+    def __init__(self, code: str):
+        super().__init__(code)
+        self.response = {"Error": {"Code": code}}
+
+
+class FakeS3Client:
+    def __init__(self):
+        self.objects = {}  # (bucket, key) -> (bytes, LastModified)
+        self.uploads = 0
+        self.fail_upload = False
+        self.fail_download = False
+
+    def head_object(self, Bucket, Key):
+        if (Bucket, Key) not in self.objects:
+            raise FakeClientError("404")
+        return {"ContentLength": len(self.objects[(Bucket, Key)][0])}
+
+    def upload_file(self, Filename, Bucket, Key):
+        with open(Filename, "rb") as f:
+            data = f.read()
+        if self.fail_upload:
+            raise FakeClientError("InternalError")
+        self.uploads += 1
+        self.objects[(Bucket, Key)] = (data, datetime.now(timezone.utc))
+
+    def download_file(self, Bucket, Key, Filename):
+        if (Bucket, Key) not in self.objects:
+            raise FakeClientError("404")
+        data = self.objects[(Bucket, Key)][0]
+        with open(Filename, "wb") as f:
+            if self.fail_download:
+                # обрыв на середине
+                f.write(data[: len(data) // 2])
+                raise FakeClientError("RequestTimeout")
+            f.write(data)
+
+    def delete_object(self, Bucket, Key):
+        self.objects.pop((Bucket, Key), None)
+
+    def get_paginator(self, name):
+        assert name == "list_objects_v2"
+        return self
+
+    def paginate(self, Bucket, Prefix=""):
+        keys = sorted(k for b, k in self.objects if b == Bucket and k.startswith(Prefix))
+        # страницы по 2 объекта — проверяется и листание
+        for i in range(0, len(keys), 2):
+            yield {"Contents": [
+                {"Key": k, "LastModified": self.objects[(Bucket, k)][1]} for k in keys[i:i + 2]
+            ]}
+
+
+@pytest.fixture
+def client():
+    return FakeS3Client()
+
+
+@pytest.fixture
+def store(client, tmp_path):
+    return ImageStore(S3StorageBackend(BUCKET, str(tmp_path / "cache"), PREFIX, client=client))
+
+
+def put(store: ImageStore, path: str) -> str:
+    with UnitOfWork(name="test") as uow:
+        ref = store.put(uow.session, path)
+        uow.commit()
+    return ref
+
+
+def release(store: ImageStore, ref: str):
+    with UnitOfWork(name="test") as uow:
+        store.release(uow.session, ref)
+        uow.commit()
+
+
+def refcount(ref: str) -> int:
+    with UnitOfWork(name="test") as uow:
+        return uow.session.get(ImageBlob, ref.split(":", 1)[1]).refcount
+
+
+def object_key(store: ImageStore, ref: str) -> str:
+    return f"{PREFIX}/{store.key(ref.split(':', 1)[1])}"
+
+
+def test_put_uploads_object_and_takes_file(store, client, make_png):
+    path = make_png(10)
+    data = open(path, "rb").read()
+
+    ref = put(store, path)
+
+    assert ref.startswith("sha256:")
+    assert client.objects[(BUCKET, object_key(store, ref))][0] == data
+    assert store.backend.exists(store.key(ref.split(":", 1)[1]))
+    # временный файл забран хранилищем и стал локальной копией
+    assert not os.path.exists(path)
+    local = store.resolve(ref)
+    assert open(local, "rb").read() == data
+    assert refcount(ref) == 1
+
+
+def test_put_same_content_skips_upload(store, client, make_png):
+    ref = put(store, make_png(20))
+    second = make_png(20)
+
+    assert put(store, second) == ref
+    assert client.uploads == 1
+    assert not os.path.exists(second)
+    assert refcount(ref) == 2
+
+
+def test_failed_upload_leaves_no_object(store, client, make_png):
+    path = make_png(30)
+    client.fail_upload = True
+
+    with pytest.raises(FakeClientError):
+        put(store, path)
+
+    # ни объекта, ни локальной копии; временный файл остаётся вызывающему (discard_images)
+    assert client.objects == {}
+    assert os.path.exists(path)
+    sha256, _ = ImageStore.file_sha256(path)
+    assert not os.path.exists(store.backend.local_path(store.key(sha256), fetch=False))
+
+
+def test_resolve_downloads_missing_local_copy(store, client, make_png):
+    path = make_png(40)
+    data = open(path, "rb").read()
+    ref = put(store, path)
+    local = store.backend.local_path(store.key(ref.split(":", 1)[1]), fetch=False)
+    os.remove(local)
+
+    client.fail_download = True
+    # оборванное скачивание не оставляет недописанный файл под именем блоба
+    assert store.resolve(ref) is None
+    assert not os.path.exists(local)
+    assert os.listdir(os.path.dirname(local)) == []
+
+    client.fail_download = False
+    assert store.resolve(ref) == local
+    assert open(local, "rb").read() == data
+
+
+def test_collect_garbage_deletes_unreferenced_and_orphans(store, client, make_png):
+    kept = put(store, make_png(50))
+    dropped = put(store, make_png(60))
+    release(store, dropped)
+    # объект без строки в imageblob — остаток откатившейся транзакции
+    orphan = make_png(70)
+    sha256, _ = ImageStore.file_sha256(orphan)
+    client.upload_file(orphan, BUCKET, f"{PREFIX}/{store.key(sha256)}")
+
+    result = store.collect_garbage(grace_seconds=0)
+
+    assert result["removed"] >= 1 and result["orphans"] >= 1
+    remaining = {key for _, key in client.objects}
+    assert object_key(store, kept) in remaining
+    assert object_key(store, dropped) not in remaining
+    assert f"{PREFIX}/{store.key(sha256)}" not in remaining
+    assert not os.path.exists(store.backend.local_path(store.key(dropped.split(":", 1)[1]), fetch=False))
+    assert store.resolve(kept) is not None
+
+
+def test_s3_without_boto3_fails_at_startup(monkeypatch):
+    from app.storage import backends, image_store
+
+    monkeypatch.setattr(image_store, "IMAGE_STORAGE", "s3")
+    monkeypatch.setattr(image_store, "S3_BUCKET", "qc")
+    monkeypatch.setattr(backends, "boto3", None)
+    with pytest.raises(RuntimeError, match="boto3"):
+        image_store.create_backend()